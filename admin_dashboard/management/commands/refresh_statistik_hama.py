@@ -0,0 +1,31 @@
+# admin_dashboard/management/commands/refresh_statistik_hama.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_dashboard.statistik_service import rebuild_statistik, refresh_statistik
+
+
+class Command(BaseCommand):
+    help = 'Hitung HasilDeteksi baru ke StatistikHama (per hari per jenis hama per tingkat, incremental)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Hapus statistik lalu hitung ulang dari awal')
+        parser.add_argument('--loop', action='store_true', help='Jalankan terus setiap --interval detik')
+        parser.add_argument('--interval', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            total = rebuild_statistik()
+            self.stdout.write(f"📊 Statistik dihitung ulang dari {total} deteksi")
+            if not options['loop']:
+                return
+        try:
+            while True:
+                total = refresh_statistik()
+                self.stdout.write(f"📊 {total} deteksi baru dihitung ke statistik hama")
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Refresh statistik hama dihentikan')
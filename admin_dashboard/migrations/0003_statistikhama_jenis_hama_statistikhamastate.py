@@ -0,0 +1,42 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0002_jenishama_gejala_jenishama_nama_latin'),
+        ('dashboard', '0009_hasildeteksi_waktu_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistikhama',
+            name='jenis_hama',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='statistik', to='dashboard.jenishama', verbose_name='Jenis Hama'),
+        ),
+        migrations.AlterField(
+            model_name='statistikhama',
+            name='tingkat',
+            field=models.CharField(choices=[('high', 'High'), ('medium', 'Medium'), ('low', 'Low'), ('unknown', 'Tidak Diketahui')], max_length=20, verbose_name='Tingkat'),
+        ),
+        migrations.AddIndex(
+            model_name='statistikhama',
+            index=models.Index(fields=['tanggal', 'tingkat'], name='statistik_tanggal_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='statistikhama',
+            constraint=models.UniqueConstraint(fields=('tanggal', 'jenis_hama', 'tingkat'), name='uniq_statistik_hama_harian'),
+        ),
+        migrations.CreateModel(
+            name='StatistikHamaState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_waktu', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'statistik_hama_state',
+            },
+        ),
+    ]
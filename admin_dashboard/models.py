@@ -89,14 +89,26 @@ class PencegahanHama(models.Model):
 class StatistikHama(models.Model):
     """
     Statistik Serangan Hama (untuk chart)
+
+    Baris dengan jenis_hama diisi oleh job incremental `refresh_statistik_hama`
+    (jumlah HasilDeteksi per hari WIB per jenis hama per tingkat).
     """
     TINGKAT_CHOICES = [
         ('high', 'High'),
         ('medium', 'Medium'),
         ('low', 'Low'),
+        ('unknown', 'Tidak Diketahui'),
     ]
     
     tanggal = models.DateField(verbose_name="Tanggal")
+    jenis_hama = models.ForeignKey(
+        'dashboard.JenisHama',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='statistik',
+        verbose_name="Jenis Hama"
+    )
     tingkat = models.CharField(
         max_length=20, 
         choices=TINGKAT_CHOICES, 
@@ -111,6 +123,25 @@ class StatistikHama(models.Model):
         verbose_name = "Statistik Hama"
         verbose_name_plural = "Statistik Hama"
         ordering = ['tanggal']
+        indexes = [
+            models.Index(fields=['tanggal', 'tingkat'], name='statistik_tanggal_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['tanggal', 'jenis_hama', 'tingkat'], name='uniq_statistik_hama_harian'),
+        ]
     
     def __str__(self):
-        return f"{self.tanggal} - {self.tingkat}: {self.jumlah}"
\ No newline at end of file
+        return f"{self.tanggal} - {self.tingkat}: {self.jumlah}"
+
+
+class StatistikHamaState(models.Model):
+    """Watermark job statistik: HasilDeteksi dengan waktu_deteksi <= last_waktu sudah dihitung"""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_waktu = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'statistik_hama_state'
+
+    def __str__(self):
+        return f"{self.name}: {self.last_waktu}"
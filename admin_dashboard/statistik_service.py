@@ -0,0 +1,207 @@
+# admin_dashboard/statistik_service.py
+"""
+Statistik deteksi hama yang dimaterialisasi untuk dashboard admin.
+
+`refresh_statistik()` menghitung HasilDeteksi baru (waktu_deteksi > watermark)
+per hari WIB per jenis hama per tingkat dan menambahkannya ke StatistikHama,
+tanpa memindai ulang histori. Dashboard membaca StatistikHama ditambah "tail"
+HasilDeteksi setelah watermark (range kecil pada index waktu_deteksi),
+sehingga biaya halaman tidak bertambah seiring jumlah deteksi.
+
+Watermark tertinggal STATISTIK_HAMA_LAG_SECONDS dari waktu sekarang supaya
+deteksi yang transaksinya belum commit saat job berjalan tidak terlewat.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from dashboard.models import HasilDeteksi, JenisHama
+from dashboard.sensor_rollup import WIB, wib_wallclock
+
+from .models import StatistikHama, StatistikHamaState
+
+logger = logging.getLogger(__name__)
+
+_watermark_warned = False
+
+STATE_NAME = 'statistik_hama'
+
+# tingkat_serangan HasilDeteksi -> tingkat StatistikHama
+TINGKAT_MAP = {'berat': 'high', 'sedang': 'medium', 'ringan': 'low', None: 'unknown'}
+
+
+def _lag():
+    return timedelta(seconds=getattr(settings, 'STATISTIK_HAMA_LAG_SECONDS', 300))
+
+
+def _grouped(queryset):
+    """{(tanggal WIB, jenis_hama_id, tingkat): jumlah} dengan GROUP BY di database"""
+    counts = defaultdict(int)
+    rows = (
+        queryset
+        .annotate(tanggal=TruncDate(wib_wallclock('waktu_deteksi'), tzinfo=dt_timezone.utc))
+        .values('tanggal', 'jenis_hama_id', 'tingkat_serangan')
+        .annotate(jumlah=Count('citra_id'))
+        .order_by()
+    )
+    for r in rows:
+        if r['tanggal'] is None:
+            logger.error(f"{r['jumlah']} deteksi tanpa tanggal WIB dilewati")
+            continue
+        counts[(r['tanggal'], r['jenis_hama_id'], TINGKAT_MAP.get(r['tingkat_serangan'], 'unknown'))] += r['jumlah']
+    return counts
+
+
+def _upsert(counts):
+    if not counts:
+        return
+    tanggal = [k[0] for k in counts]
+    existing = {
+        (r.tanggal, r.jenis_hama_id, r.tingkat): r
+        for r in StatistikHama.objects.filter(
+            jenis_hama__isnull=False,
+            tanggal__gte=min(tanggal),
+            tanggal__lte=max(tanggal),
+            jenis_hama_id__in={k[1] for k in counts},
+        )
+    }
+
+    to_update, to_create = [], []
+    for key, jumlah in counts.items():
+        row = existing.get(key)
+        if row is None:
+            to_create.append(StatistikHama(tanggal=key[0], jenis_hama_id=key[1], tingkat=key[2], jumlah=jumlah))
+        else:
+            row.jumlah += jumlah
+            to_update.append(row)
+
+    if to_update:
+        StatistikHama.objects.bulk_update(to_update, ['jumlah'], batch_size=500)
+    if to_create:
+        StatistikHama.objects.bulk_create(to_create, batch_size=500)
+
+
+def refresh_statistik(now=None, window=timedelta(days=1)):
+    """
+    Tambahkan HasilDeteksi baru ke StatistikHama per jendela waktu `window`.
+    Return jumlah deteksi yang dihitung. Aman dijalankan berulang (state dikunci
+    per jendela, watermark dan statistik di-commit bersama).
+    """
+    upto = (now or timezone.now()) - _lag()
+    total = 0
+    while True:
+        with transaction.atomic():
+            state, _ = StatistikHamaState.objects.select_for_update().get_or_create(name=STATE_NAME)
+            start = state.last_waktu
+            if start is None:
+                first = HasilDeteksi.objects.aggregate(m=Min('waktu_deteksi'))['m']
+                start = first - timedelta(microseconds=1) if first else upto
+            if start >= upto:
+                if state.last_waktu is None:
+                    state.last_waktu = upto
+                    state.save(update_fields=['last_waktu', 'updated_at'])
+                break
+
+            end = min(start + window, upto)
+            counts = _grouped(HasilDeteksi.objects.filter(waktu_deteksi__gt=start, waktu_deteksi__lte=end))
+            _upsert(counts)
+            state.last_waktu = end
+            state.save(update_fields=['last_waktu', 'updated_at'])
+
+        total += sum(counts.values())
+
+    if total:
+        logger.info(f"Statistik hama: {total} deteksi baru dihitung")
+    return total
+
+
+def rebuild_statistik(now=None):
+    """Hitung ulang seluruh statistik (mis. setelah data deteksi dihapus)"""
+    with transaction.atomic():
+        StatistikHama.objects.filter(jenis_hama__isnull=False).delete()
+        StatistikHamaState.objects.filter(name=STATE_NAME).delete()
+    return refresh_statistik(now=now)
+
+
+# ---------------- query dashboard ----------------
+def _watermark():
+    return StatistikHamaState.objects.filter(name=STATE_NAME).values_list('last_waktu', flat=True).first()
+
+
+def _tail_counts(today_start):
+    """Deteksi setelah watermark (belum dimaterialisasi)"""
+    global _watermark_warned
+    watermark = _watermark()
+    if watermark is None:
+        # Sekali per proses; bukan setiap kali dashboard dibuka
+        if not _watermark_warned:
+            logger.warning('Statistik hama belum pernah dihitung; jalankan refresh_statistik_hama')
+            _watermark_warned = True
+        watermark = today_start
+    return _grouped(HasilDeteksi.objects.filter(waktu_deteksi__gt=watermark))
+
+
+def _month_start(d, months_back):
+    month_index = d.year * 12 + d.month - 1 - months_back
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def dashboard_statistik(now=None, months=12, top=3):
+    """
+    Ringkasan untuk dashboard admin: deteksi hari ini, top jenis hama, dan
+    jumlah kasus per bulan per tingkat selama `months` bulan terakhir.
+    """
+    now = now or timezone.now()
+    today = now.astimezone(WIB).date()
+    today_start = datetime.combine(today, datetime.min.time(), tzinfo=WIB)
+    tail = _tail_counts(today_start)
+    materialized = StatistikHama.objects.filter(jenis_hama__isnull=False)
+
+    # Deteksi hari ini
+    deteksi_hari_ini = materialized.filter(tanggal=today).aggregate(n=Sum('jumlah'))['n'] or 0
+    deteksi_hari_ini += sum(n for (tanggal, _, _), n in tail.items() if tanggal == today)
+
+    # Top jenis hama (seluruh waktu)
+    per_hama = defaultdict(int)
+    for r in materialized.values('jenis_hama_id').annotate(n=Sum('jumlah')).order_by():
+        per_hama[r['jenis_hama_id']] += r['n']
+    for (_, jenis_hama_id, _), n in tail.items():
+        per_hama[jenis_hama_id] += n
+    top_ids = sorted(per_hama, key=per_hama.get, reverse=True)[:top]
+    names = dict(JenisHama.objects.filter(id__in=top_ids).values_list('id', 'nama'))
+    top_pests = [{'nama': names.get(i, '-'), 'jumlah': per_hama[i]} for i in top_ids]
+
+    # Chart bulanan per tingkat
+    first_month = _month_start(today, months - 1)
+    labels = [_month_start(today, months - 1 - i) for i in range(months)]
+    series = {tingkat: dict.fromkeys(labels, 0) for tingkat, _ in StatistikHama.TINGKAT_CHOICES}
+    rows = (
+        materialized
+        .filter(tanggal__gte=first_month)
+        .annotate(bulan=TruncMonth('tanggal'))
+        .values('bulan', 'tingkat')
+        .annotate(n=Sum('jumlah'))
+        .order_by()
+    )
+    for r in rows:
+        series[r['tingkat']][r['bulan']] += r['n']
+    for (tanggal, _, tingkat), n in tail.items():
+        bulan = tanggal.replace(day=1)
+        if bulan >= first_month:
+            series[tingkat][bulan] += n
+
+    return {
+        'deteksi_hari_ini': deteksi_hari_ini,
+        'top_pests': top_pests,
+        'chart': {
+            'labels': [d.strftime('%b %Y') for d in labels],
+            'series': {tingkat: list(values.values()) for tingkat, values in series.items()},
+        },
+    }
@@ -3,11 +3,11 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth import get_user_model
-from django.utils import timezone
-from django.db.models import Count
 
 from .models import JenisHama, PencegahanHama
+from .statistik_service import dashboard_statistik
 from dashboard.models import HasilDeteksi, Lahan
+from dashboard.geo_tiles import parse_koordinat
 from accounts.models import Petani
 
 # Dapatkan model User yang benar (CustomUser)
@@ -26,24 +26,15 @@ def dashboard_view(request):
     - total jenis hama
     - top 3 jenis hama terbanyak
     - log deteksi terbaru
-    """
-    today = timezone.now().date()
 
+    Angka deteksi & chart dibaca dari StatistikHama (lihat statistik_service),
+    bukan dari agregasi atas seluruh HasilDeteksi.
+    """
     total_users = User.objects.count()
     total_hama = JenisHama.objects.count()
-    deteksi_hari_ini = HasilDeteksi.objects.filter(waktu_deteksi__date=today).count()
+    statistik = dashboard_statistik()
 
-    # Top 3 jenis hama berdasarkan jumlah hasil deteksi
-    top_pests = (
-        HasilDeteksi.objects
-        .values('jenis_hama__nama')
-        .annotate(jumlah=Count('citra_id'))
-        .order_by('-jumlah')[:3]
-    )
-
-    top_pest_1_count = top_pests[0]['jumlah'] if len(top_pests) > 0 else 0
-    top_pest_2_count = top_pests[1]['jumlah'] if len(top_pests) > 1 else 0
-    top_pest_3_count = top_pests[2]['jumlah'] if len(top_pests) > 2 else 0
+    top_pests = statistik['top_pests'] + [{'nama': '-', 'jumlah': 0}] * (3 - len(statistik['top_pests']))
 
     # Log deteksi terbaru (10 terakhir)
     latest_logs_qs = (
@@ -68,11 +59,13 @@ def dashboard_view(request):
     context = {
         'current_user': request.user,
         'total_users': total_users,
-        'deteksi_hari_ini': deteksi_hari_ini,
+        'deteksi_hari_ini': statistik['deteksi_hari_ini'],
         'total_hama': total_hama,
-        'top_pest_1_count': top_pest_1_count,
-        'top_pest_2_count': top_pest_2_count,
-        'top_pest_3_count': top_pest_3_count,
+        'top_pests': top_pests,
+        'top_pest_1_count': top_pests[0]['jumlah'],
+        'top_pest_2_count': top_pests[1]['jumlah'],
+        'top_pest_3_count': top_pests[2]['jumlah'],
+        'chart_data': statistik['chart'],
         'logs': logs,
     }
     return render(request, 'admin_dashboard/dashboard.html', context)
@@ -391,6 +384,7 @@ def tambah_lahan_view(request):
         luas_daerah = request.POST.get('luas_daerah')
         jenis_tanaman = request.POST.get('jenis_tanaman')
         deskripsi = request.POST.get('deskripsi', '')
+        kode_wilayah = request.POST.get('kode_wilayah', '').strip()
 
         if not petani_id or not nama_lahan or not lokasi or not luas_daerah or not jenis_tanaman:
             messages.error(request, 'Semua field bertanda * harus diisi.')
@@ -401,11 +395,24 @@ def tambah_lahan_view(request):
             )
 
         try:
-            petani = Petani.objects.get(id=petani_id)
+            latitude, longitude = parse_koordinat(request.POST.get('latitude'), request.POST.get('longitude'))
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(
+                request,
+                'admin_dashboard/tambah_lahan.html',
+                {'petani_list': petani_list},
+            )
+
+        try:
+            petani = Petani.objects.get(pk=petani_id)
             Lahan.objects.create(
                 petani=petani,
                 nama_lahan=nama_lahan,
                 lokasi=lokasi,
+                latitude=latitude,
+                longitude=longitude,
+                kode_wilayah=kode_wilayah,
                 luas_daerah=luas_daerah,
                 jenis_tanaman=jenis_tanaman,
                 deskripsi=deskripsi,
@@ -427,7 +434,6 @@ def tambah_lahan_view(request):
 def edit_lahan_view(request, id):
     """
     Edit data lahan yang sudah ada.
-    (Template edit_lahan.html bisa dibuat terpisah jika diperlukan.)
     """
     lahan = get_object_or_404(Lahan, id=id)
     petani_list = Petani.objects.select_related('user').all().order_by('nama_lengkap')
@@ -440,10 +446,20 @@ def edit_lahan_view(request, id):
         lahan.jenis_tanaman = request.POST.get('jenis_tanaman')
         lahan.deskripsi = request.POST.get('deskripsi', '')
         lahan.status_aktif = request.POST.get('status_aktif') == 'on'
+        lahan.kode_wilayah = request.POST.get('kode_wilayah', lahan.kode_wilayah).strip()
+
+        try:
+            if 'latitude' in request.POST or 'longitude' in request.POST:
+                lahan.latitude, lahan.longitude = parse_koordinat(
+                    request.POST.get('latitude'), request.POST.get('longitude')
+                )
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(request, 'admin_dashboard/edit_lahan.html', {'lahan': lahan, 'petani_list': petani_list})
 
         try:
             if petani_id:
-                lahan.petani = Petani.objects.get(id=petani_id)
+                lahan.petani = Petani.objects.get(pk=petani_id)
             lahan.save()
             messages.success(request, 'Data lahan berhasil diperbarui.')
             return redirect('admin_dashboard:data_lahan')
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 # ==========================
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'dashboard.metrics.RequestMetricsMiddleware',  # query/latensi per view -> /metrics
     'corsheaders.middleware.CorsMiddleware',  # ← TAMBAHKAN INI!
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -187,3 +188,115 @@ REST_FRAMEWORK = {
 # ==========================
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+
+# ==========================
+# AI INFERENCE
+# ==========================
+# Micro-batching: request deteksi yang datang dalam jendela waktu yang sama
+# digabung menjadi satu panggilan model.predict
+AI_MICRO_BATCHING = True
+AI_BATCH_WINDOW_MS = 10
+AI_BATCH_MAX_SIZE = 32
+AI_BATCH_TIMEOUT = 30           # detik; batas tunggu hasil per request
+
+# Inference server terpisah (python manage.py run_inference_server).
+# Jika AI_INFERENCE_SOCKET diisi, worker Django tidak memuat TensorFlow sendiri
+# dan mengirim tensor ke server lewat Unix socket ini.
+AI_INFERENCE_SOCKET = os.environ.get('AI_INFERENCE_SOCKET') or None
+AI_INFERENCE_WORKERS = 2
+AI_INFERENCE_TIMEOUT = 30  # detik
+
+# Model CNN dimuat lazy saat deteksi pertama. Set True di server produksi untuk
+# memuatnya di background saat worker start (lihat DashboardConfig.ready).
+AI_WARMUP_ON_STARTUP = os.environ.get('AI_WARMUP_ON_STARTUP') == '1'
+
+# Backend inferensi: 'keras' (model .h5), 'tflite' atau 'onnx'
+# (buat file-nya dengan: python manage.py export_model --format tflite --quantize int8)
+AI_BACKEND = os.environ.get('AI_BACKEND', 'keras')
+AI_MODEL_PATH = os.environ.get('AI_MODEL_PATH') or None  # None = file default di dashboard/ml_models/
+
+# Cache hasil prediksi (key: SHA-256 isi gambar + versi model)
+AI_PREDICTION_CACHE_SIZE = 1024          # jumlah entri LRU per proses (0 = nonaktif)
+AI_PREDICTION_CACHE_ALIAS = None         # mis. 'default' untuk berbagi cache antar worker
+AI_PREDICTION_CACHE_TIMEOUT = 60 * 60 * 24
+AI_MODEL_VERSION = None                  # override versi model untuk key cache
+AI_JPEG_DRAFT = True                     # decode JPEG langsung pada resolusi kecil (PIL draft)
+
+# Deteksi async: upload langsung dijawab 202 dan diproses oleh
+# `python manage.py run_detection_worker`. Bisa juga per request dengan POST mode=async.
+AI_ASYNC_DETECTION = False
+AI_BULK_MAX_IMAGES = 100                 # batas gambar per request /api/ai/detect/bulk/
+AI_BULK_MAX_ARCHIVE_ENTRIES = 1000       # batas entri zip (dicek sebelum dekompresi)
+AI_BULK_MAX_ARCHIVE_BYTES = 200 * 1024 * 1024  # total ukuran tak terkompresi gambar dalam zip
+
+# ==========================
+# SENSOR INGESTION
+# ==========================
+SENSOR_BATCH_MAX_READINGS = 5000         # batas pembacaan per request /api/sensor/data/batch/
+SENSOR_MAX_READING_AGE_DAYS = 30         # timestamp device lebih tua dari ini ditolak (jam belum sinkron)
+SENSOR_DEVICE_OWNER_CACHE_TIMEOUT = 300  # detik; cache pemetaan device_id -> lahan (PerangkatSensor)
+
+# Write-behind buffer untuk /api/sensor/data/: pembacaan di-ack langsung lalu
+# disimpan batch (bulk_create) per SENSOR_BUFFER_FLUSH_SIZE baris atau tiap
+# SENSOR_BUFFER_FLUSH_INTERVAL detik. Sisa buffer saat shutdown ditulis ke spool.
+SENSOR_WRITE_BEHIND = os.environ.get('SENSOR_WRITE_BEHIND') == '1'
+SENSOR_BUFFER_MAX_SIZE = 10000
+SENSOR_BUFFER_FLUSH_SIZE = 500
+SENSOR_BUFFER_FLUSH_INTERVAL = 5.0       # detik
+SENSOR_BUFFER_SPOOL_PATH = BASE_DIR / 'var' / 'sensor_spool.jsonl'
+SENSOR_BUFFER_DEAD_LETTER_PATH = BASE_DIR / 'var' / 'sensor_dead_letter.jsonl'  # baris yang ditolak database
+
+# Cache pembacaan sensor terakhir (write-through saat ingest) untuk
+# /api/sensor/latest/. Tanpa CACHES, Django memakai LocMemCache per proses;
+# untuk banyak worker gunakan cache bersama (Redis/Memcached) agar semua
+# worker melihat pembacaan yang sama.
+SENSOR_LATEST_CACHE_ALIAS = 'default'
+SENSOR_LATEST_CACHE_TIMEOUT = 3600       # detik; membatasi data basi dari penulisan di luar ingest
+SENSOR_CACHE_SHARED = None               # None = deteksi (LocMem bukan cache bersama); True untuk satu proses
+SENSOR_LATEST_LOCAL_TIMEOUT = 5          # detik; salinan per proses jika cache tidak bersama (data worker lain basi maks. selama ini)
+
+# Stream SSE /dashboard/api/sensor/stream/ (pub/sub in-process). Event hanya
+# berasal dari ingest di proses yang sama; jalankan dengan satu proses
+# (mis. uvicorn agroguard.asgi:application) agar semua pembacaan ter-push.
+SENSOR_STREAM_KEEPALIVE = 15             # detik antar komentar ping
+SENSOR_STREAM_MAX_SECONDS = 300          # koneksi ditutup lalu di-reconnect oleh browser
+SENSOR_STREAM_WSGI = False               # di WSGI tiap koneksi SSE menahan satu thread; default 204 (polling)
+
+# Retensi data sensor (python manage.py apply_sensor_retention): data mentah
+# lebih tua dari SENSOR_RAW_RETENTION_DAYS diarsipkan ke .npz per device per
+# bulan lalu dihapus; rollup jam/hari disimpan permanen.
+SENSOR_RAW_RETENTION_DAYS = 30
+SENSOR_MINUTE_ROLLUP_RETENTION_DAYS = 30
+SENSOR_RETENTION_BATCH_SIZE = 5000
+SENSOR_ARCHIVE_DIR = BASE_DIR / 'var' / 'sensor_archive'
+SENSOR_HISTORY_MAX_READINGS = 20000       # batas /api/sensor/history/
+
+# Jumlah riwayat deteksi per halaman (halaman berikutnya via cursor)
+RIWAYAT_PAGE_SIZE = 25
+
+# Export riwayat (CSV/PDF streaming). ?background=1 membuat file di thread
+# terpisah; set RIWAYAT_EXPORT_THREAD = False jika job diproses oleh
+# `python manage.py process_riwayat_exports` (cron / worker).
+RIWAYAT_EXPORT_CHUNK_SIZE = 2000
+RIWAYAT_EXPORT_THREAD = True
+RIWAYAT_EXPORT_STALE_SECONDS = 1800      # job 'processing' lebih lama dari ini diklaim ulang
+
+# Statistik dashboard admin (python manage.py refresh_statistik_hama --loop).
+# Deteksi lebih baru dari watermark dibaca langsung dari HasilDeteksi;
+# watermark tertinggal LAG detik agar transaksi yang belum commit tidak terlewat.
+STATISTIK_HAMA_LAG_SECONDS = 300
+
+# Peta sebaran hama (/dashboard/api/peta/sebaran/): presisi geohash tile
+# yang disimpan (5 ≈ 4,9 x 4,9 km; setelah diubah jalankan rebuild_deteksi_tiles)
+# dan rentang tanggal maksimal per query.
+GEOHASH_PRECISION = 5
+GEO_TILE_MAX_DAYS = 366
+
+# Instrumentasi request (dashboard.metrics): persentil per view dari
+# METRICS_SAMPLE_SIZE request terakhir, diekspos di /metrics (Prometheus)
+# untuk user staff atau scraper dengan header "Authorization: Bearer
+# <METRICS_TOKEN>" (kosong = hanya staff). Request >= METRICS_SLOW_REQUEST_MS
+# dicatat ke log 'dashboard.metrics' beserta fingerprint query terlama.
+METRICS_SAMPLE_SIZE = 1024
+METRICS_SLOW_REQUEST_MS = 500
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
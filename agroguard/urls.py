@@ -4,6 +4,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from dashboard import views   # kalau views kamu pindahkan ke dashboard
+from dashboard.metrics import metrics_view
 
 urlpatterns = [
     # Root URL will point to the dashboard home
@@ -13,6 +14,7 @@ urlpatterns = [
     path('dashboard/', include('dashboard.urls')),
     path('admin_dashboard/', include('admin_dashboard.urls')),
     path("rekomendasi/<int:detection_id>/", views.recommendation_detail, name="rekomendasi_detail"),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 
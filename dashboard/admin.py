@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SensorData  # ← Tambahkan ini
+from .models import SensorData, SensorRollup, RisikoLahan, EksporRiwayat, PerangkatSensor  # ← Tambahkan ini
 
 # ========================================
 # ADMIN: SENSOR DATA
@@ -11,3 +11,47 @@ class SensorDataAdmin(admin.ModelAdmin):
     search_fields = ['device_id']
     readonly_fields = ['timestamp']
     ordering = ['-timestamp']
+
+
+# ========================================
+# ADMIN: ROLLUP SENSOR
+# ========================================
+@admin.register(SensorRollup)
+class SensorRollupAdmin(admin.ModelAdmin):
+    list_display = ['device_id', 'resolution', 'bucket_start', 'count']
+    list_filter = ['resolution', 'device_id']
+    search_fields = ['device_id']
+    ordering = ['-bucket_start']
+
+
+# ========================================
+# ADMIN: RISIKO LAHAN
+# ========================================
+@admin.register(RisikoLahan)
+class RisikoLahanAdmin(admin.ModelAdmin):
+    list_display = ['lahan', 'last_hour', 'updated_at']
+    readonly_fields = ['last_hour', 'indices', 'scores', 'updated_at']
+    exclude = ['window']
+    ordering = ['-updated_at']
+
+
+# ========================================
+# ADMIN: EKSPOR RIWAYAT
+# ========================================
+@admin.register(EksporRiwayat)
+class EksporRiwayatAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'petani', 'format', 'status', 'created_at', 'finished_at']
+    list_filter = ['status', 'format']
+    readonly_fields = ['file', 'error', 'created_at', 'finished_at']
+    ordering = ['-created_at']
+
+
+# ========================================
+# ADMIN: PERANGKAT SENSOR
+# ========================================
+@admin.register(PerangkatSensor)
+class PerangkatSensorAdmin(admin.ModelAdmin):
+    list_display = ['device_id', 'lahan', 'aktif', 'created_at']
+    list_filter = ['aktif']
+    search_fields = ['device_id', 'lahan__nama_lahan']
+    ordering = ['device_id']
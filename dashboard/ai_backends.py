@@ -0,0 +1,115 @@
+# dashboard/ai_backends.py
+"""
+Backend inferensi untuk PestDetectionAI.
+
+Semua backend menerima tensor float (N, 150, 150, 3) bernilai 0-1 dan
+mengembalikan probabilitas kelas (N, 12). Pilih lewat settings.AI_BACKEND:
+- 'keras'  : model .h5 asli (default)
+- 'tflite' : hasil `manage.py export_model` (float / dynamic / int8)
+- 'onnx'   : model .onnx lewat ONNX Runtime
+"""
+import os
+import threading
+
+import numpy as np
+
+ML_MODELS_DIR = os.path.join(os.path.dirname(__file__), 'ml_models')
+
+DEFAULT_MODEL_FILES = {
+    'keras': 'pepper_cnn_trained.h5',
+    'tflite': 'pepper_cnn_trained.tflite',
+    'onnx': 'pepper_cnn_trained.onnx',
+}
+
+
+class KerasBackend:
+    name = 'keras'
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class TFLiteBackend:
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        # Interpreter tidak thread-safe: micro-batcher, predict_batch dan
+        # thread request bisa memanggil predict() bersamaan
+        self._lock = threading.Lock()
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input_detail['shape'][0])
+
+    def _quantize(self, batch):
+        dtype = self.input_detail['dtype']
+        if dtype == np.float32:
+            return batch.astype(np.float32)
+        scale, zero_point = self.input_detail['quantization']
+        return np.clip(np.round(batch / scale + zero_point),
+                       np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+
+    def _dequantize(self, output):
+        if self.output_detail['dtype'] == np.float32:
+            return output
+        scale, zero_point = self.output_detail['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch):
+        batch = np.asarray(batch)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input_detail['index'], list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self.input_detail = self.interpreter.get_input_details()[0]
+                self.output_detail = self.interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+
+            self.interpreter.set_tensor(self.input_detail['index'], self._quantize(batch))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_detail['index'])
+        return self._dequantize(output)
+
+
+class OnnxBackend:
+    name = 'onnx'
+
+    def __init__(self, model_path):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError('AI_BACKEND=onnx membutuhkan paket onnxruntime')
+
+        self.session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+BACKENDS = {
+    'keras': KerasBackend,
+    'tflite': TFLiteBackend,
+    'onnx': OnnxBackend,
+}
+
+
+def default_model_path(backend_name):
+    return os.path.join(ML_MODELS_DIR, DEFAULT_MODEL_FILES[backend_name])
+
+
+def load_backend(backend_name='keras', model_path=None):
+    if backend_name not in BACKENDS:
+        raise ValueError(f'Backend tidak dikenal: {backend_name} (pilih: {", ".join(BACKENDS)})')
+    return BACKENDS[backend_name](model_path or default_model_path(backend_name))
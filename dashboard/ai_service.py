@@ -1,15 +1,43 @@
+import io
 import os
-import tensorflow as tf
+import threading
+import time
 import numpy as np
 from PIL import Image
 import logging
+from django.conf import settings
+
+from .ai_backends import default_model_path, load_backend
+from .inference_server import InferenceClient
+from .metrics import ai_timer
+from .micro_batcher import MicroBatcher
 
 logger = logging.getLogger(__name__)
 
+IMG_SIZE = (150, 150)
+
+_DEFAULT = object()
+
+
 class PestDetectionAI:
-    def __init__(self):
+    def __init__(self, inference_client=_DEFAULT):
         self.model = None
         self.model_loaded = False
+        self.load_seconds = None
+        self._load_lock = threading.Lock()
+        self._load_attempted = False
+
+        # Jika AI_INFERENCE_SOCKET diset, model dijalankan di inference server
+        # (python manage.py run_inference_server) dan tidak dimuat di proses ini
+        if inference_client is _DEFAULT:
+            inference_client = None
+            socket_path = getattr(settings, 'AI_INFERENCE_SOCKET', None)
+            if socket_path:
+                inference_client = InferenceClient(
+                    socket_path,
+                    timeout=getattr(settings, 'AI_INFERENCE_TIMEOUT', 30),
+                )
+        self.inference_client = inference_client
 
         # HARUS SESUAI URUTAN TRAINING
         self.class_names = [
@@ -137,59 +165,153 @@ class PestDetectionAI:
     }
 }  
 
-        self.load_model()
+        self.batcher = None
+        if getattr(settings, 'AI_MICRO_BATCHING', True):
+            self.batcher = MicroBatcher(
+                self._predict_array_batch,
+                window_ms=getattr(settings, 'AI_BATCH_WINDOW_MS', 10),
+                max_batch_size=getattr(settings, 'AI_BATCH_MAX_SIZE', 32),
+                timeout=getattr(settings, 'AI_BATCH_TIMEOUT', 30),
+            )
 
     def load_model(self):
+        # TensorFlow / runtime backend diimport di sini (bukan di level modul)
+        # supaya perintah manage.py seperti migrate/check/shell tidak ikut memuatnya
+        started = time.perf_counter()
         try:
-            model_path = os.path.join(os.path.dirname(__file__), 'ml_models/pepper_cnn_trained.h5')
+            backend_name = getattr(settings, 'AI_BACKEND', 'keras')
+            model_path = getattr(settings, 'AI_MODEL_PATH', None) or default_model_path(backend_name)
             if os.path.exists(model_path):
-                self.model = tf.keras.models.load_model(model_path)
+                self.model = load_backend(backend_name, model_path)
                 self.model_loaded = True
-                logger.info("✅ Model loaded")
+                self.load_seconds = time.perf_counter() - started
+                logger.info(f"✅ Model loaded ({backend_name}) in {self.load_seconds:.2f}s")
+            else:
+                logger.error(f"Model tidak ditemukan: {model_path}")
         except Exception as e:
             logger.error(e)
 
-    def predict(self, image_path, lahan_id=None):
+    @property
+    def model_version(self):
+        """
+        Identitas model untuk key cache prediksi. Pakai AI_MODEL_VERSION jika
+        diset, selain itu backend + nama file + mtime model (tanpa memuat model).
+        """
+        version = getattr(settings, 'AI_MODEL_VERSION', None)
+        if version:
+            return version
+        backend_name = getattr(settings, 'AI_BACKEND', 'keras')
+        model_path = getattr(settings, 'AI_MODEL_PATH', None) or default_model_path(backend_name)
         try:
-            img = Image.open(image_path).convert('RGB')
-            img = img.resize((150, 150))
-            img_array = np.array(img) / 255.0
-            img_array = np.expand_dims(img_array, axis=0)
-
-            predictions = self.model.predict(img_array, verbose=0)
-            confidence = float(np.max(predictions[0]))
-            class_idx = int(np.argmax(predictions[0]))
-            class_name = self.class_names[class_idx]
-
-            is_healthy = class_name.endswith('healthy')
-
-            # ====== LOGIKA NORMAL ======
-            if is_healthy:
-                condition = 'SEHAT'
-                severity = 'Aman'
+            mtime = int(os.path.getmtime(model_path))
+        except OSError:
+            mtime = 0
+        return f"{backend_name}:{os.path.basename(model_path)}:{mtime}"
+
+    def ensure_model(self):
+        """Muat model saat pertama kali dibutuhkan (sekali per proses)"""
+        if self.inference_client is not None or self._load_attempted:
+            return
+        with self._load_lock:
+            if not self._load_attempted:
+                self.load_model()
+                self._load_attempted = True
+
+    def warmup(self):
+        """
+        Muat model dan jalankan satu prediksi dummy agar request pertama tidak
+        menanggung biaya inisialisasi. Return durasi dalam detik.
+        """
+        started = time.perf_counter()
+        self.ensure_model()
+        if self.model_loaded or self.inference_client is not None:
+            self._predict_array_batch(np.zeros((1,) + IMG_SIZE + (3,), dtype=np.float32))
+        return time.perf_counter() - started
+
+    def preprocess(self, image):
+        """
+        Ubah input gambar menjadi array float (150, 150, 3) bernilai 0-1.
+        Input boleh berupa path, bytes, file-like (mis. UploadedFile) atau
+        array yang sudah didecode.
+        """
+        if isinstance(image, np.ndarray):
+            img_array = image.astype(np.float32)
+            if img_array.shape != IMG_SIZE + (3,):
+                img = Image.fromarray(np.uint8(img_array)).convert('RGB').resize(IMG_SIZE)
+                img_array = np.asarray(img, dtype=np.float32)
+            if img_array.max() > 1.0:
+                img_array = img_array / 255.0
+            return img_array
+
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = io.BytesIO(image)
+        elif hasattr(image, 'seek'):
+            image.seek(0)
+
+        img = Image.open(image)
+        if getattr(settings, 'AI_JPEG_DRAFT', True):
+            # JPEG didecode langsung pada skala 1/2, 1/4 atau 1/8 yang masih
+            # >= 150 px, jauh lebih murah daripada decode resolusi penuh
+            img.draft('RGB', IMG_SIZE)
+        img = img.convert('RGB').resize(IMG_SIZE)
+        return np.asarray(img, dtype=np.float32) / 255.0
+
+    def _predict_array_batch(self, batch):
+        """Satu panggilan model untuk tensor (N, 150, 150, 3)"""
+        if self.inference_client is not None:
+            return self.inference_client.predict(batch)
+        self.ensure_model()
+        if self.model is None:
+            raise RuntimeError('Model CNN belum tersedia')
+        return self.model.predict(batch)
+
+    def _build_result(self, probabilities):
+        confidence = float(np.max(probabilities))
+        class_idx = int(np.argmax(probabilities))
+        class_name = self.class_names[class_idx]
+
+        is_healthy = class_name.endswith('healthy')
+
+        # ====== LOGIKA NORMAL ======
+        if is_healthy:
+            condition = 'SEHAT'
+            severity = 'Aman'
+        else:
+            condition = 'TERDETEKSI'
+            if confidence >= 0.85:
+                severity = 'Tinggi'
+            elif confidence >= 0.70:
+                severity = 'Sedang'
             else:
-                condition = 'TERDETEKSI'
-                if confidence >= 0.85:
-                    severity = 'Tinggi'
-                elif confidence >= 0.70:
-                    severity = 'Sedang'
-                else:
-                    severity = 'Rendah'
+                severity = 'Rendah'
 
-            disease_info = self.disease_info.get(class_name, {})
+        disease_info = self.disease_info.get(class_name, {})
 
-            return {
-                'success': True,
-                'condition': condition,
-                'prediction': {
-                    'class_name': class_name,
-                    'display_name': disease_info.get('display_name', class_name),
-                    'confidence': round(confidence * 100, 2),
-                    'severity': severity,
-                    'disease_info': disease_info
-                },
-                'mode': 'trained_cnn'
-            }
+        return {
+            'success': True,
+            'condition': condition,
+            'prediction': {
+                'class_name': class_name,
+                'display_name': disease_info.get('display_name', class_name),
+                'confidence': round(confidence * 100, 2),
+                'severity': severity,
+                'disease_info': disease_info
+            },
+            'mode': 'trained_cnn'
+        }
+
+    def predict(self, image, lahan_id=None):
+        """Prediksi satu gambar (path, bytes, file-like atau array)"""
+        try:
+            img_array = self.preprocess(image)
+
+            with ai_timer():
+                if self.batcher is not None:
+                    probabilities = self.batcher.predict(img_array)
+                else:
+                    probabilities = self._predict_array_batch(np.expand_dims(img_array, axis=0))[0]
+
+            return self._build_result(probabilities)
 
         except Exception as e:
             return {
@@ -197,4 +319,38 @@ class PestDetectionAI:
                 'error': str(e)
             }
 
+    def predict_batch(self, paths_or_arrays):
+        """
+        Prediksi banyak gambar dengan satu panggilan model.
+        Return list hasil dengan urutan sama seperti input; gambar yang gagal
+        dibaca mendapat {'success': False, 'error': ...} tanpa menggagalkan yang lain.
+        """
+        results = [None] * len(paths_or_arrays)
+        arrays, indexes = [], []
+
+        for i, item in enumerate(paths_or_arrays):
+            try:
+                arrays.append(self.preprocess(item))
+                indexes.append(i)
+            except Exception as e:
+                results[i] = {'success': False, 'error': str(e)}
+
+        if arrays:
+            try:
+                batch_size = getattr(settings, 'AI_BATCH_MAX_SIZE', 32)
+                for start in range(0, len(arrays), batch_size):
+                    chunk = np.stack(arrays[start:start + batch_size], axis=0)
+                    with ai_timer():
+                        outputs = self._predict_array_batch(chunk)
+                    for offset, probabilities in enumerate(outputs):
+                        results[indexes[start + offset]] = self._build_result(probabilities)
+            except Exception as e:
+                for i in indexes:
+                    if results[i] is None:
+                        results[i] = {'success': False, 'error': str(e)}
+
+        return results
+
+# Murah untuk dibuat: TensorFlow dan model baru dimuat saat prediksi pertama
+# (atau lewat warmup(), lihat DashboardConfig.ready / manage.py warmup_ai)
 pest_ai = PestDetectionAI()
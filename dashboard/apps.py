@@ -1,6 +1,25 @@
+import logging
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        # Opsional: muat model CNN di background saat worker web start, supaya
+        # request deteksi pertama tidak menunggu TensorFlow. Default mati agar
+        # perintah manage.py (migrate, check, shell) tetap cepat.
+        if getattr(settings, 'AI_WARMUP_ON_STARTUP', False):
+            from .ai_service import pest_ai
+
+            def _warmup():
+                seconds = pest_ai.warmup()
+                logger.info(f"AI warm-up selesai dalam {seconds:.2f}s")
+
+            threading.Thread(target=_warmup, name='ai-warmup', daemon=True).start()
@@ -0,0 +1,339 @@
+# dashboard/detection_service.py
+"""
+Penyimpanan hasil deteksi AI ke database dan pemrosesan job deteksi async.
+
+Dipakai bersama oleh endpoint sinkron (proses_deteksi_ai), job runner
+(manage.py run_detection_worker) dan status endpoint.
+"""
+import logging
+from datetime import timedelta
+
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .ai_service import pest_ai
+from .geo_tiles import catat_deteksi
+from .models import CitraDaun, HasilDeteksi, JenisHama, RiwayatDeteksi
+
+logger = logging.getLogger(__name__)
+
+TINGKAT_MAPPING = {
+    'Rendah': 'ringan',
+    'Sedang': 'sedang',
+    'Tinggi': 'berat'
+}
+SEVERITY_FROM_TINGKAT = {v: k for k, v in TINGKAT_MAPPING.items()}
+
+
+def get_jenis_hama(display_name, disease_info):
+    """Cari atau buat JenisHama untuk hasil prediksi"""
+    jenis_hama, created = JenisHama.objects.get_or_create(
+        nama=display_name,
+        defaults={
+            'nama_latin': disease_info.get('latin_name', '-'),
+            'deskripsi': disease_info.get('description', ''),
+            'gejala': disease_info.get('symptoms', ''),
+            'cara_pencegahan': disease_info.get('prevention', ''),
+            'cara_penanganan': disease_info.get('treatment', '')
+        }
+    )
+    if created:
+        logger.info(f"🆕 JenisHama baru dibuat: {display_name}")
+    return jenis_hama
+
+
+def buat_rekomendasi(is_healthy, severity, disease_info):
+    if is_healthy:
+        return disease_info.get('treatment',
+            "✅ Tanaman dalam kondisi sehat. Lanjutkan perawatan rutin dan monitoring berkala.")
+
+    base_recommendation = disease_info.get('treatment', '')
+    if severity == 'Tinggi':
+        urgency = "⚠️ SEGERA TANGANI! "
+    elif severity == 'Sedang':
+        urgency = "⚠️ Perlu Perhatian. "
+    else:
+        urgency = "ℹ️ Monitoring Diperlukan. "
+    return urgency + base_recommendation
+
+
+def build_hasil_deteksi(citra, hasil_ai, jenis_hama=None):
+    """
+    Buat instance HasilDeteksi (belum disimpan) dari hasil PestDetectionAI.
+    Return (hasil_deteksi, is_healthy).
+    """
+    prediction = hasil_ai['prediction']
+    class_name = prediction['class_name']
+    display_name = prediction.get('display_name', class_name)
+    severity = prediction['severity']
+    disease_info = prediction.get('disease_info', {})
+
+    is_healthy = 'healthy' in class_name.lower()
+    if jenis_hama is None:
+        jenis_hama = get_jenis_hama(display_name, disease_info)
+
+    tingkat_serangan = TINGKAT_MAPPING.get(severity, 'sedang')
+    hasil_deteksi = HasilDeteksi(
+        citra=citra,
+        jenis_hama=jenis_hama,
+        confidence_score=prediction['confidence'],
+        tingkat_serangan=tingkat_serangan if not is_healthy else 'ringan',
+        jumlah_daun_terinfeksi=1 if not is_healthy else 0,
+        rekomendasi=buat_rekomendasi(is_healthy, severity, disease_info),
+        waktu_deteksi=timezone.now()
+    )
+    return hasil_deteksi, is_healthy
+
+
+def simpan_hasil_deteksi(citra, hasil_ai, lahan=None):
+    """
+    Simpan HasilDeteksi + RiwayatDeteksi dan tandai CitraDaun selesai.
+    Return (hasil_deteksi, riwayat).
+    """
+    with transaction.atomic():
+        hasil_deteksi, is_healthy = build_hasil_deteksi(citra, hasil_ai)
+        hasil_deteksi.save()
+
+        citra.status_deteksi = 'completed'
+        citra.waktu_deteksi = timezone.now()
+        citra.save(update_fields=['status_deteksi', 'waktu_deteksi'])
+
+        riwayat = RiwayatDeteksi.objects.create(
+            petani=citra.petani,
+            hasil_deteksi=hasil_deteksi,
+            lahan=lahan,
+            catatan_petani='',
+            status_penanganan='belum' if not is_healthy else 'selesai'
+        )
+        catat_deteksi(lahan or citra.lahan, [hasil_deteksi])
+    return hasil_deteksi, riwayat
+
+
+def simpan_batch_deteksi(petani, lahan, uploads, hasil_list, jenis_tanaman='Cabai/Tomat'):
+    """
+    Simpan hasil deteksi banyak citra dalam satu transaksi.
+    `uploads` adalah list file Django (UploadedFile / ContentFile) dan
+    `hasil_list` hasil predict_batch dengan urutan yang sama.
+    Return list (citra, hasil_deteksi | None, riwayat | None).
+    """
+    now = timezone.now()
+    jenis_cache = {}
+
+    with transaction.atomic():
+        citra_list = [
+            CitraDaun(
+                petani=petani,
+                lahan=lahan,
+                nama_file=upload.name,
+                path_file=upload,
+                jenis_tanaman=jenis_tanaman,
+                status_deteksi='completed' if hasil_ai.get('success', False) else 'failed',
+                waktu_deteksi=now if hasil_ai.get('success', False) else None,
+            )
+            for upload, hasil_ai in zip(uploads, hasil_list)
+        ]
+        # HasilDeteksi memakai PK citra, jadi ID CitraDaun harus diketahui.
+        # MySQL tidak mengembalikan ID dari bulk insert -> simpan satu per satu
+        if connection.features.can_return_rows_from_bulk_insert:
+            CitraDaun.objects.bulk_create(citra_list)
+        else:
+            for citra in citra_list:
+                citra.save()
+
+        hasil_objs, riwayat_objs, rows = [], [], []
+        for citra, hasil_ai in zip(citra_list, hasil_list):
+            if not hasil_ai.get('success', False):
+                rows.append((citra, None, None))
+                continue
+
+            prediction = hasil_ai['prediction']
+            display_name = prediction.get('display_name', prediction['class_name'])
+            if display_name not in jenis_cache:
+                jenis_cache[display_name] = get_jenis_hama(display_name, prediction.get('disease_info', {}))
+
+            hasil_deteksi, is_healthy = build_hasil_deteksi(citra, hasil_ai, jenis_cache[display_name])
+            riwayat = RiwayatDeteksi(
+                petani=petani,
+                hasil_deteksi=hasil_deteksi,
+                lahan=lahan,
+                catatan_petani='',
+                status_penanganan='belum' if not is_healthy else 'selesai'
+            )
+            hasil_objs.append(hasil_deteksi)
+            riwayat_objs.append(riwayat)
+            rows.append((citra, hasil_deteksi, riwayat))
+
+        HasilDeteksi.objects.bulk_create(hasil_objs)
+        # riwayat_id dikembalikan ke client -> sama seperti CitraDaun di atas
+        if connection.features.can_return_rows_from_bulk_insert:
+            RiwayatDeteksi.objects.bulk_create(riwayat_objs)
+        else:
+            for riwayat in riwayat_objs:
+                riwayat.save()
+        catat_deteksi(lahan, hasil_objs)
+
+    return rows
+
+
+def ringkasan_infeksi(hasil_list):
+    """Ringkasan agregat infeksi untuk satu lahan dari list hasil predict_batch"""
+    sukses = [h for h in hasil_list if h.get('success', False)]
+    sakit = [h for h in sukses if 'healthy' not in h['prediction']['class_name'].lower()]
+
+    return {
+        'total_citra': len(hasil_list),
+        'berhasil': len(sukses),
+        'gagal': len(hasil_list) - len(sukses),
+        'sehat': len(sukses) - len(sakit),
+        'terinfeksi': len(sakit),
+        'persentase_infeksi': round(len(sakit) * 100 / len(sukses), 1) if sukses else 0,
+        'rata_confidence': round(sum(h['prediction']['confidence'] for h in sukses) / len(sukses), 2) if sukses else 0,
+        'per_penyakit': dict(Counter(h['prediction']['display_name'] for h in sakit).most_common()),
+        'per_tingkat': dict(Counter(h['prediction']['severity'] for h in sakit)),
+    }
+
+
+def prediction_payload(hasil_ai):
+    """Bagian 'prediction' / 'condition' / 'is_healthy' dari response API deteksi"""
+    prediction = hasil_ai['prediction']
+    class_name = prediction['class_name']
+    display_name = prediction.get('display_name', class_name)
+    disease_info = prediction.get('disease_info', {})
+    is_healthy = 'healthy' in class_name.lower()
+
+    return {
+        'prediction': {
+            'class_name': class_name,
+            'display_name': display_name,
+            'pest_name': display_name,
+            'confidence': prediction['confidence'],
+            'severity': prediction['severity'],
+            'disease_info': {
+                'description': disease_info.get('description', ''),
+                'symptoms': disease_info.get('symptoms', ''),
+                'prevention': disease_info.get('prevention', ''),
+                'treatment': disease_info.get('treatment', ''),
+                'latin_name': disease_info.get('latin_name', '')
+            }
+        },
+        'condition': 'SEHAT' if is_healthy else 'TERDETEKSI PENYAKIT',
+        'is_healthy': is_healthy,
+    }
+
+
+def hasil_to_ai_result(hasil):
+    """
+    Bangun ulang dict hasil PestDetectionAI dari HasilDeteksi yang tersimpan
+    (dipakai status endpoint untuk job async).
+    """
+    display_name = hasil.jenis_hama.nama
+    class_name = display_name
+    disease_info = {}
+    for name, info in pest_ai.disease_info.items():
+        if info.get('display_name') == display_name:
+            class_name, disease_info = name, info
+            break
+
+    is_healthy = 'healthy' in class_name.lower() or hasil.jumlah_daun_terinfeksi == 0
+    severity = 'Aman' if is_healthy else SEVERITY_FROM_TINGKAT.get(hasil.tingkat_serangan, 'Sedang')
+
+    return {
+        'success': True,
+        'prediction': {
+            'class_name': class_name,
+            'display_name': display_name,
+            'confidence': float(hasil.confidence_score),
+            'severity': severity,
+            'disease_info': disease_info or {
+                'latin_name': hasil.jenis_hama.nama_latin,
+                'description': hasil.jenis_hama.deskripsi,
+                'symptoms': hasil.jenis_hama.gejala,
+                'prevention': hasil.jenis_hama.cara_pencegahan,
+                'treatment': hasil.jenis_hama.cara_penanganan,
+            },
+        },
+    }
+
+
+# ========================================
+# JOB DETEKSI ASYNC (antrian = CitraDaun berstatus 'pending')
+# ========================================
+
+def claim_pending_jobs(limit=32):
+    """
+    Ambil sampai `limit` CitraDaun 'pending' (FIFO) dan ubah ke 'processing'.
+    Klaim dilakukan dengan UPDATE bersyarat per baris sehingga beberapa worker
+    bisa berjalan bersamaan tanpa memproses citra yang sama.
+    """
+    candidate_ids = list(
+        CitraDaun.objects
+        .filter(status_deteksi='pending')
+        .order_by('waktu_upload', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    claimed = [
+        citra_id for citra_id in candidate_ids
+        if CitraDaun.objects.filter(id=citra_id, status_deteksi='pending')
+        .update(status_deteksi='processing', processing_started=timezone.now()) == 1
+    ]
+    return list(
+        CitraDaun.objects
+        .filter(id__in=claimed)
+        .select_related('petani', 'lahan')
+        .order_by('waktu_upload', 'id')
+    )
+
+
+def process_pending_jobs(limit=32):
+    """Proses satu batch job pending dengan satu panggilan predict_batch. Return jumlah job."""
+    jobs = claim_pending_jobs(limit)
+    if not jobs:
+        return 0
+
+    images = []
+    for citra in jobs:
+        try:
+            with citra.path_file.open('rb') as f:
+                images.append(f.read())
+        except Exception as e:
+            images.append(None)
+            logger.error(f"Gagal membaca citra {citra.id}: {e}")
+
+    readable = [img for img in images if img is not None]
+    results = iter(pest_ai.predict_batch(readable))
+
+    for citra, image_bytes in zip(jobs, images):
+        hasil_ai = next(results) if image_bytes is not None else {'success': False}
+        try:
+            if not hasil_ai.get('success', False):
+                raise RuntimeError(hasil_ai.get('error', 'File citra tidak dapat dibaca'))
+            simpan_hasil_deteksi(citra, hasil_ai, lahan=citra.lahan)
+        except Exception as e:
+            logger.error(f"❌ Job deteksi citra {citra.id} gagal: {e}")
+            CitraDaun.objects.filter(id=citra.id).update(status_deteksi='failed')
+
+    return len(jobs)
+
+
+def requeue_jobs(failed=True, stuck_minutes=None):
+    """
+    Kembalikan job ke antrian: citra 'failed' dan/atau citra 'processing' yang
+    diklaim worker lebih lama dari `stuck_minutes` lalu tanpa HasilDeteksi
+    (worker mati). Lama antri sebelum diklaim tidak dihitung.
+    """
+    total = 0
+    if failed:
+        total += CitraDaun.objects.filter(status_deteksi='failed').update(status_deteksi='pending')
+    if stuck_minutes:
+        batas = timezone.now() - timedelta(minutes=stuck_minutes)
+        # Baris processing lama (sebelum kolom processing_started ada) memakai waktu_upload
+        diklaim_lama = Q(processing_started__lt=batas) | Q(processing_started__isnull=True, waktu_upload__lt=batas)
+        total += (
+            CitraDaun.objects
+            .filter(diklaim_lama, status_deteksi='processing', hasil_deteksi__isnull=True)
+            .update(status_deteksi='pending', processing_started=None)
+        )
+    return total
@@ -0,0 +1,216 @@
+# dashboard/geo_tiles.py
+"""
+Indeks grid spasial untuk peta sebaran serangan hama.
+
+Koordinat Lahan dipetakan ke geohash (GEOHASH_PRECISION karakter, default 5
+≈ 4,9 x 4,9 km). Setiap HasilDeteksi yang sakit menambah DeteksiTile
+(tanggal WIB, geohash, jenis hama) saat disimpan, sehingga peta cukup
+menjumlahkan tile dalam rentang tanggal tanpa memindai HasilDeteksi.
+Zoom lebih kasar dihitung dari prefix geohash (presisi 1..GEOHASH_PRECISION).
+
+Hitungan tercatat pada tile lahan saat deteksi terjadi; jika koordinat lahan
+diubah, jalankan `python manage.py rebuild_deteksi_tiles`.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import Substr, TruncDate
+from django.utils import timezone
+
+from .models import DeteksiTile, HasilDeteksi, JenisHama
+from .sensor_rollup import WIB, wib_wallclock
+
+logger = logging.getLogger(__name__)
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+
+def tile_precision():
+    return getattr(settings, 'GEOHASH_PRECISION', 5)
+
+
+# ---------------- geohash ----------------
+def encode(latitude, longitude, precision=None):
+    precision = precision or tile_precision()
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def decode_bbox(geohash):
+    """Return (min_lat, min_lon, max_lat, max_lon) dari sebuah geohash"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def is_geohash(value):
+    return bool(value) and all(c in _DECODE for c in value)
+
+
+def parse_koordinat(latitude, longitude):
+    """
+    Validasi input form latitude/longitude. Return (Decimal, Decimal), atau
+    (None, None) jika keduanya kosong. ValueError jika tidak valid.
+    """
+    latitude = (latitude or '').strip().replace(',', '.')
+    longitude = (longitude or '').strip().replace(',', '.')
+    if not latitude and not longitude:
+        return None, None
+    try:
+        lat, lon = Decimal(latitude), Decimal(longitude)
+    except InvalidOperation:
+        raise ValueError('Latitude dan longitude harus berupa angka desimal')
+    if not (lat.is_finite() and lon.is_finite()):
+        raise ValueError('Latitude dan longitude harus berupa angka desimal')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('Koordinat di luar rentang (lat -90..90, lon -180..180)')
+    return lat.quantize(Decimal('0.000001')), lon.quantize(Decimal('0.000001'))
+
+
+# ---------------- pencatatan tile ----------------
+def _tanggal(ts):
+    return ts.astimezone(WIB).date()
+
+
+def _increment(counts):
+    """counts: {(tanggal, tile, jenis_hama_id): jumlah} -> UPDATE jumlah + n atau INSERT"""
+    for (tanggal, tile, jenis_hama_id), jumlah in counts.items():
+        rows = DeteksiTile.objects.filter(tanggal=tanggal, tile=tile, jenis_hama_id=jenis_hama_id)
+        if rows.update(jumlah=F('jumlah') + jumlah):
+            continue
+        try:
+            with transaction.atomic():
+                DeteksiTile.objects.create(tanggal=tanggal, tile=tile, jenis_hama_id=jenis_hama_id, jumlah=jumlah)
+        except IntegrityError:
+            # Baris dibuat oleh request lain di antara UPDATE dan INSERT
+            rows.update(jumlah=F('jumlah') + jumlah)
+
+
+def catat_deteksi(lahan, hasil_list):
+    """
+    Tambahkan hasil deteksi (yang sakit) ke tile lahan. Dipanggil di dalam
+    transaksi yang menyimpan HasilDeteksi, jadi ikut rollback bersamanya.
+    """
+    if lahan is None or not lahan.geohash:
+        return
+    counts = defaultdict(int)
+    for hasil in hasil_list:
+        if hasil.jumlah_daun_terinfeksi > 0:
+            counts[(_tanggal(hasil.waktu_deteksi), lahan.geohash, hasil.jenis_hama_id)] += 1
+    _increment(counts)
+
+
+def rebuild_tiles(window=timedelta(days=30)):
+    """Hitung ulang seluruh DeteksiTile dari HasilDeteksi (per jendela waktu). Return jumlah deteksi."""
+    base = HasilDeteksi.objects.filter(jumlah_daun_terinfeksi__gt=0).exclude(citra__lahan__geohash='')
+    with transaction.atomic():
+        DeteksiTile.objects.all().delete()
+        start = base.aggregate(m=Min('waktu_deteksi'))['m']
+        if start is None:
+            return 0
+
+        total = 0
+        now = timezone.now()
+        start -= timedelta(microseconds=1)
+        while start < now:
+            end = start + window
+            rows = (
+                base
+                .filter(waktu_deteksi__gt=start, waktu_deteksi__lte=end, citra__lahan__isnull=False)
+                .annotate(tanggal=TruncDate(wib_wallclock('waktu_deteksi'), tzinfo=dt_timezone.utc))
+                .values('tanggal', 'citra__lahan__geohash', 'jenis_hama_id')
+                .annotate(jumlah=Count('citra_id'))
+                .order_by()
+            )
+            counts = {}
+            for r in rows:
+                if r['tanggal'] is None:
+                    logger.error(f"{r['jumlah']} deteksi tanpa tanggal WIB dilewati")
+                    continue
+                counts[(r['tanggal'], r['citra__lahan__geohash'], r['jenis_hama_id'])] = r['jumlah']
+            _increment(counts)
+            total += sum(counts.values())
+            start = end
+
+    logger.info(f"Tile deteksi dihitung ulang dari {total} deteksi")
+    return total
+
+
+# ---------------- query peta ----------------
+def tile_counts(tanggal_dari, tanggal_sampai, precision=None, prefix='', jenis_hama_id=None):
+    """
+    Jumlah deteksi per tile per jenis hama dalam rentang tanggal (WIB),
+    hanya dari tabel DeteksiTile. Return list tile urut total terbesar.
+    """
+    precision = min(precision or tile_precision(), tile_precision())
+    queryset = DeteksiTile.objects.filter(tanggal__gte=tanggal_dari, tanggal__lte=tanggal_sampai)
+    if prefix:
+        queryset = queryset.filter(tile__startswith=prefix)
+    if jenis_hama_id:
+        queryset = queryset.filter(jenis_hama_id=jenis_hama_id)
+
+    rows = (
+        queryset
+        .annotate(cell=Substr('tile', 1, precision))
+        .values('cell', 'jenis_hama_id')
+        .annotate(jumlah=Sum('jumlah'))
+        .order_by()
+    )
+
+    tiles = defaultdict(dict)
+    for r in rows:
+        tiles[r['cell']][r['jenis_hama_id']] = r['jumlah']
+    names = dict(JenisHama.objects.filter(
+        id__in={i for counts in tiles.values() for i in counts}
+    ).values_list('id', 'nama'))
+
+    result = []
+    for cell, counts in tiles.items():
+        min_lat, min_lon, max_lat, max_lon = decode_bbox(cell)
+        result.append({
+            'tile': cell,
+            'bbox': [round(min_lat, 6), round(min_lon, 6), round(max_lat, 6), round(max_lon, 6)],
+            'center': [round((min_lat + max_lat) / 2, 6), round((min_lon + max_lon) / 2, 6)],
+            'total': sum(counts.values()),
+            'hama': [
+                {'jenis_hama_id': i, 'nama': names.get(i, '-'), 'jumlah': n}
+                for i, n in sorted(counts.items(), key=lambda item: -item[1])
+            ],
+        })
+    result.sort(key=lambda t: -t['total'])
+    return result
@@ -0,0 +1,161 @@
+# dashboard/inference_server.py
+"""
+Server inferensi terpisah dari proses Django.
+
+Satu proses induk membuka Unix socket, lalu mem-fork beberapa worker yang
+masing-masing memuat model sekali dan melayani koneksi dari klien
+(`InferenceClient`). Worker Django hanya mengirim tensor yang sudah
+dipreproses dan menerima probabilitas kelas, sehingga TensorFlow tidak perlu
+dimuat di setiap worker gunicorn.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _authkey():
+    return getattr(settings, 'AI_INFERENCE_AUTHKEY', settings.SECRET_KEY).encode()
+
+
+class InferenceTimeout(Exception):
+    pass
+
+
+class InferenceClient:
+    """Klien ringan yang dipakai PestDetectionAI ketika AI_INFERENCE_SOCKET diset"""
+
+    def __init__(self, address, timeout=30):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, family='AF_UNIX', authkey=_authkey())
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, op, payload=None):
+        try:
+            conn = self._connection()
+            conn.send((op, payload))
+            if not conn.poll(self.timeout):
+                # Koneksi ini bisa masih menerima balasan terlambat, jadi dibuang
+                self._reset()
+                raise InferenceTimeout(f'Inference server tidak merespons dalam {self.timeout} detik')
+            status, result = conn.recv()
+        except (EOFError, OSError):
+            self._reset()
+            raise
+
+        if status != 'ok':
+            raise RuntimeError(result)
+        return result
+
+    def predict(self, batch):
+        return self._call('predict', batch)
+
+    def ping(self):
+        return self._call('ping')
+
+
+def _run_batch(ai, batch):
+    if ai.batcher is None:
+        return ai._predict_array_batch(batch)
+    futures = [ai.batcher.submit(row) for row in batch]
+    return np.stack([f.result() for f in futures], axis=0)
+
+
+def _handle_connection(conn, ai):
+    try:
+        while True:
+            try:
+                op, payload = conn.recv()
+            except EOFError:
+                break
+
+            try:
+                if op == 'predict':
+                    conn.send(('ok', _run_batch(ai, payload)))
+                elif op == 'ping':
+                    conn.send(('ok', {'pid': os.getpid(), 'model_loaded': ai.model_loaded}))
+                else:
+                    conn.send(('error', f'Unknown op: {op}'))
+            except Exception as e:
+                logger.error(f"Inference error: {e}")
+                conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+def _worker_main(listener):
+    # Import di dalam worker agar TensorFlow dimuat setelah fork
+    from .ai_service import PestDetectionAI
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ai = PestDetectionAI(inference_client=None)
+    ai.warmup()
+    logger.info(f"Inference worker {os.getpid()} siap (model_loaded={ai.model_loaded})")
+
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            logger.error(f"Accept gagal: {e}")
+            continue
+        # Satu thread per koneksi; MicroBatcher milik worker menggabungkan
+        # request dari banyak klien menjadi satu batch
+        threading.Thread(
+            target=_handle_connection, args=(conn, ai), daemon=True
+        ).start()
+
+
+def serve(address, workers=2):
+    """Jalankan server (blocking) dengan `workers` proses pre-fork"""
+    if os.path.exists(address):
+        os.unlink(address)
+
+    listener = Listener(address, family='AF_UNIX', authkey=_authkey())
+    ctx = multiprocessing.get_context('fork')
+    processes = []
+
+    def spawn():
+        p = ctx.Process(target=_worker_main, args=(listener,), daemon=True)
+        p.start()
+        return p
+
+    try:
+        processes = [spawn() for _ in range(workers)]
+
+        # Supervisi: worker yang mati (mis. OOM saat inferensi) diganti baru
+        while True:
+            for i, p in enumerate(processes):
+                p.join(timeout=1)
+                if not p.is_alive():
+                    logger.warning(f"Inference worker {p.pid} berhenti (exit={p.exitcode}), restart")
+                    processes[i] = spawn()
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+        listener.close()
+        if os.path.exists(address):
+            os.unlink(address)
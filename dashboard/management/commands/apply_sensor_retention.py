@@ -0,0 +1,30 @@
+# dashboard/management/commands/apply_sensor_retention.py
+from django.core.management.base import BaseCommand
+
+from dashboard.sensor_retention import apply_retention
+
+
+class Command(BaseCommand):
+    help = (
+        'Arsipkan data sensor mentah yang lebih tua dari SENSOR_RAW_RETENTION_DAYS ke .npz '
+        'per device per bulan, hapus per batch, dan pangkas rollup per menit. '
+        'Jalankan setelah compact_sensor_rollups; jangan jalankan dua proses sekaligus.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Hari data mentah disimpan (default: setting)')
+        parser.add_argument('--minute-days', type=int, help='Hari rollup per menit disimpan (default: setting)')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--max-batches', type=int, help='Batasi jumlah batch per run')
+
+    def handle(self, *args, **options):
+        result = apply_retention(
+            raw_days=options['days'],
+            minute_days=options['minute_days'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(
+            f"🗄️ {result['raw_archived']} data mentah diarsipkan, "
+            f"{result['minute_rollups_pruned']} rollup per menit dipangkas"
+        )
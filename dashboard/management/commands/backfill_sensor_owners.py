@@ -0,0 +1,20 @@
+# dashboard/management/commands/backfill_sensor_owners.py
+from django.core.management.base import BaseCommand
+
+from dashboard.models import PerangkatSensor, SensorData, SensorRollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Isi petani/lahan pada SensorData dan SensorRollup lama yang belum '
+        'terpetakan, berdasarkan PerangkatSensor aktif. Jalankan setelah '
+        'mendaftarkan device baru di admin.'
+    )
+
+    def handle(self, *args, **options):
+        total_data = total_rollup = 0
+        for perangkat in PerangkatSensor.objects.filter(aktif=True).select_related('lahan'):
+            owner = {'petani_id': perangkat.lahan.petani_id, 'lahan_id': perangkat.lahan_id}
+            total_data += SensorData.objects.filter(device_id=perangkat.device_id, lahan__isnull=True).update(**owner)
+            total_rollup += SensorRollup.objects.filter(device_id=perangkat.device_id, lahan__isnull=True).update(**owner)
+        self.stdout.write(f"📡 {total_data} data sensor dan {total_rollup} rollup dipetakan ke lahan")
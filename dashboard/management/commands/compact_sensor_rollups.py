@@ -0,0 +1,26 @@
+# dashboard/management/commands/compact_sensor_rollups.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.sensor_rollup import compact_rollups
+
+
+class Command(BaseCommand):
+    help = 'Agregasikan SensorData baru ke tabel rollup per menit / jam / hari (incremental)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--loop', action='store_true', help='Jalankan terus setiap --interval detik')
+        parser.add_argument('--interval', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                total = compact_rollups(batch_size=options['batch_size'])
+                self.stdout.write(f"📊 {total} data sensor diagregasi ke rollup")
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Kompaksi rollup dihentikan')
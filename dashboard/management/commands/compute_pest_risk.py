@@ -0,0 +1,29 @@
+# dashboard/management/commands/compute_pest_risk.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.pest_risk import compute_risk
+from dashboard.sensor_rollup import compact_rollups
+
+
+class Command(BaseCommand):
+    help = 'Hitung skor risiko penyakit per lahan dari rollup sensor per jam (incremental)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compact', action='store_true', help='Jalankan kompaksi rollup sensor terlebih dahulu')
+        parser.add_argument('--loop', action='store_true', help='Jalankan terus setiap --interval detik')
+        parser.add_argument('--interval', type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                if options['compact']:
+                    compact_rollups()
+                total = compute_risk()
+                self.stdout.write(f"🌦️ Risiko hama diperbarui untuk {total} lahan")
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Perhitungan risiko dihentikan')
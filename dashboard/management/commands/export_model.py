@@ -0,0 +1,159 @@
+# dashboard/management/commands/export_model.py
+import os
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.ai_backends import default_model_path, load_backend
+from dashboard.ai_service import pest_ai
+
+
+class Command(BaseCommand):
+    help = (
+        'Konversi model Keras (.h5) ke TFLite / ONNX dengan kuantisasi opsional, '
+        'lalu bandingkan akurasi & latensi terhadap model Keras'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['tflite', 'onnx'], default='tflite')
+        parser.add_argument(
+            '--quantize',
+            choices=['none', 'dynamic', 'int8'],
+            default='none',
+            help='Kuantisasi post-training (hanya untuk TFLite)',
+        )
+        parser.add_argument('--output', default=None, help='Path file hasil export')
+        parser.add_argument(
+            '--dataset',
+            default=os.path.join(settings.BASE_DIR, 'Training', 'Dataset'),
+            help='Folder dataset (satu subfolder per kelas) untuk kalibrasi & evaluasi',
+        )
+        parser.add_argument('--calibration-samples', type=int, default=10, help='Gambar per kelas untuk kalibrasi int8')
+        parser.add_argument('--eval-samples', type=int, default=20, help='Gambar per kelas untuk evaluasi akurasi')
+        parser.add_argument('--seed', type=int, default=42)
+
+    # ---------------- dataset ----------------
+    def _sample_dataset(self, dataset_dir, per_class, seed, exclude=()):
+        rng = random.Random(seed)
+        samples = []
+        for label, class_name in enumerate(pest_ai.class_names):
+            folder = os.path.join(dataset_dir, class_name)
+            if not os.path.isdir(folder):
+                continue
+            files = sorted(
+                f for f in os.listdir(folder)
+                if f.lower().endswith(('.jpg', '.jpeg', '.png'))
+                and os.path.join(folder, f) not in exclude
+            )
+            for f in rng.sample(files, min(per_class, len(files))):
+                samples.append((os.path.join(folder, f), label))
+        return samples
+
+    def _load_arrays(self, samples):
+        return np.stack([pest_ai.preprocess(path) for path, _ in samples], axis=0)
+
+    # ---------------- konversi ----------------
+    def _convert_tflite(self, keras_model, quantize, calibration):
+        import tensorflow as tf
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+        if quantize in ('dynamic', 'int8'):
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantize == 'int8':
+            def representative_dataset():
+                for i in range(len(calibration)):
+                    yield [calibration[i:i + 1]]
+
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+        return converter.convert()
+
+    def _convert_onnx(self, keras_model, output):
+        try:
+            import tensorflow as tf
+            import tf2onnx
+        except ImportError:
+            raise CommandError('Export ONNX membutuhkan paket tf2onnx')
+
+        spec = (tf.TensorSpec((None, 150, 150, 3), tf.float32, name='input'),)
+        tf2onnx.convert.from_keras(keras_model, input_signature=spec, output_path=output)
+
+    # ---------------- evaluasi ----------------
+    def _evaluate(self, backend, arrays, labels, batch_size=32):
+        predictions = []
+        started = time.perf_counter()
+        for start in range(0, len(arrays), batch_size):
+            predictions.append(np.asarray(backend.predict(arrays[start:start + batch_size])))
+        elapsed = time.perf_counter() - started
+        predicted = np.argmax(np.concatenate(predictions, axis=0), axis=1)
+        accuracy = float(np.mean(predicted == labels))
+        return accuracy, elapsed * 1000 / max(len(arrays), 1), predicted
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        quantize = options['quantize']
+        if fmt == 'onnx' and quantize != 'none':
+            raise CommandError('Kuantisasi hanya didukung untuk format tflite')
+
+        keras_path = default_model_path('keras')
+        if not os.path.exists(keras_path):
+            raise CommandError(f'Model Keras tidak ditemukan: {keras_path}')
+
+        output = options['output'] or default_model_path(fmt)
+        if fmt == 'tflite' and quantize != 'none' and not options['output']:
+            output = output.replace('.tflite', f'_{quantize}.tflite')
+
+        self.stdout.write(f"📦 Memuat model Keras: {keras_path}")
+        keras_backend = load_backend('keras', keras_path)
+
+        dataset_dir = options['dataset']
+        eval_samples = []
+        if os.path.isdir(dataset_dir) and options['eval_samples'] > 0:
+            eval_samples = self._sample_dataset(dataset_dir, options['eval_samples'], options['seed'])
+
+        calibration = None
+        if quantize == 'int8':
+            if not os.path.isdir(dataset_dir):
+                raise CommandError(f'Kuantisasi int8 membutuhkan dataset kalibrasi: {dataset_dir}')
+            calib_samples = self._sample_dataset(
+                dataset_dir, options['calibration_samples'], options['seed'] + 1,
+                exclude={path for path, _ in eval_samples},
+            )
+            self.stdout.write(f"🎯 Kalibrasi int8 dengan {len(calib_samples)} gambar")
+            calibration = self._load_arrays(calib_samples)
+
+        self.stdout.write(f"🔄 Export ke {fmt} (quantize={quantize}) → {output}")
+        if fmt == 'tflite':
+            with open(output, 'wb') as f:
+                f.write(self._convert_tflite(keras_backend.model, quantize, calibration))
+        else:
+            self._convert_onnx(keras_backend.model, output)
+
+        keras_size = os.path.getsize(keras_path) / 1024 / 1024
+        output_size = os.path.getsize(output) / 1024 / 1024
+        self.stdout.write(f"   Ukuran: {keras_size:.2f} MB → {output_size:.2f} MB")
+
+        if not eval_samples:
+            self.stdout.write(self.style.WARNING('⚠️ Dataset tidak ditemukan, evaluasi akurasi dilewati'))
+            return
+
+        self.stdout.write(f"🧪 Evaluasi dengan {len(eval_samples)} gambar")
+        arrays = self._load_arrays(eval_samples)
+        labels = np.array([label for _, label in eval_samples])
+
+        keras_acc, keras_ms, keras_pred = self._evaluate(keras_backend, arrays, labels)
+        exported_acc, exported_ms, exported_pred = self._evaluate(load_backend(fmt, output), arrays, labels)
+        agreement = float(np.mean(keras_pred == exported_pred))
+
+        self.stdout.write(f"   Keras   : akurasi {keras_acc * 100:.2f}% | {keras_ms:.2f} ms/gambar")
+        self.stdout.write(f"   {fmt:<8}: akurasi {exported_acc * 100:.2f}% | {exported_ms:.2f} ms/gambar")
+        self.stdout.write(f"   Delta akurasi : {(exported_acc - keras_acc) * 100:+.2f} poin")
+        self.stdout.write(f"   Prediksi sama : {agreement * 100:.2f}%")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Selesai. Aktifkan dengan AI_BACKEND = '{fmt}' dan AI_MODEL_PATH = '{output}'"
+        ))
@@ -0,0 +1,26 @@
+# dashboard/management/commands/process_riwayat_exports.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.riwayat_export import process_pending_exports
+
+
+class Command(BaseCommand):
+    help = (
+        'Proses job export riwayat (EksporRiwayat) yang masih pending. '
+        'Dipakai jika RIWAYAT_EXPORT_THREAD = False.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Jalan terus (worker)')
+        parser.add_argument('--interval', type=float, default=10.0, help='Detik antar pengecekan dalam mode --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            total = process_pending_exports()
+            if total or not options['loop']:
+                self.stdout.write(f"📄 {total} export riwayat selesai dibuat")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
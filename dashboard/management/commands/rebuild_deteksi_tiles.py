@@ -0,0 +1,16 @@
+# dashboard/management/commands/rebuild_deteksi_tiles.py
+from django.core.management.base import BaseCommand
+
+from dashboard.geo_tiles import rebuild_tiles
+
+
+class Command(BaseCommand):
+    help = (
+        'Hitung ulang tabel DeteksiTile (peta sebaran hama) dari HasilDeteksi. '
+        'Perlu dijalankan sekali setelah koordinat lahan lama diisi, '
+        'atau setelah koordinat lahan diubah.'
+    )
+
+    def handle(self, *args, **options):
+        total = rebuild_tiles()
+        self.stdout.write(f"🗺️ Tile sebaran dihitung ulang dari {total} deteksi")
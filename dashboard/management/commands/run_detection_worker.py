@@ -0,0 +1,41 @@
+# dashboard/management/commands/run_detection_worker.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.detection_service import process_pending_jobs, requeue_jobs
+
+
+class Command(BaseCommand):
+    help = 'Job runner deteksi async: proses CitraDaun berstatus pending secara batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=32, help='Jumlah citra per batch inferensi')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Jeda (detik) saat antrian kosong')
+        parser.add_argument('--once', action='store_true', help='Proses antrian sampai kosong lalu keluar')
+        parser.add_argument('--retry-failed', action='store_true', help='Masukkan kembali citra failed ke antrian')
+        parser.add_argument(
+            '--requeue-stuck',
+            type=int,
+            default=None,
+            metavar='MENIT',
+            help='Masukkan kembali citra processing lebih lama dari MENIT (worker sebelumnya mati)',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed'] or options['requeue_stuck']:
+            total = requeue_jobs(failed=options['retry_failed'], stuck_minutes=options['requeue_stuck'])
+            self.stdout.write(f"♻️ {total} citra dikembalikan ke antrian")
+
+        self.stdout.write(self.style.SUCCESS('🚀 Detection worker berjalan'))
+        try:
+            while True:
+                processed = process_pending_jobs(limit=options['batch_size'])
+                if processed:
+                    self.stdout.write(f"✅ {processed} citra diproses")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Detection worker dihentikan')
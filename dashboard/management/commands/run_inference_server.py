@@ -0,0 +1,35 @@
+# dashboard/management/commands/run_inference_server.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.inference_server import serve
+
+
+class Command(BaseCommand):
+    help = 'Jalankan inference server CNN (Unix socket) yang dipakai bersama oleh semua worker Django'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            default=getattr(settings, 'AI_INFERENCE_SOCKET', None),
+            help='Path Unix socket (default: settings.AI_INFERENCE_SOCKET)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'AI_INFERENCE_WORKERS', 2),
+            help='Jumlah proses worker yang masing-masing memuat model',
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        if not socket_path:
+            raise CommandError('Tentukan --socket atau AI_INFERENCE_SOCKET di settings')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🤖 Inference server di {socket_path} dengan {options['workers']} worker"
+        ))
+        try:
+            serve(socket_path, workers=options['workers'])
+        except KeyboardInterrupt:
+            self.stdout.write('Inference server dihentikan')
@@ -0,0 +1,30 @@
+# dashboard/management/commands/warmup_ai.py
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.ai_service import pest_ai
+
+
+class Command(BaseCommand):
+    help = 'Muat model CNN dan ukur waktu startup (import TensorFlow, load model, prediksi pertama)'
+
+    def handle(self, *args, **options):
+        tf_loaded_before = 'tensorflow' in sys.modules
+
+        started = time.perf_counter()
+        total = pest_ai.warmup()
+        elapsed = time.perf_counter() - started
+
+        if pest_ai.inference_client is not None:
+            self.stdout.write(f"Mode inference server: {pest_ai.inference_client.address}")
+        elif not pest_ai.model_loaded:
+            self.stdout.write(self.style.ERROR('❌ Model tidak dapat dimuat'))
+            return
+
+        self.stdout.write(f"TensorFlow sudah dimuat sebelum warm-up: {tf_loaded_before}")
+        if pest_ai.load_seconds is not None:
+            self.stdout.write(f"Import TF + load model : {pest_ai.load_seconds:.2f}s")
+        self.stdout.write(f"Total warm-up          : {total:.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"✅ Warm-up selesai ({elapsed:.2f}s)"))
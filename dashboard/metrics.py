@@ -0,0 +1,243 @@
+# dashboard/metrics.py
+"""
+Instrumentasi per request: jumlah & durasi query SQL (lewat
+connection.execute_wrapper), latensi total, dan waktu inferensi AI per view.
+
+`RequestMetricsMiddleware` mengumpulkan angka per request; `registry`
+menyimpan sampel terakhir per view (METRICS_SAMPLE_SIZE) untuk persentil
+dan diekspos oleh `metrics_view` (/metrics, format teks Prometheus) untuk
+user staff atau scraper dengan header `Authorization: Bearer <METRICS_TOKEN>`.
+Alamat IP tidak dipakai: di belakang reverse proxy lokal semua request
+terlihat berasal dari 127.0.0.1. Request yang lebih lambat dari
+METRICS_SLOW_REQUEST_MS dicatat ke log beserta fingerprint query-nya,
+sehingga pola N+1 (query sama berulang puluhan kali) langsung terlihat.
+
+Angka disimpan per proses; dengan banyak worker, scrape tiap worker.
+"""
+import hmac
+import logging
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9, 0.99)
+SERIES = {
+    'latency_seconds': 'Latensi total request',
+    'db_queries': 'Jumlah query SQL per request',
+    'db_seconds': 'Total waktu query SQL per request',
+    'ai_seconds': 'Waktu inferensi AI per request',
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+# ---------------- fingerprint query ----------------
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?|\d+)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalisasi SQL: literal -> ?, daftar IN (...) diringkas, spasi dirapikan"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()[:500]
+
+
+# ---------------- data per request ----------------
+class RequestMetrics:
+    __slots__ = ('queries', 'db_seconds', 'ai_seconds', 'fingerprints')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.ai_seconds = 0.0
+        self.fingerprints = defaultdict(lambda: [0, 0.0])
+
+    def record_query(self, sql, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        entry = self.fingerprints[fingerprint(sql)]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def top_queries(self, limit=5):
+        return sorted(self.fingerprints.items(), key=lambda item: -item[1][1])[:limit]
+
+
+def _query_recorder(execute, sql, params, many, context):
+    metrics = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.record_query(sql, time.perf_counter() - started)
+
+
+@contextmanager
+def ai_timer():
+    """Catat durasi blok inferensi AI ke request aktif dan ke summary global"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.ai_seconds += seconds
+        registry.observe_inference(seconds)
+
+
+# ---------------- registry ----------------
+class _Summary:
+    """Sampel terakhir (untuk persentil) + sum/count kumulatif"""
+    __slots__ = ('samples', 'sum', 'count')
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.sum += value
+        self.count += 1
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: float('nan') for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._statuses = defaultdict(int)
+        self._inference = None
+
+    def _size(self):
+        return getattr(settings, 'METRICS_SAMPLE_SIZE', 1024)
+
+    def observe_request(self, view, method, status_code, latency, metrics):
+        with self._lock:
+            series = self._views.get(view)
+            if series is None:
+                series = self._views[view] = {name: _Summary(self._size()) for name in SERIES}
+            series['latency_seconds'].observe(latency)
+            series['db_queries'].observe(metrics.queries)
+            series['db_seconds'].observe(metrics.db_seconds)
+            series['ai_seconds'].observe(metrics.ai_seconds)
+            self._statuses[(view, method, status_code)] += 1
+
+    def observe_inference(self, seconds):
+        with self._lock:
+            if self._inference is None:
+                self._inference = _Summary(self._size())
+            self._inference.observe(seconds)
+
+    def render(self):
+        """Format teks Prometheus (exposition format 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, help_text in SERIES.items():
+                metric = f'agroguard_request_{name}'
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} summary')
+                for view, series in sorted(self._views.items()):
+                    summary = series[name]
+                    label = _escape(view)
+                    for q, value in summary.quantiles().items():
+                        lines.append(f'{metric}{{view="{label}",quantile="{q}"}} {value:.6g}')
+                    lines.append(f'{metric}_sum{{view="{label}"}} {summary.sum:.6g}')
+                    lines.append(f'{metric}_count{{view="{label}"}} {summary.count}')
+
+            lines.append('# HELP agroguard_requests_total Jumlah request per view, method dan status')
+            lines.append('# TYPE agroguard_requests_total counter')
+            for (view, method, status_code), count in sorted(self._statuses.items()):
+                lines.append(
+                    f'agroguard_requests_total{{view="{_escape(view)}",method="{method}",status="{status_code}"}} {count}'
+                )
+
+            if self._inference is not None:
+                lines.append('# HELP agroguard_ai_inference_seconds Durasi inferensi AI (termasuk di luar request)')
+                lines.append('# TYPE agroguard_ai_inference_seconds summary')
+                for q, value in self._inference.quantiles().items():
+                    lines.append(f'agroguard_ai_inference_seconds{{quantile="{q}"}} {value:.6g}')
+                lines.append(f'agroguard_ai_inference_seconds_sum {self._inference.sum:.6g}')
+                lines.append(f'agroguard_ai_inference_seconds_count {self._inference.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+# ---------------- middleware & endpoint ----------------
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == '/metrics':
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_query_recorder))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        # Untuk response streaming, latensi dihitung sampai header siap
+        latency = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else 'unresolved'
+        registry.observe_request(view, request.method, response.status_code, latency, metrics)
+
+        if latency * 1000 >= getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500):
+            top = '; '.join(
+                f'{count}x {seconds * 1000:.1f}ms {sql}' for sql, (count, seconds) in metrics.top_queries()
+            )
+            logger.warning(
+                f"Request lambat {request.method} {request.path} [{view}] {response.status_code}: "
+                f"{latency * 1000:.0f}ms, {metrics.queries} query {metrics.db_seconds * 1000:.0f}ms, "
+                f"AI {metrics.ai_seconds * 1000:.0f}ms | {top}"
+            )
+        return response
+
+
+def _metrics_allowed(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+
+
+def metrics_view(request):
+    """Endpoint Prometheus (/metrics): user staff atau bearer METRICS_TOKEN"""
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,81 @@
+# dashboard/micro_batcher.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Kumpulkan request inferensi yang datang hampir bersamaan menjadi satu batch.
+
+    Thread latar belakang menunggu item pertama, lalu menampung item lain
+    selama `window_ms` (atau sampai `max_batch_size`), menumpuknya menjadi satu
+    tensor dan memanggil `batch_fn` sekali. Setiap pemanggil menerima baris
+    hasilnya sendiri lewat Future. `timeout` (detik) membatasi lama
+    pemanggil predict() menunggu hasil.
+    """
+
+    def __init__(self, batch_fn, window_ms=10, max_batch_size=32, timeout=30.0):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='ai-micro-batcher', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, array):
+        """Masukkan satu gambar (H, W, C) ke antrian, return Future berisi baris prediksi"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((array, future))
+        return future
+
+    def predict(self, array, timeout=None):
+        return self.submit(array).result(timeout=self.timeout if timeout is None else timeout)
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            futures = [f for _, f in items]
+            try:
+                batch = np.stack([a for a, _ in items], axis=0)
+                outputs = self.batch_fn(batch)
+                if len(outputs) != len(futures):
+                    raise RuntimeError(f'Model mengembalikan {len(outputs)} baris untuk {len(futures)} input')
+                for future, row in zip(futures, outputs):
+                    future.set_result(row)
+            except Exception as e:
+                logger.error(f"Micro-batch gagal ({len(items)} item): {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
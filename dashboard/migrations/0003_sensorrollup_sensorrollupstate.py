@@ -0,0 +1,53 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_customuser_managers_alter_admin_divisi'),
+        ('dashboard', '0002_alter_sensordata_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorRollupState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_sensor_id', models.BigIntegerField(default=0)),
+                ('seen_max_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'sensor_rollup_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Per Menit'), ('hour', 'Per Jam'), ('day', 'Per Hari')], max_length=10)),
+                ('device_id', models.CharField(max_length=50)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0)),
+                ('temperature_min', models.FloatField(null=True)),
+                ('temperature_max', models.FloatField(null=True)),
+                ('humidity_sum', models.FloatField(default=0)),
+                ('humidity_min', models.FloatField(null=True)),
+                ('humidity_max', models.FloatField(null=True)),
+                ('soil_moisture_sum', models.FloatField(default=0)),
+                ('soil_moisture_min', models.FloatField(null=True)),
+                ('soil_moisture_max', models.FloatField(null=True)),
+                ('lahan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.lahan')),
+                ('petani', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.petani')),
+            ],
+            options={
+                'verbose_name': 'Rollup Sensor',
+                'verbose_name_plural': 'Rollup Sensor',
+                'db_table': 'sensor_rollup',
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='sensor_rollup_res_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'device_id', 'bucket_start'), name='uniq_sensor_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_sensorrollup_sensorrollupstate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['petani', 'device_id', '-timestamp'], name='sensor_data_petani_dev_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_sensordata_petani_device_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RisikoLahan',
+            fields=[
+                ('lahan', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='risiko', serialize=False, to='dashboard.lahan')),
+                ('last_hour', models.DateTimeField(help_text='Jam terakhir (awal bucket, UTC) yang sudah dihitung')),
+                ('window', models.BinaryField()),
+                ('indices', models.JSONField(default=dict)),
+                ('scores', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Risiko Lahan',
+                'verbose_name_plural': 'Risiko Lahan',
+                'db_table': 'risiko_lahan',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_risikolahan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensordata',
+            name='seq',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Nomor urut pembacaan dari device', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='sensordata',
+            constraint=models.UniqueConstraint(fields=('device_id', 'seq'), name='uniq_sensor_device_seq'),
+        ),
+    ]
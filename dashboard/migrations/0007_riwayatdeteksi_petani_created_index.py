@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_customuser_managers_alter_admin_divisi'),
+        ('dashboard', '0006_sensordata_seq'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='riwayatdeteksi',
+            index=models.Index(fields=['petani', '-created_at', '-id'], name='riwayat_petani_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_customuser_managers_alter_admin_divisi'),
+        ('dashboard', '0007_riwayatdeteksi_petani_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EksporRiwayat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF')], max_length=5)),
+                ('tanggal_dari', models.DateField(blank=True, null=True)),
+                ('tanggal_sampai', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Menunggu'), ('processing', 'Diproses'), ('done', 'Selesai'), ('failed', 'Gagal')], default='pending', max_length=20)),
+                ('file', models.FileField(blank=True, null=True, upload_to='ekspor_riwayat/%Y/%m/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('petani', models.ForeignKey(blank=True, help_text='Kosong = semua petani (admin)', null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.petani')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ekspor_riwayat', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ekspor Riwayat',
+                'verbose_name_plural': 'Ekspor Riwayat',
+                'db_table': 'ekspor_riwayat',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_eksporriwayat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hasildeteksi',
+            index=models.Index(fields=['waktu_deteksi'], name='hasil_deteksi_waktu_idx'),
+        ),
+    ]
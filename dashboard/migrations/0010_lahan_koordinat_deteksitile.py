@@ -0,0 +1,48 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_hasildeteksi_waktu_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lahan',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='lahan',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Longitude'),
+        ),
+        migrations.AddField(
+            model_name='lahan',
+            name='kode_wilayah',
+            field=models.CharField(blank=True, max_length=13, verbose_name='Kode Wilayah (Kemendagri)'),
+        ),
+        migrations.AddField(
+            model_name='lahan',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.CreateModel(
+            name='DeteksiTile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('tile', models.CharField(max_length=12)),
+                ('jumlah', models.IntegerField(default=0)),
+                ('jenis_hama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.jenishama')),
+            ],
+            options={
+                'verbose_name': 'Tile Deteksi',
+                'verbose_name_plural': 'Tile Deteksi',
+                'db_table': 'deteksi_tile',
+                'constraints': [models.UniqueConstraint(fields=('tanggal', 'tile', 'jenis_hama'), name='uniq_deteksi_tile_harian')],
+            },
+        ),
+    ]
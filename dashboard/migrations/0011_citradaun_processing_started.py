@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_lahan_koordinat_deteksitile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='citradaun',
+            name='processing_started',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
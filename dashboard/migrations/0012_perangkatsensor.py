@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_citradaun_processing_started'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerangkatSensor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=50, unique=True, verbose_name='Device ID')),
+                ('aktif', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('lahan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='perangkat_sensor', to='dashboard.lahan')),
+            ],
+            options={
+                'verbose_name': 'Perangkat Sensor',
+                'verbose_name_plural': 'Perangkat Sensor',
+                'db_table': 'perangkat_sensor',
+            },
+        ),
+    ]
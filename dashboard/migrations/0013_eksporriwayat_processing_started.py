@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_perangkatsensor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eksporriwayat',
+            name='processing_started',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
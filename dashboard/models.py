@@ -1,6 +1,8 @@
 # dashboard/models.py
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from accounts.models import Petani
 
 # ============================================
@@ -50,9 +52,19 @@ class SensorData(models.Model):
         help_text="Kelembapan tanah dalam persen (0-100%)"
     )
     
+    # default (bukan auto_now_add) supaya ingest batch bisa menyimpan
+    # timestamp dari device
     timestamp = models.DateTimeField(
-        auto_now_add=True,
-        help_text="Waktu data diterima"
+        default=timezone.now,
+        help_text="Waktu data diukur (default: waktu data diterima)"
+    )
+    
+    # Kunci idempotensi opsional: nomor urut dari device (monoton, tidak
+    # reset saat reboot). Kiriman ulang dengan seq yang sama diabaikan.
+    seq = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Nomor urut pembacaan dari device"
     )
     
     class Meta:
@@ -60,9 +72,14 @@ class SensorData(models.Model):
         verbose_name = 'Data Sensor'
         verbose_name_plural = 'Data Sensor'
         ordering = ['-timestamp']
+        constraints = [
+            # NULL tidak dianggap sama, jadi data tanpa seq tidak terpengaruh
+            models.UniqueConstraint(fields=['device_id', 'seq'], name='uniq_sensor_device_seq'),
+        ]
         indexes = [
             models.Index(fields=['-timestamp']),
             models.Index(fields=['device_id', '-timestamp']),
+            models.Index(fields=['petani', 'device_id', '-timestamp'], name='sensor_data_petani_dev_idx'),
         ]
     
     def __str__(self):
@@ -107,6 +124,10 @@ class Lahan(models.Model):
     )
     nama_lahan = models.CharField(max_length=100, verbose_name="Nama Unit")
     lokasi = models.CharField(max_length=255, verbose_name="Lokasi")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, verbose_name="Latitude")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, verbose_name="Longitude")
+    kode_wilayah = models.CharField(max_length=13, blank=True, verbose_name="Kode Wilayah (Kemendagri)")
+    geohash = models.CharField(max_length=12, blank=True, editable=False, db_index=True)
     luas_daerah = models.CharField(max_length=50, verbose_name="Luas Daerah")
     deskripsi = models.TextField(blank=True, verbose_name="Deskripsi")
     jenis_tanaman = models.CharField(max_length=100, default='Padi', verbose_name="Jenis Tanaman")
@@ -123,6 +144,18 @@ class Lahan(models.Model):
     def __str__(self):
         return f"{self.nama_lahan} - {self.petani.nama_lengkap}"
 
+    def save(self, *args, **kwargs):
+        # Tile peta sebaran hama selalu mengikuti koordinat terakhir
+        from .geo_tiles import encode
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
 
 # ============================================
 # MODEL CITRA DAUN (Upload Foto)
@@ -144,6 +177,8 @@ class CitraDaun(models.Model):
     status_deteksi = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     waktu_upload = models.DateTimeField(auto_now_add=True)
     waktu_deteksi = models.DateTimeField(null=True, blank=True)
+    # Waktu job diklaim worker (status processing); dasar deteksi job macet
+    processing_started = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = 'citra_daun'
@@ -205,6 +240,9 @@ class HasilDeteksi(models.Model):
         db_table = 'hasil_deteksi'
         verbose_name = "Hasil Deteksi"
         verbose_name_plural = "Hasil Deteksi"
+        indexes = [
+            models.Index(fields=['waktu_deteksi'], name='hasil_deteksi_waktu_idx'),
+        ]
 
     def __str__(self):
         return f"{self.jenis_hama.nama} - Confidence: {self.confidence_score}%"
@@ -235,6 +273,200 @@ class RiwayatDeteksi(models.Model):
         verbose_name = "Riwayat Deteksi"
         verbose_name_plural = "Riwayat Deteksi"
         ordering = ['-created_at']
+        indexes = [
+            # Pagination keyset riwayat per petani (created_at, id)
+            models.Index(fields=['petani', '-created_at', '-id'], name='riwayat_petani_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Riwayat {self.petani.nama_lengkap} - {self.created_at.strftime('%Y-%m-%d')}"
+
+# ============================================
+# MODEL ROLLUP SENSOR (agregat per menit / jam / hari)
+# ============================================
+class SensorRollup(models.Model):
+    """
+    Agregat SensorData per device per bucket waktu. Diisi secara incremental
+    oleh `python manage.py compact_sensor_rollups` (lihat dashboard/sensor_rollup.py).
+    Rata-rata = *_sum / count.
+    """
+    RESOLUTION_CHOICES = [
+        ('minute', 'Per Menit'),
+        ('hour', 'Per Jam'),
+        ('day', 'Per Hari'),
+    ]
+
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    device_id = models.CharField(max_length=50)
+    bucket_start = models.DateTimeField()
+    petani = models.ForeignKey(Petani, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    lahan = models.ForeignKey('Lahan', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    count = models.IntegerField(default=0)
+    temperature_sum = models.FloatField(default=0)
+    temperature_min = models.FloatField(null=True)
+    temperature_max = models.FloatField(null=True)
+    humidity_sum = models.FloatField(default=0)
+    humidity_min = models.FloatField(null=True)
+    humidity_max = models.FloatField(null=True)
+    soil_moisture_sum = models.FloatField(default=0)
+    soil_moisture_min = models.FloatField(null=True)
+    soil_moisture_max = models.FloatField(null=True)
+
+    class Meta:
+        db_table = 'sensor_rollup'
+        verbose_name = 'Rollup Sensor'
+        verbose_name_plural = 'Rollup Sensor'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['resolution', 'device_id', 'bucket_start'],
+                name='uniq_sensor_rollup_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start'], name='sensor_rollup_res_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} {self.resolution} {self.bucket_start:%Y-%m-%d %H:%M} ({self.count})"
+
+
+class SensorRollupState(models.Model):
+    """Watermark proses rollup: semua SensorData dengan id <= last_sensor_id sudah diagregasi"""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_sensor_id = models.BigIntegerField(default=0)
+    seen_max_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'sensor_rollup_state'
+
+    def __str__(self):
+        return f"{self.name}: {self.last_sensor_id}"
+
+
+# ============================================
+# MODEL RISIKO SERANGAN HAMA/PENYAKIT (dari data sensor)
+# ============================================
+class RisikoLahan(models.Model):
+    """
+    Skor risiko penyakit per Lahan dari deret waktu sensor per jam. Diisi
+    secara incremental oleh `python manage.py compute_pest_risk`
+    (lihat dashboard/pest_risk.py). `window` menyimpan jendela per jam
+    terakhir (float32, [jam][suhu, kelembapan, tanah]) sebagai state.
+    """
+    lahan = models.OneToOneField(
+        'Lahan',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='risiko'
+    )
+    last_hour = models.DateTimeField(help_text="Jam terakhir (awal bucket, UTC) yang sudah dihitung")
+    window = models.BinaryField()
+    indices = models.JSONField(default=dict)
+    scores = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'risiko_lahan'
+        verbose_name = 'Risiko Lahan'
+        verbose_name_plural = 'Risiko Lahan'
+
+    def __str__(self):
+        return f"Risiko {self.lahan_id} @ {self.last_hour:%Y-%m-%d %H:%M}"
+
+
+# ============================================
+# MODEL EKSPOR RIWAYAT (export besar di background)
+# ============================================
+class EksporRiwayat(models.Model):
+    """Job export riwayat deteksi yang dibuat di background (lihat dashboard/riwayat_export.py)"""
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('pdf', 'PDF'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Menunggu'),
+        ('processing', 'Diproses'),
+        ('done', 'Selesai'),
+        ('failed', 'Gagal'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ekspor_riwayat')
+    petani = models.ForeignKey(
+        Petani,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="Kosong = semua petani (admin)"
+    )
+    format = models.CharField(max_length=5, choices=FORMAT_CHOICES)
+    tanggal_dari = models.DateField(null=True, blank=True)
+    tanggal_sampai = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='ekspor_riwayat/%Y/%m/', null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processing_started = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'ekspor_riwayat'
+        verbose_name = 'Ekspor Riwayat'
+        verbose_name_plural = 'Ekspor Riwayat'
+        ordering = ['-created_at']
 
     def __str__(self):
-        return f"Riwayat {self.petani.nama_lengkap} - {self.created_at.strftime('%Y-%m-%d')}"
\ No newline at end of file
+        return f"Ekspor {self.format.upper()} #{self.id} ({self.status})"
+
+
+# ============================================
+# MODEL TILE SEBARAN DETEKSI (peta outbreak)
+# ============================================
+class DeteksiTile(models.Model):
+    """Jumlah deteksi sakit per hari (WIB) per tile geohash lahan per jenis hama"""
+    tanggal = models.DateField()
+    tile = models.CharField(max_length=12)
+    jenis_hama = models.ForeignKey(JenisHama, on_delete=models.CASCADE, related_name='+')
+    jumlah = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'deteksi_tile'
+        verbose_name = "Tile Deteksi"
+        verbose_name_plural = "Tile Deteksi"
+        constraints = [
+            models.UniqueConstraint(fields=['tanggal', 'tile', 'jenis_hama'], name='uniq_deteksi_tile_harian'),
+        ]
+
+    def __str__(self):
+        return f"{self.tanggal} {self.tile} - {self.jenis_hama_id}: {self.jumlah}"
+
+
+# ============================================
+# MODEL PERANGKAT SENSOR (device_id -> lahan)
+# ============================================
+class PerangkatSensor(models.Model):
+    """Pemetaan device ESP8266 ke lahan; dipakai saat ingest untuk mengisi SensorData.lahan/petani"""
+    device_id = models.CharField(max_length=50, unique=True, verbose_name="Device ID")
+    lahan = models.ForeignKey(Lahan, on_delete=models.CASCADE, related_name='perangkat_sensor')
+    aktif = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'perangkat_sensor'
+        verbose_name = "Perangkat Sensor"
+        verbose_name_plural = "Perangkat Sensor"
+
+    def __str__(self):
+        return f"{self.device_id} -> {self.lahan.nama_lahan}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .sensor_cache import forget_device_owners
+        forget_device_owners([self.device_id])
+
+    def delete(self, *args, **kwargs):
+        from .sensor_cache import forget_device_owners
+        result = super().delete(*args, **kwargs)
+        forget_device_owners([self.device_id])
+        return result
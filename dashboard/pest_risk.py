@@ -0,0 +1,250 @@
+# dashboard/pest_risk.py
+"""
+Prakiraan risiko serangan penyakit per Lahan dari deret waktu sensor.
+
+Sumber data adalah rollup per jam (SensorRollup resolution='hour', digabung
+per lahan). Setiap lahan menyimpan jendela WINDOW_HOURS jam terakhir di
+RisikoLahan.window; setiap run hanya mengambil jam baru sejak run sebelumnya
+(ditambah REFRESH_HOURS jam terakhir untuk rollup yang terlambat), menggeser
+jendela, lalu menghitung indeks untuk semua lahan sekaligus dengan NumPy
+(matriks lahan x jam).
+
+Aturan skor adalah heuristik sederhana berbasis literatur penyakit tanaman
+(mis. kriteria Smith Period untuk hawar akhir) dan dimaksudkan sebagai
+peringatan dini, bukan diagnosis.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .ai_service import pest_ai
+from .models import RisikoLahan, SensorRollup
+
+logger = logging.getLogger(__name__)
+
+WINDOW_HOURS = 168      # 7 hari
+REFRESH_HOURS = 2       # jam terakhir yang dihitung ulang setiap run
+LAG_HOURS = 1           # jam berjalan belum lengkap, tunggu kompaksi rollup
+HOUR = timedelta(hours=1)
+
+# Suhu dasar degree-days (°C), umum untuk tomat/cabai dan vektornya
+BASE_TEMPERATURE = 10.0
+
+# penyakit -> (kondisi, jendela jam, jam kondisi untuk skor penuh)
+CONDITION_RULES = {
+    # Phytophthora infestans: jam basah pada 10-25°C, ~2 x 11 jam dalam 48 jam (Smith Period)
+    'Tomato_Late_blight': ('late_blight', 48, 22),
+    'Tomato_Early_blight': ('wet_20_30', 72, 36),
+    'Tomato_Leaf_Mold': ('humid_20_25', 72, 48),
+    'Tomato_Septoria_leaf_spot': ('wet_20_27', 72, 36),
+    'Tomato_Target_Spot': ('wet_20_28', 72, 36),
+    'Tomato_Bacterial_spot': ('wet_24_30', 48, 24),
+    'Pepper__bell___Bacterial_spot': ('wet_24_30', 48, 24),
+}
+
+# Hama/vektor yang dipicu panas: skor dari degree-days 7 hari
+DEGREE_DAY_RULES = {
+    # Tetranychus urticae: panas & kering mempercepat siklus hidup
+    'Tomato_Spider_mites_Two_spotted_spider_mite': 100.0,
+    # TYLCV: aktivitas kutu kebul (vektor) naik pada suhu hangat
+    'Tomato_Tomato_YellowLeaf__Curl_Virus': 120.0,
+}
+
+LEVEL_THRESHOLDS = (('high', 70), ('medium', 40))
+
+
+def _hour_floor(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _load_hourly(time_from, time_until, lahan_ids=None):
+    """
+    Rata-rata per lahan per jam dari rollup jam (semua device di lahan
+    digabung). Return (lahan_ids, jam, nilai[k, 3]) sebagai array.
+    """
+    queryset = SensorRollup.objects.filter(
+        resolution='hour',
+        lahan_id__isnull=False,
+        bucket_start__gte=time_from,
+        bucket_start__lt=time_until,
+    )
+    if lahan_ids is not None:
+        queryset = queryset.filter(lahan_id__in=lahan_ids)
+
+    rows = list(
+        queryset
+        .values('lahan_id', 'bucket_start')
+        .annotate(n=Sum('count'), t=Sum('temperature_sum'), h=Sum('humidity_sum'), s=Sum('soil_moisture_sum'))
+        .values_list('lahan_id', 'bucket_start', 'n', 't', 'h', 's')
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), [], np.empty((0, 3), dtype=np.float32)
+
+    lahan = np.array([r[0] for r in rows], dtype=np.int64)
+    hours = [r[1] for r in rows]
+    sums = np.array([r[3:] for r in rows], dtype=np.float64)
+    counts = np.array([r[2] for r in rows], dtype=np.float64)
+    return lahan, hours, (sums / counts[:, None]).astype(np.float32)
+
+
+def _dew_point(temperature, humidity):
+    """Titik embun (formula Magnus), vectorized"""
+    rh = np.clip(humidity, 1.0, 100.0) / 100.0
+    gamma = np.log(rh) + 17.62 * temperature / (243.12 + temperature)
+    return 243.12 * gamma / (17.62 - gamma)
+
+
+def compute_indices(window):
+    """
+    Indeks cuaca untuk matriks jendela [lahan, jam, (suhu, RH, tanah)],
+    kolom terakhir = jam terbaru. Return dict nama -> array per lahan.
+    """
+    temperature = window[:, :, 0]
+    humidity = window[:, :, 1]
+    valid = ~np.isnan(temperature) & ~np.isnan(humidity)
+
+    with np.errstate(invalid='ignore'):
+        # Proxy daun basah: selisih suhu - titik embun <= 2°C (~RH >= 89%)
+        wet = valid & ((temperature - _dew_point(temperature, humidity)) <= 2.0)
+        humid = valid & (humidity >= 85)
+
+        def band(mask, low, high):
+            return mask & (temperature >= low) & (temperature <= high)
+
+        conditions = {
+            'late_blight': band(wet, 10, 25),
+            'wet_20_30': band(wet, 20, 30),
+            'wet_20_27': band(wet, 20, 27),
+            'wet_20_28': band(wet, 20, 28),
+            'wet_24_30': band(wet, 24, 30),
+            'humid_20_25': band(humid, 20, 25),
+            'hot_dry': valid & (temperature >= 27) & (humidity <= 55),
+        }
+        degree_hours = np.where(valid, np.maximum(temperature - BASE_TEMPERATURE, 0), 0)
+
+    def last(mask, hours):
+        return mask[:, -hours:].sum(axis=1)
+
+    indices = {
+        'data_hours_24h': last(valid, 24),
+        'data_hours_7d': last(valid, WINDOW_HOURS),
+        'wet_hours_24h': last(wet, 24),
+        'wet_hours_72h': last(wet, 72),
+        'late_blight_hours_48h': last(conditions['late_blight'], 48),
+        'hot_dry_hours_7d': last(conditions['hot_dry'], WINDOW_HOURS),
+        'degree_days_7d': degree_hours[:, -WINDOW_HOURS:].sum(axis=1) / 24.0,
+    }
+    return indices, conditions
+
+
+def compute_scores(indices, conditions, disease_info):
+    """Skor 0-100 per penyakit untuk setiap lahan. Return list dict per lahan."""
+    columns = {}
+    for disease, (condition, hours, saturation) in CONDITION_RULES.items():
+        columns[disease] = conditions[condition][:, -hours:].sum(axis=1) / saturation
+    for disease, saturation in DEGREE_DAY_RULES.items():
+        columns[disease] = indices['degree_days_7d'] / saturation
+    # Tungau lebih cepat berkembang saat panas dan kering
+    mites = 'Tomato_Spider_mites_Two_spotted_spider_mite'
+    columns[mites] = 0.5 * columns[mites] + 0.5 * indices['hot_dry_hours_7d'] / (WINDOW_HOURS / 2)
+
+    columns = {
+        disease: np.rint(np.clip(values, 0, 1) * 100).astype(int)
+        for disease, values in columns.items()
+        if disease in disease_info
+    }
+
+    n = len(indices['data_hours_7d'])
+    results = []
+    for i in range(n):
+        scores = {}
+        for disease, values in columns.items():
+            score = int(values[i])
+            level = next((name for name, threshold in LEVEL_THRESHOLDS if score >= threshold), 'low')
+            scores[disease] = {
+                'score': score,
+                'level': level,
+                'display_name': disease_info[disease].get('display_name', disease),
+            }
+        results.append(scores)
+    return results
+
+
+def _decode_window(state):
+    old = np.frombuffer(bytes(state.window), dtype=np.float32).reshape(-1, 3)
+    return old[-WINDOW_HOURS:]
+
+
+def compute_risk(now=None, disease_info=None):
+    """
+    Perbarui RisikoLahan untuk semua lahan yang punya state atau data baru.
+    Return jumlah lahan yang diperbarui.
+    """
+    if disease_info is None:
+        disease_info = pest_ai.disease_info
+
+    now = now or timezone.now()
+    target = _hour_floor(now) - LAG_HOURS * HOUR          # jam lengkap terakhir
+    window_start = target - (WINDOW_HOURS - 1) * HOUR
+
+    states = {s.lahan_id: s for s in RisikoLahan.objects.all()}
+    since = window_start
+    if states:
+        since = max(min(s.last_hour for s in states.values()) - (REFRESH_HOURS - 1) * HOUR, window_start)
+
+    lahan, hours, values = _load_hourly(since, target + HOUR)
+
+    # Lahan baru: isi seluruh jendela sekali (bootstrap)
+    new_ids = sorted(set(lahan.tolist()) - states.keys())
+    if new_ids and since > window_start:
+        boot_lahan, boot_hours, boot_values = _load_hourly(window_start, since, lahan_ids=new_ids)
+        lahan = np.concatenate([boot_lahan, lahan])
+        hours = boot_hours + hours
+        values = np.concatenate([boot_values, values])
+
+    ids = sorted(states.keys() | set(new_ids))
+    if not ids:
+        return 0
+    row_of = {lahan_id: i for i, lahan_id in enumerate(ids)}
+
+    window = np.full((len(ids), WINDOW_HOURS, 3), np.nan, dtype=np.float32)
+    for lahan_id, state in states.items():
+        # Geser jendela lama sebanyak jam yang berlalu sejak run sebelumnya
+        shift = max(int((target - state.last_hour) / HOUR), 0)
+        if shift >= WINDOW_HOURS:
+            continue
+        end = WINDOW_HOURS - shift
+        keep = _decode_window(state)[-end:]
+        window[row_of[lahan_id], end - len(keep):end] = keep
+
+    if len(lahan):
+        rows = np.array([row_of[int(lahan_id)] for lahan_id in lahan])
+        offsets = np.array([int((target - hour) / HOUR) for hour in hours])
+        cols = WINDOW_HOURS - 1 - offsets
+        window[rows, cols] = values
+
+    indices, conditions = compute_indices(window)
+    scores = compute_scores(indices, conditions, disease_info)
+
+    to_create, to_update = [], []
+    for lahan_id, i in row_of.items():
+        state = states.get(lahan_id) or RisikoLahan(lahan_id=lahan_id)
+        state.last_hour = target
+        state.updated_at = now
+        state.window = window[i].tobytes()
+        state.indices = {name: round(float(arr[i]), 2) for name, arr in indices.items()}
+        state.scores = scores[i]
+        (to_update if lahan_id in states else to_create).append(state)
+
+    with transaction.atomic():
+        RisikoLahan.objects.bulk_create(to_create, batch_size=500)
+        RisikoLahan.objects.bulk_update(
+            to_update, ['last_hour', 'window', 'indices', 'scores', 'updated_at'], batch_size=500
+        )
+
+    logger.info(f"Risiko hama dihitung untuk {len(ids)} lahan (s/d {target:%Y-%m-%d %H:%M} UTC)")
+    return len(ids)
@@ -0,0 +1,98 @@
+# dashboard/prediction_cache.py
+"""
+Cache hasil prediksi berdasarkan isi file (SHA-256) + versi model.
+
+Dua tingkat:
+1. LRU in-process (cepat, per worker)
+2. Opsional: cache Django bersama (settings.AI_PREDICTION_CACHE_ALIAS), supaya
+   upload ulang yang jatuh ke worker lain juga tidak menjalankan CNN lagi.
+"""
+import copy
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, cache_alias=None, timeout=86400):
+        self.max_entries = max_entries
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_bytes, model_version):
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return f"ai_pred:{model_version}:{digest}"
+
+    def _shared(self):
+        if not self.cache_alias:
+            return None
+        try:
+            return caches[self.cache_alias]
+        except Exception as e:
+            logger.warning(f"Shared prediction cache tidak tersedia: {e}")
+            return None
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return copy.deepcopy(self._entries[key])
+
+        shared = self._shared()
+        if shared is not None:
+            result = shared.get(key)
+            if result is not None:
+                self._set_local(key, result)
+                return copy.deepcopy(result)
+        return None
+
+    def _set_local(self, key, result):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key, result):
+        result = copy.deepcopy(result)
+        self._set_local(key, result)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(key, result, self.timeout)
+
+    def get_or_predict(self, image_bytes, model_version, predict_fn):
+        """
+        Return (hasil, cache_hit). `predict_fn` hanya dipanggil saat miss, dan
+        hanya hasil yang sukses yang disimpan.
+        """
+        key = self.make_key(image_bytes, model_version)
+        cached = self.get(key)
+        if cached is not None:
+            return cached, True
+
+        result = predict_fn()
+        if result.get('success', False):
+            self.set(key, result)
+        return result, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+prediction_cache = PredictionCache(
+    max_entries=getattr(settings, 'AI_PREDICTION_CACHE_SIZE', 1024),
+    cache_alias=getattr(settings, 'AI_PREDICTION_CACHE_ALIAS', None),
+    timeout=getattr(settings, 'AI_PREDICTION_CACHE_TIMEOUT', 86400),
+)
@@ -0,0 +1,298 @@
+# dashboard/riwayat_export.py
+"""
+Export riwayat deteksi ke CSV / PDF secara streaming.
+
+Baris dibaca per batch keyset (id > terakhir) dengan .iterator(chunk_size),
+jadi memori tetap kecil walau export mencakup seluruh RiwayatDeteksi
+bertahun-tahun (driver MySQL menyangga seluruh result set satu query,
+karena itu query dipecah per batch). PDF ditulis langsung per halaman
+oleh writer minimal di bawah (font standar Helvetica, warna dashboard, tanpa
+dependency; repo belum punya template / library PDF).
+
+Export yang sangat besar bisa dibuat di background (EksporRiwayat) lalu
+diunduh setelah selesai lewat view export_download (hanya pemilik job); nama
+file acak supaya tidak bisa ditebak dari URL media.
+"""
+import csv
+import logging
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EksporRiwayat, HasilDeteksi, RiwayatDeteksi
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['Tanggal', 'Petani', 'Lahan', 'Tanaman', 'Hama', 'Tingkat', 'Confidence', 'Status']
+
+TINGKAT_DISPLAY = dict(HasilDeteksi.TINGKAT_SERANGAN_CHOICES)
+STATUS_DISPLAY = dict(RiwayatDeteksi._meta.get_field('status_penanganan').choices)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+def export_queryset(petani=None, tanggal_dari=None, tanggal_sampai=None):
+    """RiwayatDeteksi untuk export: satu petani, atau semua jika petani=None (admin)"""
+    queryset = RiwayatDeteksi.objects.all()
+    if petani is not None:
+        queryset = queryset.filter(petani=petani)
+    if tanggal_dari:
+        queryset = queryset.filter(created_at__date__gte=tanggal_dari)
+    if tanggal_sampai:
+        queryset = queryset.filter(created_at__date__lte=tanggal_sampai)
+    return queryset
+
+
+def iter_rows(queryset, chunk_size=2000):
+    """Yield list string per baris, urut id, satu query per `chunk_size` baris"""
+    last_id = 0
+    while True:
+        batch = (
+            queryset
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .values_list(
+                'id', 'created_at', 'petani__nama_lengkap', 'lahan__nama_lahan', 'lahan__jenis_tanaman',
+                'hasil_deteksi__jenis_hama__nama', 'hasil_deteksi__tingkat_serangan',
+                'hasil_deteksi__confidence_score', 'status_penanganan',
+            )[:chunk_size]
+        )
+        count = 0
+        for riwayat_id, created_at, petani, lahan, tanaman, hama, tingkat, confidence, status in batch.iterator(chunk_size=chunk_size):
+            count += 1
+            last_id = riwayat_id
+            yield [
+                timezone.localtime(created_at).strftime('%d %b %Y %H:%M'),
+                petani or '-',
+                lahan or '-',
+                tanaman or '-',
+                hama or '-',
+                TINGKAT_DISPLAY.get(tingkat, '-'),
+                f'{confidence}%',
+                STATUS_DISPLAY.get(status, status),
+            ]
+        if count < chunk_size:
+            return
+
+
+# ---------------- CSV ----------------
+class _Echo:
+    """Pseudo-buffer untuk csv.writer: write() langsung mengembalikan baris"""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    # BOM supaya Excel membaca UTF-8 dengan benar
+    yield '\ufeff' + writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+# ---------------- PDF ----------------
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595          # A4 landscape (pt)
+MARGIN = 36
+FONT_SIZE = 8
+ROW_HEIGHT = 15
+COLUMN_WIDTHS = [80, 120, 110, 80, 170, 55, 60, 95]
+# Warna dashboard (judul #2d4a35, aksen #5d9970) sebagai operator warna PDF
+TITLE_COLOR = b'0.176 0.290 0.208 rg'
+HEADER_FILL = b'0.365 0.600 0.439 rg'
+
+
+def _pdf_text(value):
+    text = str(value).encode('cp1252', errors='replace')
+    return text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _fit(value, width):
+    max_chars = int(width / (FONT_SIZE * 0.5))
+    value = str(value)
+    return value if len(value) <= max_chars else value[:max_chars - 1] + '…'
+
+
+class _PdfStream:
+    """Writer PDF sekuensial: objek ditulis berurutan, xref dihitung dari offset byte"""
+
+    CATALOG, PAGES, FONT, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.next_id = 5
+        self.page_ids = []
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def _obj(self, num, body):
+        self.offsets[num] = self.offset
+        return self._emit(b'%d 0 obj\n' % num + body + b'\nendobj\n')
+
+    def start(self):
+        out = self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        out += self._obj(self.FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        out += self._obj(self.FONT_BOLD, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        return out
+
+    def page(self, content):
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.page_ids.append(page_id)
+        out = self._obj(content_id, b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        out += self._obj(page_id, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>'
+            % (self.PAGES, PAGE_WIDTH, PAGE_HEIGHT, self.FONT, self.FONT_BOLD, content_id)
+        ))
+        return out
+
+    def finish(self):
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self.page_ids)
+        out = self._obj(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.page_ids)))
+        out += self._obj(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+
+        xref_offset = self.offset
+        size = self.next_id
+        xref = b'xref\n0 %d\n0000000000 65535 f \n' % size
+        for num in range(1, size):
+            xref += b'%010d 00000 n \n' % self.offsets[num]
+        xref += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, self.CATALOG, xref_offset)
+        return out + self._emit(xref)
+
+
+def _page_content(title, rows, page_number):
+    lines = []
+    y = PAGE_HEIGHT - MARGIN
+    if title:
+        lines.append(b'%s BT /F2 14 Tf %d %d Td (%s) Tj ET' % (TITLE_COLOR, MARGIN, y - 14, _pdf_text(title)))
+        y -= 30
+
+    def row_commands(values, font, color, y):
+        lines.append(color)
+        x = MARGIN
+        for value, width in zip(values, COLUMN_WIDTHS):
+            lines.append(b'BT /%s %d Tf %d %d Td (%s) Tj ET' % (font, FONT_SIZE, x + 2, y - 11, _pdf_text(_fit(value, width - 4))))
+            x += width
+        lines.append(b'0.8 G 0.5 w %d %d m %d %d l S' % (MARGIN, y - ROW_HEIGHT, PAGE_WIDTH - MARGIN, y - ROW_HEIGHT))
+
+    lines.append(b'%s %d %d %d %d re f' % (HEADER_FILL, MARGIN, y - ROW_HEIGHT, PAGE_WIDTH - 2 * MARGIN, ROW_HEIGHT))
+    row_commands(COLUMNS, b'F2', b'1 g', y)
+    y -= ROW_HEIGHT
+    for row in rows:
+        row_commands(row, b'F1', b'0 g', y)
+        y -= ROW_HEIGHT
+
+    lines.append(b'0 g BT /F1 %d Tf %d %d Td (Halaman %d) Tj ET' % (FONT_SIZE, PAGE_WIDTH - MARGIN - 50, MARGIN - 16, page_number))
+    return b'\n'.join(lines)
+
+
+def stream_pdf(rows, title='Riwayat Deteksi Tanaman'):
+    pdf = _PdfStream()
+    yield pdf.start()
+
+    usable = PAGE_HEIGHT - 2 * MARGIN - ROW_HEIGHT
+    first_page_rows = (usable - 30) // ROW_HEIGHT
+    other_page_rows = usable // ROW_HEIGHT
+
+    page_rows = []
+    for row in rows:
+        page_rows.append(row)
+        limit = first_page_rows if not pdf.page_ids else other_page_rows
+        if len(page_rows) >= limit:
+            yield pdf.page(_page_content(title if not pdf.page_ids else None, page_rows, len(pdf.page_ids) + 1))
+            page_rows = []
+    if page_rows or not pdf.page_ids:
+        yield pdf.page(_page_content(title if not pdf.page_ids else None, page_rows, len(pdf.page_ids) + 1))
+
+    yield pdf.finish()
+
+
+def stream_export(fmt, queryset, chunk_size=2000):
+    rows = iter_rows(queryset, chunk_size=chunk_size)
+    if fmt == 'csv':
+        return stream_csv(rows)
+    return stream_pdf(rows)
+
+
+# ---------------- export background ----------------
+def claim_export(job_id):
+    """Klaim job pending (UPDATE bersyarat). Return job atau None."""
+    claimed = (
+        EksporRiwayat.objects
+        .filter(id=job_id, status='pending')
+        .update(status='processing', processing_started=timezone.now())
+    )
+    if claimed != 1:
+        return None
+    return EksporRiwayat.objects.select_related('petani').get(id=job_id)
+
+
+def generate_export(job_id, chunk_size=2000):
+    """Tulis file export untuk satu job ke storage. Aman dipanggil dari thread."""
+    close_old_connections()
+    job = claim_export(job_id)
+    if job is None:
+        return None
+
+    tmp = tempfile.NamedTemporaryFile(suffix=f'.{job.format}', delete=False)
+    try:
+        queryset = export_queryset(job.petani, job.tanggal_dari, job.tanggal_sampai)
+        for chunk in stream_export(job.format, queryset, chunk_size=chunk_size):
+            tmp.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        tmp.close()
+
+        with open(tmp.name, 'rb') as f:
+            job.file.save(f'riwayat_{uuid.uuid4().hex}.{job.format}', File(f), save=False)
+        job.status = 'done'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['file', 'status', 'finished_at'])
+    except Exception as e:
+        logger.error(f"Export riwayat {job_id} gagal: {e}")
+        EksporRiwayat.objects.filter(id=job_id).update(status='failed', error=str(e), finished_at=timezone.now())
+    finally:
+        tmp.close()
+        os.unlink(tmp.name)
+        close_old_connections()
+    return job
+
+
+def requeue_stale_exports(now=None):
+    """
+    Kembalikan job 'processing' yang diklaim lebih lama dari
+    RIWAYAT_EXPORT_STALE_SECONDS (thread/worker mati) ke 'pending'.
+    Return jumlah job.
+    """
+    batas = (now or timezone.now()) - timedelta(seconds=getattr(settings, 'RIWAYAT_EXPORT_STALE_SECONDS', 1800))
+    # Baris processing lama (sebelum kolom processing_started ada) memakai created_at
+    diklaim_lama = Q(processing_started__lt=batas) | Q(processing_started__isnull=True, created_at__lt=batas)
+    total = (
+        EksporRiwayat.objects
+        .filter(diklaim_lama, status='processing')
+        .update(status='pending', processing_started=None)
+    )
+    if total:
+        logger.warning(f"{total} export riwayat macet dikembalikan ke antrian")
+    return total
+
+
+def process_pending_exports():
+    """Proses semua job export pending (untuk worker / cron). Return jumlah job."""
+    requeue_stale_exports()
+    total = 0
+    for job_id in EksporRiwayat.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True):
+        if generate_export(job_id):
+            total += 1
+    return total
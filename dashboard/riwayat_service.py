@@ -0,0 +1,76 @@
+# dashboard/riwayat_service.py
+"""
+Query riwayat deteksi per petani: counter ringkasan dalam satu query agregat
+dan pagination keyset (cursor) pada (created_at, id) sehingga halaman ke-N
+sama cepatnya dengan halaman pertama.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Count, Q
+
+from .models import RiwayatDeteksi
+
+
+def riwayat_queryset(petani):
+    return (
+        RiwayatDeteksi.objects
+        .filter(petani=petani)
+        .select_related('hasil_deteksi__jenis_hama', 'hasil_deteksi__citra', 'lahan')
+        .order_by('-created_at', '-id')
+    )
+
+
+def riwayat_counters(petani):
+    """total_deteksi, total_sakit, perlu_penanganan dalam satu query (conditional aggregation)"""
+    return RiwayatDeteksi.objects.filter(petani=petani).aggregate(
+        total_deteksi=Count('id'),
+        total_sakit=Count('id', filter=Q(hasil_deteksi__tingkat_serangan__isnull=False)),
+        perlu_penanganan=Count('id', filter=~Q(status_penanganan='selesai')),
+    )
+
+
+def encode_cursor(riwayat):
+    raw = f"{riwayat.created_at.isoformat()}|{riwayat.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id); ValueError jika cursor tidak valid"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, riwayat_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(riwayat_id)
+
+
+def riwayat_page(petani, cursor=None, limit=25):
+    """
+    Satu halaman riwayat setelah `cursor` (urutan terbaru dulu).
+    Return (list riwayat, next_cursor atau None).
+    """
+    queryset = riwayat_queryset(petani)
+    if cursor:
+        created_at, riwayat_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=riwayat_id)
+        )
+
+    items = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def riwayat_payload(riwayat):
+    hasil = riwayat.hasil_deteksi
+    citra = hasil.citra
+    return {
+        'id': riwayat.id,
+        'created_at': riwayat.created_at.isoformat(),
+        'foto_url': citra.path_file.url if citra.path_file else None,
+        'jenis_tanaman': riwayat.lahan.jenis_tanaman if riwayat.lahan else None,
+        'jenis_hama': hasil.jenis_hama.nama,
+        'tingkat_serangan': hasil.tingkat_serangan,
+        'tingkat_serangan_display': hasil.get_tingkat_serangan_display() if hasil.tingkat_serangan else None,
+        'confidence_score': float(hasil.confidence_score),
+        'status_penanganan': riwayat.status_penanganan,
+        'status_penanganan_display': riwayat.get_status_penanganan_display(),
+    }
@@ -0,0 +1,95 @@
+# dashboard/sensor_binary.py
+"""
+Format biner ringkas untuk ingest sensor dari ESP8266 (koneksi 2G lambat).
+
+Dikirim ke route yang sama (/dashboard/api/sensor/data/) dengan
+Content-Type: application/x-agroguard-sensor. Semua angka little-endian.
+
+Header (20 byte)
+    magic      2s   b'AG'
+    version    B    1
+    count      B    jumlah record (1-255)
+    device_id  16s  ASCII, diisi NUL di akhir
+
+Record (13 byte) x count
+    seq          I  nomor urut dari device (0 = tanpa seq); harus tetap naik
+                    setelah reboot, lihat sensor_ingest
+    timestamp    I  epoch detik (0 = pakai waktu server)
+    temperature  h  suhu x 100 (°C)
+    humidity     H  kelembapan udara x 100 (%)
+    soil         B  kelembapan tanah (%)
+
+Ack (11 byte, application/x-agroguard-ack)
+    magic      2s   b'AK'
+    status     B    0 = semua diterima, 1 = sebagian ditolak, 2 = semua ditolak / error
+    accepted   H
+    rejected   H
+    ack_seq    I    seq tertinggi yang diterima (0 jika tidak ada)
+"""
+import struct
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+MEDIA_TYPE = 'application/x-agroguard-sensor'
+ACK_MEDIA_TYPE = 'application/x-agroguard-ack'
+
+MAGIC = b'AG'
+ACK_MAGIC = b'AK'
+VERSION = 1
+
+HEADER = struct.Struct('<2sBB16s')
+RECORD = struct.Struct('<IIhHB')
+ACK = struct.Struct('<2sBHHI')
+
+ACK_OK = 0
+ACK_PARTIAL = 1
+ACK_ERROR = 2
+
+
+def decode_frame(data):
+    """Decode frame biner menjadi list dict pembacaan (format validate_readings)"""
+    if len(data) < HEADER.size:
+        raise ValueError('Frame terlalu pendek')
+
+    magic, version, count, device_id = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Magic frame tidak dikenal')
+    if version != VERSION:
+        raise ValueError(f'Versi frame {version} tidak didukung')
+    if len(data) != HEADER.size + count * RECORD.size:
+        raise ValueError('Panjang frame tidak sesuai jumlah record')
+
+    device_id = device_id.rstrip(b'\0').decode('ascii', errors='replace') or None
+    return [
+        {
+            'device_id': device_id,
+            'seq': seq or None,
+            'timestamp': timestamp or None,
+            'temperature': temperature / 100.0,
+            'humidity': humidity / 100.0,
+            'soil_moisture': soil,
+        }
+        for seq, timestamp, temperature, humidity, soil in RECORD.iter_unpack(memoryview(data)[HEADER.size:])
+    ]
+
+
+def encode_ack(accepted, rejected, ack_seq=0, error=False):
+    if error or not accepted:
+        status = ACK_ERROR
+    elif rejected:
+        status = ACK_PARTIAL
+    else:
+        status = ACK_OK
+    return ACK.pack(ACK_MAGIC, status, min(accepted, 0xFFFF), min(rejected, 0xFFFF), ack_seq or 0)
+
+
+class SensorBinaryParser(BaseParser):
+    """Parser DRF untuk frame biner sensor: request.data = list pembacaan"""
+    media_type = MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return decode_frame(stream.read() if stream is not None else b'')
+        except (ValueError, struct.error) as e:
+            raise ParseError(f'Frame sensor tidak valid: {e}')
@@ -0,0 +1,221 @@
+# dashboard/sensor_buffer.py
+"""
+Write-behind buffer untuk data sensor.
+
+Pembacaan yang sudah divalidasi ditampung di memori dan di-flush ke database
+dengan bulk_create saat jumlahnya mencapai `flush_size` atau setiap
+`flush_interval` detik. Saat proses berhenti normal, isi buffer di-flush; jika
+database tidak bisa dihubungi, sisa buffer ditulis ke spool file (JSON lines)
+dan dimuat ulang saat proses berikutnya start.
+
+Jika insert gagal padahal koneksi database sehat (mis. data ditolak strict
+mode), batch dibagi dua berulang kali sampai baris bermasalah terisolasi;
+baris itu dipindah ke dead-letter file (JSON lines + pesan error) supaya
+satu pembacaan rusak tidak menahan seluruh buffer.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils.dateparse import parse_datetime
+
+from . import sensor_cache
+from .sensor_ingest import bulk_insert_readings
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    pass
+
+
+class _FlushInterrupted(Exception):
+    """Koneksi database putus di tengah flush; `remaining` belum tersimpan"""
+    def __init__(self, error, remaining):
+        super().__init__(str(error))
+        self.remaining = remaining
+
+
+def _db_usable():
+    try:
+        return connection.connection is not None and connection.is_usable()
+    except Exception:
+        return False
+
+
+def _spool_line(r, **extra):
+    return json.dumps({**r, 'timestamp': r['timestamp'].isoformat(), **extra}) + '\n'
+
+
+class SensorWriteBuffer:
+    def __init__(self, max_size=10000, flush_size=500, flush_interval=5.0, spool_path=None, dead_letter_path=None):
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._started = False
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._load_spool()
+            self._thread = threading.Thread(target=self._run, name='sensor-write-behind', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def shutdown(self):
+        """Flush terakhir; sisa yang gagal disimpan ke spool file"""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Flush saat shutdown gagal: {e}")
+        self._write_spool()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Flush sensor buffer gagal, dicoba lagi: {e}")
+
+    # ---------------- API ----------------
+    def add(self, reading):
+        """Tambah satu pembacaan tervalidasi (dict seperti validate_readings)"""
+        self.start()
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                raise BufferFull('Sensor buffer penuh')
+            self._items.append(reading)
+            size = len(self._items)
+        if size >= self.flush_size:
+            self._wakeup.set()
+
+    def __len__(self):
+        return len(self._items)
+
+    def flush(self):
+        """Simpan isi buffer ke database. Return jumlah baris yang ditulis."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._items)
+                self._items.clear()
+            if not batch:
+                return 0
+
+            close_old_connections()
+            try:
+                written, failed = self._insert(batch)
+            except _FlushInterrupted as e:
+                # Kembalikan sisa yang belum tersimpan ke depan antrian agar urutan tetap terjaga
+                with self._lock:
+                    self._items.extendleft(reversed(e.remaining))
+                raise
+
+            if failed:
+                self._write_dead_letter(failed)
+            # Data sudah terlihat di DB: ETag statistik/chart harus berubah
+            sensor_cache.touch_readings(written)
+            return len(written)
+
+    def _insert(self, batch):
+        """
+        Simpan batch; bagi dua bagian yang gagal selama koneksi masih sehat.
+        Return (tersimpan, [(baris, error)]).
+        """
+        written, failed = [], []
+        pending = [batch]
+        while pending:
+            part = pending.pop()
+            try:
+                stored = bulk_insert_readings(part, batch_size=self.flush_size)
+            except Exception as e:
+                if not _db_usable():
+                    remaining = part + [r for p in reversed(pending) for r in p]
+                    raise _FlushInterrupted(e, remaining) from e
+                if len(part) == 1:
+                    failed.append((part[0], str(e)))
+                    continue
+                mid = len(part) // 2
+                pending.extend([part[mid:], part[:mid]])
+                continue
+            written.extend(stored)
+        return written, failed
+
+    # ---------------- spool ----------------
+    def _write_spool(self):
+        if not self.spool_path:
+            return
+        with self._lock:
+            batch = list(self._items)
+            self._items.clear()
+        if not batch:
+            return
+
+        os.makedirs(os.path.dirname(self.spool_path) or '.', exist_ok=True)
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            for r in batch:
+                f.write(_spool_line(r))
+        logger.warning(f"{len(batch)} pembacaan sensor ditulis ke spool {self.spool_path}")
+
+    def _write_dead_letter(self, failed):
+        for r, error in failed:
+            logger.error(f"Pembacaan sensor {r['device_id']} seq={r.get('seq')} ditolak database: {error}")
+        if not self.dead_letter_path:
+            return
+        os.makedirs(os.path.dirname(self.dead_letter_path) or '.', exist_ok=True)
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            for r, error in failed:
+                f.write(_spool_line(r, error=error))
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return
+
+        # Rename dulu supaya worker lain tidak memuat spool yang sama
+        claimed_path = f"{self.spool_path}.{os.getpid()}"
+        try:
+            os.rename(self.spool_path, claimed_path)
+        except OSError:
+            return
+
+        loaded = 0
+        with open(claimed_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                r = json.loads(line)
+                r['timestamp'] = parse_datetime(r['timestamp'])
+                self._items.append(r)
+                loaded += 1
+        os.unlink(claimed_path)
+        logger.info(f"{loaded} pembacaan sensor dimuat dari spool")
+        if loaded:
+            self._wakeup.set()
+
+
+sensor_buffer = SensorWriteBuffer(
+    max_size=getattr(settings, 'SENSOR_BUFFER_MAX_SIZE', 10000),
+    flush_size=getattr(settings, 'SENSOR_BUFFER_FLUSH_SIZE', 500),
+    flush_interval=getattr(settings, 'SENSOR_BUFFER_FLUSH_INTERVAL', 5.0),
+    spool_path=getattr(settings, 'SENSOR_BUFFER_SPOOL_PATH', None),
+    dead_letter_path=getattr(settings, 'SENSOR_BUFFER_DEAD_LETTER_PATH', None),
+)
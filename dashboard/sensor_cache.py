@@ -0,0 +1,332 @@
+# dashboard/sensor_cache.py
+"""
+Cache "pembacaan terakhir" per device (dan per lahan / petani / global).
+
+Ditulis langsung saat ingest (write-through) sehingga endpoint
+/api/sensor/latest/ bisa dijawab tanpa query database. Memakai cache Django
+settings.SENSOR_LATEST_CACHE_ALIAS; tanpa konfigurasi CACHES, Django memakai
+LocMemCache (per proses) sebagai fallback.
+
+Cache per proses tidak melihat ingest di worker lain. Jika cache-nya tidak
+bersama (lihat is_shared()), pembacaan terakhir hasil query disimpan sebagai
+salinan per proses dengan TTL pendek (SENSOR_LATEST_LOCAL_TIMEOUT) sehingga
+data dari worker lain paling lama basi beberapa detik, dan token versi untuk
+endpoint lain diambil dari database.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Max
+
+from .models import SensorData
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'sensor_latest'
+ALL_KEY = f'{KEY_PREFIX}:all'
+
+
+def _cache():
+    return caches[getattr(settings, 'SENSOR_LATEST_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'SENSOR_LATEST_CACHE_TIMEOUT', None)
+
+
+def _local_timeout():
+    return getattr(settings, 'SENSOR_LATEST_LOCAL_TIMEOUT', 5)
+
+
+def is_shared():
+    """
+    True jika semua worker melihat cache yang sama. SENSOR_CACHE_SHARED=None
+    mendeteksi dari backend (LocMem/Dummy = tidak); set True jika aplikasi
+    berjalan sebagai satu proses.
+    """
+    shared = getattr(settings, 'SENSOR_CACHE_SHARED', None)
+    if shared is not None:
+        return shared
+    return not isinstance(_cache(), (LocMemCache, DummyCache))
+
+
+def _read_key(scope):
+    """(key, timeout) untuk membaca pembacaan terakhir scope: key bersama, atau salinan per proses"""
+    key = scope_key(scope)
+    if key is None or is_shared():
+        return key, _timeout()
+    return f'{key}:local', _local_timeout()
+
+
+def _forget_local(keys):
+    """Buang salinan per proses setelah ingest di proses ini (tidak perlu menunggu TTL)"""
+    if is_shared():
+        return
+    try:
+        _cache().delete_many([f'{key}:local' for key in keys])
+    except Exception as e:
+        logger.warning(f"Gagal menghapus latest-reading cache lokal: {e}")
+
+def reading_payload(reading):
+    """Payload API untuk SensorData atau dict pembacaan (mis. dari buffer/batch)"""
+    if isinstance(reading, dict):
+        timestamp = reading['timestamp']
+        return {
+            'id': reading.get('id'),
+            'device_id': reading['device_id'],
+            'temperature': float(reading['temperature']),
+            'humidity': float(reading['humidity']),
+            'soil_moisture': int(reading['soil_moisture']),
+            'timestamp': timestamp.isoformat(),
+            'petani_id': reading.get('petani_id'),
+            'lahan_id': reading.get('lahan_id'),
+            '_ts': timestamp.timestamp(),
+        }
+    return {
+        'id': reading.id,
+        'device_id': reading.device_id,
+        'temperature': float(reading.temperature),
+        'humidity': float(reading.humidity),
+        'soil_moisture': reading.soil_moisture,
+        'timestamp': reading.timestamp.isoformat(),
+        'petani_id': reading.petani_id,
+        'lahan_id': reading.lahan_id,
+        '_ts': reading.timestamp.timestamp(),
+    }
+
+
+def _keys_for(payload):
+    keys = [ALL_KEY, f"{KEY_PREFIX}:device:{payload['device_id']}"]
+    if payload.get('petani_id'):
+        keys.append(f"{KEY_PREFIX}:petani:{payload['petani_id']}")
+    if payload.get('lahan_id'):
+        keys.append(f"{KEY_PREFIX}:lahan:{payload['lahan_id']}")
+    return keys
+
+
+def scope_key(scope):
+    """Key cache untuk scope dari _sensor_scope, atau None jika scope tidak di-cache"""
+    if not scope:
+        return ALL_KEY
+    if len(scope) != 1:
+        return None
+    (field, value), = scope.items()
+    if field == 'device_id__in':
+        return f"{KEY_PREFIX}:device:{value[0]}" if len(value) == 1 else None
+    if field == 'petani_id':
+        return f"{KEY_PREFIX}:petani:{value}"
+    if field == 'lahan_id':
+        return f"{KEY_PREFIX}:lahan:{value}"
+    return None
+
+
+def _version_token():
+    now = time.time()
+    return {'token': f'w{time.time_ns()}', 'modified': now}
+
+
+def record_readings(readings):
+    """Write-through: simpan pembacaan terbaru ke semua key yang relevan"""
+    newest = {}
+    for reading in readings:
+        payload = reading_payload(reading)
+        for key in _keys_for(payload):
+            if key not in newest or payload['_ts'] >= newest[key]['_ts']:
+                newest[key] = payload
+    if not newest:
+        return
+
+    try:
+        cache = _cache()
+        current = cache.get_many(list(newest))
+        updates = {
+            key: payload for key, payload in newest.items()
+            if key not in current or payload['_ts'] >= current[key]['_ts']
+        }
+        # Versi data berubah untuk setiap penulisan, termasuk backfill lama
+        version = _version_token()
+        updates.update({f'{key}:ver': version for key in newest})
+        cache.set_many(updates, _timeout())
+    except Exception as e:
+        # Cache hanya akselerasi; kegagalan cache tidak boleh menggagalkan ingest
+        logger.warning(f"Gagal update latest-reading cache: {e}")
+    _forget_local(newest)
+
+
+def record_reading(reading):
+    record_readings([reading])
+
+
+def touch_readings(readings):
+    """Ganti versi data tanpa mengubah pembacaan terakhir (mis. setelah buffer di-flush)"""
+    keys = {key for reading in readings for key in _keys_for(reading_payload(reading))}
+    if not keys:
+        return
+    try:
+        version = _version_token()
+        _cache().set_many({f'{key}:ver': version for key in keys}, _timeout())
+    except Exception as e:
+        logger.warning(f"Gagal update versi latest-reading cache: {e}")
+    _forget_local(keys)
+
+
+def data_version(scope):
+    """
+    Token versi data sensor untuk scope + waktu modifikasi (epoch), dipakai
+    untuk ETag / Last-Modified. Dari cache bersama jika ada; jika tidak, satu
+    query MAX(id)/MAX(timestamp) (lalu disimpan ke cache bersama).
+    """
+    key = scope_key(scope) if is_shared() else None
+    if key is not None:
+        try:
+            version = _cache().get(f'{key}:ver')
+        except Exception as e:
+            logger.warning(f"Latest-reading cache tidak tersedia: {e}")
+            version = None
+        if version:
+            return version['token'], version['modified']
+
+    agg = SensorData.objects.filter(**scope).aggregate(max_id=Max('id'), max_ts=Max('timestamp'))
+    version = {
+        'token': f"d{agg['max_id'] or 0}",
+        'modified': agg['max_ts'].timestamp() if agg['max_ts'] else None,
+    }
+    if key is not None:
+        try:
+            # add: jangan menimpa versi dari penulisan yang terjadi bersamaan
+            _cache().add(f'{key}:ver', version, _timeout())
+        except Exception as e:
+            logger.warning(f"Gagal mengisi versi latest-reading cache: {e}")
+    return version['token'], version['modified']
+
+
+def prime(scope, reading):
+    """Isi cache untuk satu scope dari hasil query DB (read-through saat miss). Return payload."""
+    payload = reading_payload(reading)
+    key, timeout = _read_key(scope)
+    if key is None:
+        return payload
+    try:
+        _cache().add(key, payload, timeout)
+    except Exception as e:
+        logger.warning(f"Gagal mengisi latest-reading cache: {e}")
+    return payload
+
+
+def get_latest(scope):
+    """Return payload terakhir (dengan field internal) dari cache, atau None jika miss"""
+    key, _ = _read_key(scope)
+    if key is None:
+        return None
+    try:
+        return _cache().get(key)
+    except Exception as e:
+        logger.warning(f"Latest-reading cache tidak tersedia: {e}")
+        return None
+
+
+def payload_version(payload):
+    """Token versi + waktu modifikasi dari payload itu sendiri (ETag /api/sensor/latest/ tanpa query)"""
+    return f"r{payload['id']}-{payload['device_id']}-{payload['_ts']}", payload['_ts']
+
+
+def public_payload(payload):
+    return {k: v for k, v in payload.items() if k not in ('_ts', 'petani_id', 'lahan_id')}
+
+
+# ---------------- high-water mark seq per device ----------------
+def _seq_key(device_id):
+    return f'{KEY_PREFIX}:seq:{device_id}'
+
+
+def get_seq_hwm(device_ids):
+    """seq tertinggi yang sudah diterima per device. Miss diisi dari DB (MAX(seq))."""
+    keys = {_seq_key(d): d for d in device_ids}
+    try:
+        cached = _cache().get_many(list(keys))
+    except Exception as e:
+        logger.warning(f"Latest-reading cache tidak tersedia: {e}")
+        cached = {}
+
+    hwm = {keys[k]: v for k, v in cached.items()}
+    missing = [d for d in device_ids if d not in hwm]
+    if missing:
+        rows = (
+            SensorData.objects
+            .filter(device_id__in=missing, seq__isnull=False)
+            .values('device_id')
+            .annotate(max_seq=Max('seq'))
+            .values_list('device_id', 'max_seq')
+        )
+        loaded = {d: -1 for d in missing}
+        loaded.update(dict(rows))
+        hwm.update(loaded)
+        set_seq_hwm(loaded)
+    return hwm
+
+
+def set_seq_hwm(hwm):
+    """Naikkan high-water mark (tidak pernah turun)"""
+    if not hwm:
+        return
+    try:
+        cache = _cache()
+        current = cache.get_many([_seq_key(d) for d in hwm])
+        updates = {
+            _seq_key(d): seq for d, seq in hwm.items()
+            if current.get(_seq_key(d)) is None or seq > current[_seq_key(d)]
+        }
+        if updates:
+            cache.set_many(updates, _timeout())
+    except Exception as e:
+        logger.warning(f"Gagal update seq high-water mark: {e}")
+
+
+# ---------------- pemilik device (PerangkatSensor) ----------------
+def _owner_key(device_id):
+    return f'{KEY_PREFIX}:owner:{device_id}'
+
+
+def get_device_owners(device_ids):
+    """
+    {device_id: (petani_id, lahan_id)} dari PerangkatSensor aktif; device
+    tanpa pemetaan -> (None, None). Miss diisi dengan satu query.
+    """
+    from .models import PerangkatSensor
+
+    keys = {_owner_key(d): d for d in device_ids}
+    try:
+        cached = _cache().get_many(list(keys))
+    except Exception as e:
+        logger.warning(f"Latest-reading cache tidak tersedia: {e}")
+        cached = {}
+
+    owners = {keys[k]: tuple(v) for k, v in cached.items()}
+    missing = [d for d in device_ids if d not in owners]
+    if missing:
+        loaded = {d: (None, None) for d in missing}
+        loaded.update({
+            device_id: (petani_id, lahan_id)
+            for device_id, lahan_id, petani_id in PerangkatSensor.objects
+            .filter(device_id__in=missing, aktif=True)
+            .values_list('device_id', 'lahan_id', 'lahan__petani_id')
+        })
+        owners.update(loaded)
+        try:
+            timeout = getattr(settings, 'SENSOR_DEVICE_OWNER_CACHE_TIMEOUT', 300)
+            _cache().set_many({_owner_key(d): list(v) for d, v in loaded.items()}, timeout)
+        except Exception as e:
+            logger.warning(f"Gagal mengisi cache pemilik device: {e}")
+    return owners
+
+
+def forget_device_owners(device_ids):
+    """Hapus cache pemetaan device setelah PerangkatSensor diubah"""
+    try:
+        _cache().delete_many([_owner_key(d) for d in device_ids])
+    except Exception as e:
+        logger.warning(f"Gagal menghapus cache pemilik device: {e}")
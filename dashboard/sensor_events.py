@@ -0,0 +1,96 @@
+# dashboard/sensor_events.py
+"""
+Pub/sub in-process untuk event sensor (tanpa broker eksternal).
+
+Ingest mem-publish setiap pembacaan baru; endpoint SSE /api/sensor/stream/
+berlangganan dan meneruskannya ke browser. Karena in-process, subscriber
+hanya menerima pembacaan yang di-ingest oleh proses yang sama: jalankan
+server ASGI/WSGI dengan satu proses (banyak thread / event loop) jika
+dashboard mengandalkan stream ini.
+"""
+import asyncio
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Antrian event untuk satu koneksi. `loop` diisi untuk konsumen asyncio."""
+
+    def __init__(self, broker, device_ids=None, max_queue=1000, loop=None):
+        self.broker = broker
+        self.device_ids = set(device_ids) if device_ids else None
+        self.loop = loop
+        self.dropped = 0
+        if loop is None:
+            self._queue = queue.Queue(maxsize=max_queue)
+        else:
+            self._queue = asyncio.Queue(maxsize=max_queue)
+
+    def wants(self, device_id):
+        return self.device_ids is None or device_id in self.device_ids
+
+    def _put_nowait(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except (queue.Full, asyncio.QueueFull):
+            # Klien lambat: buang event daripada menahan ingest
+            self.dropped += 1
+
+    def put(self, event):
+        if self.loop is None:
+            self._put_nowait(event)
+        else:
+            self.loop.call_soon_threadsafe(self._put_nowait, event)
+
+    def get(self, timeout=None):
+        """Ambil event berikutnya (sync). Return None jika timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout=None):
+        """Ambil event berikutnya (async). Return None jika timeout."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class SensorEventBroker:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, device_ids=None, max_queue=1000, loop=None):
+        sub = Subscription(self, device_ids, max_queue=max_queue, loop=loop)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event_type, device_id, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if sub.wants(device_id):
+                try:
+                    sub.put((event_type, data))
+                except RuntimeError:
+                    # Event loop subscriber sudah ditutup
+                    self.unsubscribe(sub)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+sensor_events = SensorEventBroker()
@@ -0,0 +1,266 @@
+# dashboard/sensor_ingest.py
+"""
+Validasi & penyimpanan batch data sensor dari gateway ESP8266.
+
+Satu request berisi banyak pembacaan (bisa dari banyak device_id) dengan
+timestamp dari device. Validasi range dilakukan sekaligus dengan NumPy, lalu
+pembacaan yang valid disimpan dengan satu bulk_create.
+
+Pembacaan boleh membawa `seq` (nomor urut device) sebagai kunci idempotensi:
+kiriman ulang dengan (device_id, seq) yang sudah tersimpan dibuang tanpa error.
+
+seq sebaiknya tetap naik setelah device reboot (simpan counter di EEPROM/RTC
+memory, atau taruh boot counter di bit atas seq). Jika counter tetap ter-reset,
+pembacaan yang membawa timestamp device berbeda dari baris tersimpan dengan seq
+yang sama dianggap pembacaan baru dan disimpan tanpa seq (tidak hilang, tapi
+tanpa perlindungan kiriman ulang); pembacaan tanpa timestamp device tidak bisa
+dibedakan dari kiriman ulang dan tetap dibuang.
+"""
+import logging
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import sensor_cache
+from .models import SensorData
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEVICE_ID = 'ESP8266_001'
+
+# Sama dengan batas di receive_sensor_data
+SENSOR_RANGES = {
+    'temperature': (-40, 80),
+    'humidity': (0, 100),
+    'soil_moisture': (0, 100),
+}
+
+# Toleransi jam device yang lebih cepat dari server
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+# Pembacaan lebih tua dari ini dianggap jam device belum sinkron (mis. epoch 0
+# dari ESP8266 tanpa NTP), bukan data lama yang sah
+DEFAULT_MAX_READING_AGE = timedelta(days=30)
+
+MAX_SEQ = 2 ** 63 - 1
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_device_timestamp(value, now):
+    """Terima ISO 8601 atau epoch (detik). Return datetime aware, atau None jika tidak valid."""
+    if value is None or value == '':
+        return now
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def parse_seq(value):
+    """seq opsional: None jika tidak ada, ValueError jika tidak valid"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    seq = int(value)
+    if not 0 <= seq <= MAX_SEQ:
+        raise ValueError(value)
+    return seq
+
+
+def validate_readings(readings, now=None):
+    """
+    Validasi list pembacaan. Return (valid, rejected) dengan
+    valid = list dict siap simpan dan rejected = list [index, alasan].
+    """
+    now = now or timezone.now()
+    oldest = now - timedelta(days=getattr(settings, 'SENSOR_MAX_READING_AGE_DAYS', DEFAULT_MAX_READING_AGE.days))
+    n = len(readings)
+    rejected = {}
+
+    values = {
+        field: np.array([_to_float(r.get(field)) if isinstance(r, dict) else np.nan for r in readings], dtype=float)
+        for field in SENSOR_RANGES
+    }
+
+    for field, (low, high) in SENSOR_RANGES.items():
+        arr = values[field]
+        missing = np.isnan(arr)
+        out_of_range = ~missing & ((arr < low) | (arr > high))
+        for i in np.flatnonzero(missing):
+            rejected.setdefault(int(i), f'missing {field}')
+        for i in np.flatnonzero(out_of_range):
+            rejected.setdefault(int(i), f'{field} out of range')
+
+    valid = []
+    for i in range(n):
+        if i in rejected:
+            continue
+        reading = readings[i]
+        device_time = reading.get('timestamp') not in (None, '')
+        timestamp = parse_device_timestamp(reading.get('timestamp'), now)
+        if timestamp is None:
+            rejected[i] = 'invalid timestamp'
+            continue
+        if timestamp > now + MAX_CLOCK_SKEW:
+            rejected[i] = 'timestamp in the future'
+            continue
+        if timestamp < oldest:
+            rejected[i] = 'timestamp too old'
+            continue
+        try:
+            seq = parse_seq(reading.get('seq'))
+        except (TypeError, ValueError):
+            rejected[i] = 'invalid seq'
+            continue
+        valid.append({
+            'index': i,
+            'device_id': str(reading.get('device_id') or DEFAULT_DEVICE_ID)[:50],
+            'temperature': round(float(values['temperature'][i]), 2),
+            'humidity': round(float(values['humidity'][i]), 2),
+            'soil_moisture': int(values['soil_moisture'][i]),
+            'timestamp': timestamp,
+            'device_time': device_time,
+            'seq': seq,
+        })
+
+    return valid, [[i, reason] for i, reason in sorted(rejected.items())]
+
+
+def drop_duplicates(valid):
+    """
+    Pisahkan pembacaan yang (device_id, seq)-nya sudah pernah diterima.
+    seq di atas high-water mark device pasti baru (tanpa query); hanya seq
+    <= high-water mark yang dicek ke database, satu query per device.
+    Pembacaan dengan timestamp device yang berbeda dari baris tersimpan
+    (counter seq ter-reset) dikembalikan sebagai baru dengan seq=None.
+    Return (baru, duplikat).
+    """
+    with_seq = [r for r in valid if r.get('seq') is not None]
+    if not with_seq:
+        return valid, []
+
+    hwm = sensor_cache.get_seq_hwm(sorted({r['device_id'] for r in with_seq}))
+
+    suspects = {}
+    for r in with_seq:
+        if r['seq'] <= hwm[r['device_id']]:
+            suspects.setdefault(r['device_id'], set()).add(r['seq'])
+
+    stored = {}
+    for device_id, seqs in suspects.items():
+        stored.update(
+            ((device_id, seq), timestamp) for seq, timestamp in
+            SensorData.objects.filter(device_id=device_id, seq__in=seqs).values_list('seq', 'timestamp')
+        )
+
+    fresh, duplicates = [], []
+    seen = set()
+    resets = set()
+    for r in valid:
+        key = (r['device_id'], r.get('seq'))
+        if r.get('seq') is not None and key in stored and r.get('device_time') and stored[key] != r['timestamp']:
+            resets.add(r['device_id'])
+            fresh.append({**r, 'seq': None})
+            continue
+        if r.get('seq') is not None and (key in stored or key in seen):
+            duplicates.append(r)
+            continue
+        seen.add(key)
+        fresh.append(r)
+    for device_id in sorted(resets):
+        logger.warning(f"Counter seq device {device_id} ter-reset; pembacaan disimpan tanpa seq")
+    return fresh, duplicates
+
+
+def record_seq_hwm(readings):
+    """Naikkan high-water mark seq per device setelah pembacaan diterima"""
+    hwm = {}
+    for r in readings:
+        if r.get('seq') is not None:
+            hwm[r['device_id']] = max(hwm.get(r['device_id'], -1), r['seq'])
+    sensor_cache.set_seq_hwm(hwm)
+
+
+def attach_owners(readings):
+    """Isi petani_id / lahan_id tiap pembacaan dari pemetaan PerangkatSensor (in place)"""
+    owners = sensor_cache.get_device_owners(sorted({r['device_id'] for r in readings}))
+    for r in readings:
+        r['petani_id'], r['lahan_id'] = owners.get(r['device_id'], (None, None))
+    return readings
+
+
+def _stored_keys(readings):
+    """(device_id, seq) dari `readings` yang sudah ada di database"""
+    seqs = {}
+    for r in readings:
+        if r.get('seq') is not None:
+            seqs.setdefault(r['device_id'], set()).add(r['seq'])
+    stored = set()
+    for device_id, device_seqs in seqs.items():
+        stored.update(
+            (device_id, seq) for seq in
+            SensorData.objects.filter(device_id=device_id, seq__in=device_seqs).values_list('seq', flat=True)
+        )
+    return stored
+
+
+def bulk_insert_readings(valid, batch_size=500):
+    """
+    Simpan pembacaan tervalidasi dengan bulk_create (satu transaksi).
+    Return pembacaan yang benar-benar disimpan.
+
+    Kiriman ulang yang lolos drop_duplicates (race antar worker) memicu
+    IntegrityError pada unique (device_id, seq): pembacaan yang sudah
+    tersimpan dibuang lalu sisanya di-insert ulang sekali. Tidak memakai
+    ignore_conflicts karena INSERT IGNORE di MySQL juga menelan error data
+    (strict mode) sehingga baris yang tidak tersimpan ikut dihitung diterima.
+    """
+    try:
+        _bulk_create(valid, batch_size)
+        return valid
+    except IntegrityError:
+        if all(r.get('seq') is None for r in valid):
+            raise
+
+    stored = _stored_keys(valid)
+    fresh = [r for r in valid if (r['device_id'], r.get('seq')) not in stored]
+    if fresh:
+        _bulk_create(fresh, batch_size)
+    return fresh
+
+
+def _bulk_create(readings, batch_size):
+    objs = [
+        SensorData(
+            device_id=r['device_id'],
+            temperature=r['temperature'],
+            humidity=r['humidity'],
+            soil_moisture=r['soil_moisture'],
+            timestamp=r['timestamp'],
+            seq=r.get('seq'),
+            petani_id=r.get('petani_id'),
+            lahan_id=r.get('lahan_id'),
+        )
+        for r in readings
+    ]
+    with transaction.atomic():
+        SensorData.objects.bulk_create(objs, batch_size=batch_size)
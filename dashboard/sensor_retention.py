@@ -0,0 +1,327 @@
+# dashboard/sensor_retention.py
+"""
+Retensi data sensor: data mentah disimpan SENSOR_RAW_RETENTION_DAYS hari.
+
+Baris yang lebih tua (dan sudah masuk rollup) diarsipkan ke file NumPy .npz
+terkompresi per device per bulan di SENSOR_ARCHIVE_DIR, lalu dihapus dari
+database per batch. Tiap batch ditulis sebagai file part baru
+(`YYYY-MM.p<id>.npz`) tanpa menulis ulang arsip yang sudah ada; part sebuah
+bulan digabung sekali ke `YYYY-MM.npz` setelah bulan itu seluruhnya lewat
+cutoff. Rollup per menit dipangkas setelah
+SENSOR_MINUTE_ROLLUP_RETENTION_DAYS hari; rollup per jam / hari disimpan
+permanen sehingga chart & statistik jangka panjang tetap tersedia.
+
+`read_history()` menggabungkan arsip dan database secara transparan.
+"""
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import SensorData, SensorRollup
+from .sensor_rollup import _watermark
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = ('id', 'timestamp', 'temperature', 'humidity', 'soil_moisture', 'petani_id', 'lahan_id')
+
+
+def archive_dir():
+    return str(getattr(settings, 'SENSOR_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'var', 'sensor_archive')))
+
+
+def _device_dirname(device_id):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', device_id) or '_'
+
+
+def archive_path(device_id, year, month):
+    return os.path.join(archive_dir(), _device_dirname(device_id), f'{year:04d}-{month:02d}.npz')
+
+
+def _part_path(device_id, year, month, first_id):
+    # Nama dari id pertama: run yang terputus sebelum delete menimpa part yang sama
+    return os.path.join(archive_dir(), _device_dirname(device_id), f'{year:04d}-{month:02d}.p{first_id}.npz')
+
+
+def _month_files(dirpath, year, month):
+    """File arsip satu bulan: file gabungan (jika ada) + part yang belum digabung"""
+    prefix = f'{year:04d}-{month:02d}.'
+    try:
+        names = os.listdir(dirpath)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        os.path.join(dirpath, name) for name in names
+        if name == f'{prefix}npz' or name.startswith(f'{prefix}p') and name.endswith('.npz')
+    )
+
+
+def _to_micros(ts):
+    return int(ts.timestamp() * 1_000_000)
+
+
+def _load_archive(path):
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {field: data[field] for field in ARCHIVE_FIELDS}
+
+
+def _save(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp.{os.getpid()}.npz'
+    np.savez_compressed(tmp_path, **data)
+    os.replace(tmp_path, path)
+
+
+def _dedupe_sorted(data):
+    """Buang id ganda (arsip ulang setelah run terputus), urut timestamp"""
+    _, unique = np.unique(data['id'], return_index=True)
+    order = unique[np.argsort(data['timestamp'][unique], kind='stable')]
+    return {field: values[order] for field, values in data.items()}
+
+
+def _load_month(dirpath, year, month):
+    parts = [_load_archive(path) for path in _month_files(dirpath, year, month)]
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return _dedupe_sorted({field: np.concatenate([p[field] for p in parts]) for field in ARCHIVE_FIELDS})
+
+
+def _write_part(device_id, year, month, rows):
+    """Tulis rows (list tuple ARCHIVE_FIELDS) sebagai part baru; arsip lama tidak dibaca"""
+    data = {
+        'id': np.array([r[0] for r in rows], dtype=np.int64),
+        'timestamp': np.array([_to_micros(r[1]) for r in rows], dtype=np.int64),
+        'temperature': np.array([r[2] for r in rows], dtype=np.float32),
+        'humidity': np.array([r[3] for r in rows], dtype=np.float32),
+        'soil_moisture': np.array([r[4] for r in rows], dtype=np.int16),
+        'petani_id': np.array([r[5] or -1 for r in rows], dtype=np.int64),
+        'lahan_id': np.array([r[6] or -1 for r in rows], dtype=np.int64),
+    }
+    _save(_part_path(device_id, year, month, int(data['id'].min())), _dedupe_sorted(data))
+
+
+def _merge_month(device_id, year, month):
+    """Gabungkan semua part satu bulan ke YYYY-MM.npz (sekali per bulan)"""
+    dirpath = os.path.dirname(archive_path(device_id, year, month))
+    files = _month_files(dirpath, year, month)
+    parts = [path for path in files if path != archive_path(device_id, year, month)]
+    if not parts:
+        return
+    _save(archive_path(device_id, year, month), _load_month(dirpath, year, month))
+    for path in parts:
+        os.unlink(path)
+
+
+_PART_NAME = re.compile(r'^(\d{4})-(\d{2})\.p\d+\.npz$')
+
+
+def _unmerged_months(before):
+    """(device_dir, tahun, bulan) yang masih punya file part dan seluruhnya sebelum bulan `before`"""
+    root = archive_dir()
+    try:
+        device_dirs = os.listdir(root)
+    except FileNotFoundError:
+        return set()
+    months = set()
+    for device_dir in device_dirs:
+        dirpath = os.path.join(root, device_dir)
+        if not os.path.isdir(dirpath):
+            continue
+        for name in os.listdir(dirpath):
+            match = _PART_NAME.match(name)
+            if match and (int(match[1]), int(match[2])) < before:
+                months.add((device_dir, int(match[1]), int(match[2])))
+    return months
+
+
+def archive_raw(cutoff, batch_size=5000, max_batches=None):
+    """
+    Arsipkan lalu hapus SensorData dengan timestamp < cutoff, per batch.
+    Hanya baris yang sudah dikompaksi ke rollup (id <= watermark) yang diproses.
+    Return jumlah baris yang dihapus.
+    """
+    watermark = _watermark()
+    if not watermark:
+        logger.warning('Rollup sensor belum pernah dijalankan; data mentah tidak diarsipkan')
+        return 0
+
+    total = 0
+    batches = 0
+    last_id = 0
+    while max_batches is None or batches < max_batches:
+        rows = list(
+            SensorData.objects
+            .filter(timestamp__lt=cutoff, id__lte=watermark, id__gt=last_id)
+            .order_by('id')
+            .values_list('device_id', *ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            break
+
+        groups = defaultdict(list)
+        for device_id, *fields in rows:
+            ts = fields[1].astimezone(dt_timezone.utc)
+            groups[(device_id, ts.year, ts.month)].append(fields)
+        for (device_id, year, month), group in groups.items():
+            _write_part(device_id, year, month, group)
+
+        # Hapus hanya setelah arsip tertulis
+        ids = [r[1] for r in rows]
+        SensorData.objects.filter(id__in=ids).delete()
+
+        total += len(rows)
+        batches += 1
+        last_id = ids[-1]
+        if len(rows) < batch_size:
+            break
+
+    # Bulan yang seluruhnya sebelum cutoff tidak akan mendapat part baru lagi;
+    # termasuk part dari run sebelumnya yang belum sempat digabung
+    cutoff_utc = cutoff.astimezone(dt_timezone.utc)
+    for device_dir, year, month in sorted(_unmerged_months((cutoff_utc.year, cutoff_utc.month))):
+        _merge_month(device_dir, year, month)
+
+    if total:
+        logger.info(f"Retensi sensor: {total} baris mentah diarsipkan & dihapus")
+    return total
+
+
+def prune_minute_rollups(cutoff, batch_size=5000, max_batches=None):
+    """Hapus rollup per menit sebelum cutoff (rollup jam/hari tetap ada). Return jumlah baris."""
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            SensorRollup.objects
+            .filter(resolution='minute', bucket_start__lt=cutoff)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        SensorRollup.objects.filter(id__in=ids).delete()
+        total += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+def apply_retention(raw_days=None, minute_days=None, batch_size=None, max_batches=None, now=None):
+    now = now or timezone.now()
+    raw_days = raw_days or getattr(settings, 'SENSOR_RAW_RETENTION_DAYS', 30)
+    minute_days = minute_days or getattr(settings, 'SENSOR_MINUTE_ROLLUP_RETENTION_DAYS', 30)
+    batch_size = batch_size or getattr(settings, 'SENSOR_RETENTION_BATCH_SIZE', 5000)
+
+    return {
+        'raw_archived': archive_raw(now - timedelta(days=raw_days), batch_size, max_batches),
+        'minute_rollups_pruned': prune_minute_rollups(now - timedelta(days=minute_days), batch_size, max_batches),
+    }
+
+
+# ---------------- baca histori (arsip + database) ----------------
+def _months(time_from, time_to):
+    year, month = time_from.year, time_from.month
+    while (year, month) <= (time_to.year, time_to.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _archived_readings(time_from, time_to, scope, limit=None):
+    """
+    Pembacaan dari arsip, urut timestamp. Bulan dibaca berurutan; dengan
+    `limit`, pembacaan berhenti setelah bulan yang membuat jumlahnya >= limit
+    (bulan berikutnya pasti lebih baru).
+    """
+    root = archive_dir()
+    if not os.path.isdir(root):
+        return []
+
+    scope = scope or {}
+    device_ids = scope.get('device_id__in')
+    if device_ids:
+        devices = {_device_dirname(d): d for d in device_ids}
+    else:
+        devices = {name: None for name in os.listdir(root)}
+
+    start = _to_micros(time_from)
+    end = _to_micros(time_to)
+    time_from_utc = time_from.astimezone(dt_timezone.utc)
+    time_to_utc = time_to.astimezone(dt_timezone.utc)
+
+    readings = []
+    for year, month in _months(time_from_utc, time_to_utc):
+        if limit is not None and len(readings) >= limit:
+            break
+        month_readings = []
+        for dirname, device_id in devices.items():
+            data = _load_month(os.path.join(root, dirname), year, month)
+            if data is None:
+                continue
+            mask = (data['timestamp'] >= start) & (data['timestamp'] <= end)
+            if 'petani_id' in scope:
+                mask &= data['petani_id'] == scope['petani_id']
+            if 'lahan_id' in scope:
+                mask &= data['lahan_id'] == scope['lahan_id']
+            for i in np.flatnonzero(mask):
+                month_readings.append({
+                    'id': int(data['id'][i]),
+                    'device_id': device_id or dirname,
+                    'temperature': round(float(data['temperature'][i]), 2),
+                    'humidity': round(float(data['humidity'][i]), 2),
+                    'soil_moisture': int(data['soil_moisture'][i]),
+                    'timestamp': datetime.fromtimestamp(data['timestamp'][i] / 1_000_000, tz=dt_timezone.utc),
+                    'archived': True,
+                })
+        month_readings.sort(key=lambda r: (r['timestamp'], r['id']))
+        readings.extend(month_readings if limit is None else month_readings[:limit - len(readings)])
+    return readings
+
+
+def read_history(time_from, time_to, scope=None, now=None, limit=None):
+    """
+    Pembacaan mentah dalam rentang waktu, urut timestamp. Bagian rentang yang
+    lebih tua dari jendela data mentah dibaca dari arsip .npz. Dengan `limit`
+    hanya `limit` pembacaan paling awal yang dibaca & dikembalikan.
+    """
+    now = now or timezone.now()
+    raw_start = now - timedelta(days=getattr(settings, 'SENSOR_RAW_RETENTION_DAYS', 30))
+
+    readings = []
+    if time_from < raw_start:
+        # Pengarsipan bisa tertinggal: baris lama mungkin masih di DB juga (dedupe per id)
+        readings = _archived_readings(time_from, time_to, scope, limit)
+
+    queryset = SensorData.objects.filter(timestamp__gte=time_from, timestamp__lte=time_to)
+    if scope:
+        queryset = queryset.filter(**scope)
+    queryset = queryset.order_by('timestamp', 'id').values(
+        'id', 'device_id', 'temperature', 'humidity', 'soil_moisture', 'timestamp'
+    )
+    if limit is not None:
+        # Baris DB yang masuk `limit` teratas gabungan pasti masuk `limit` teratas DB
+        queryset = queryset[:limit]
+    seen = {r['id'] for r in readings}
+    for r in queryset:
+        if r['id'] in seen:
+            continue
+        readings.append({
+            **r,
+            'temperature': float(r['temperature']),
+            'humidity': float(r['humidity']),
+            'archived': False,
+        })
+
+    readings.sort(key=lambda r: (r['timestamp'], r['id']))
+    return readings if limit is None else readings[:limit]
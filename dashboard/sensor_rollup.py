@@ -0,0 +1,356 @@
+# dashboard/sensor_rollup.py
+"""
+Rollup SensorData per device per menit / jam / hari.
+
+`compact_rollups()` membaca SensorData baru (id > watermark) dan menambahkan
+agregatnya ke SensorRollup secara incremental, tanpa memindai ulang histori.
+Query chart / statistik membaca rollup ditambah "tail" data mentah yang belum
+dikompaksi, sehingga hasil tetap real-time. Pengelompokan bucket chart
+dilakukan di database (values().annotate()), bukan di Python.
+"""
+import logging
+from datetime import date, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, ExpressionWrapper, F, FloatField, IntegerField, Max, Min, Sum, Value
+from django.db.models.functions import ExtractHour, ExtractMinute, Floor, TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import SensorData, SensorRollup, SensorRollupState
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('temperature', 'humidity', 'soil_moisture')
+RESOLUTION_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+STATE_NAME = 'sensor_rollup'
+
+
+def bucket_start(ts, resolution):
+    """Awal bucket untuk timestamp; bucket harian mengikuti TIME_ZONE project"""
+    if resolution == 'minute':
+        return ts.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    local = timezone.localtime(ts)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# ---------------- agregat in-memory ----------------
+def _new_agg():
+    agg = {'count': 0}
+    for f in FIELDS:
+        agg[f'{f}_sum'] = 0.0
+        agg[f'{f}_min'] = None
+        agg[f'{f}_max'] = None
+    return agg
+
+
+def _add_reading(agg, values):
+    agg['count'] += 1
+    for f, v in zip(FIELDS, values):
+        agg[f'{f}_sum'] += v
+        agg[f'{f}_min'] = v if agg[f'{f}_min'] is None else min(agg[f'{f}_min'], v)
+        agg[f'{f}_max'] = v if agg[f'{f}_max'] is None else max(agg[f'{f}_max'], v)
+
+
+def _merge_agg(target, other):
+    target['count'] += other['count']
+    for f in FIELDS:
+        target[f'{f}_sum'] += other[f'{f}_sum'] or 0
+        for op, key in ((min, f'{f}_min'), (max, f'{f}_max')):
+            if other[key] is not None:
+                target[key] = other[key] if target[key] is None else op(target[key], other[key])
+
+
+def finalize(agg):
+    """Ubah agregat mentah menjadi avg/min/max per field"""
+    count = agg['count']
+    result = {'count': count}
+    for f in FIELDS:
+        result[f] = {
+            'avg': agg[f'{f}_sum'] / count if count else None,
+            'min': agg[f'{f}_min'],
+            'max': agg[f'{f}_max'],
+        }
+    return result
+
+
+# ---------------- kompaksi ----------------
+def _upsert(aggs):
+    """aggs: {(resolution, device_id, bucket_start): {agg..., petani_id, lahan_id}}"""
+    by_resolution = {}
+    for key, agg in aggs.items():
+        by_resolution.setdefault(key[0], {})[key] = agg
+
+    update_fields = ['count', 'petani_id', 'lahan_id'] + [
+        f'{f}_{s}' for f in FIELDS for s in ('sum', 'min', 'max')
+    ]
+
+    for resolution, items in by_resolution.items():
+        devices = {k[1] for k in items}
+        starts = [k[2] for k in items]
+        existing = {
+            (r.resolution, r.device_id, r.bucket_start): r
+            for r in SensorRollup.objects.filter(
+                resolution=resolution,
+                device_id__in=devices,
+                bucket_start__gte=min(starts),
+                bucket_start__lte=max(starts),
+            )
+        }
+
+        to_update, to_create = [], []
+        for key, agg in items.items():
+            row = existing.get(key)
+            if row is None:
+                row = SensorRollup(resolution=resolution, device_id=key[1], bucket_start=key[2])
+                merged = _new_agg()
+                to_create.append(row)
+            else:
+                merged = {k: getattr(row, k) for k in _new_agg()}
+                to_update.append(row)
+
+            _merge_agg(merged, agg)
+            for k, v in merged.items():
+                setattr(row, k, v)
+            row.petani_id = agg['petani_id'] or row.petani_id
+            row.lahan_id = agg['lahan_id'] or row.lahan_id
+
+        if to_update:
+            SensorRollup.objects.bulk_update(to_update, update_fields, batch_size=500)
+        if to_create:
+            SensorRollup.objects.bulk_create(to_create, batch_size=500)
+
+
+def _aggregate_rows(rows):
+    aggs = {}
+    for _id, device_id, petani_id, lahan_id, ts, temp, hum, soil in rows:
+        values = (float(temp), float(hum), float(soil))
+        for resolution in RESOLUTION_SECONDS:
+            key = (resolution, device_id, bucket_start(ts, resolution))
+            agg = aggs.get(key)
+            if agg is None:
+                agg = aggs[key] = {**_new_agg(), 'petani_id': None, 'lahan_id': None}
+            _add_reading(agg, values)
+            agg['petani_id'] = petani_id or agg['petani_id']
+            agg['lahan_id'] = lahan_id or agg['lahan_id']
+    return aggs
+
+
+def compact_rollups(batch_size=10000):
+    """
+    Agregasikan SensorData baru ke SensorRollup. Return jumlah baris mentah
+    yang diproses. Aman dijalankan berulang (watermark dikunci per batch).
+
+    Hanya baris dengan id <= max id yang terlihat pada run sebelumnya yang
+    diproses, supaya insert yang transaksinya belum commit saat run ini
+    (id lebih kecil tapi belum terlihat) tidak terlewat oleh watermark.
+    """
+    with transaction.atomic():
+        state, _ = SensorRollupState.objects.select_for_update().get_or_create(name=STATE_NAME)
+        limit_id = state.seen_max_id
+        state.seen_max_id = SensorData.objects.aggregate(m=Max('id'))['m'] or 0
+        state.save(update_fields=['seen_max_id', 'updated_at'])
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            state = SensorRollupState.objects.select_for_update().get(name=STATE_NAME)
+            rows = list(
+                SensorData.objects
+                .filter(id__gt=state.last_sensor_id, id__lte=limit_id)
+                .order_by('id')
+                .values_list('id', 'device_id', 'petani_id', 'lahan_id',
+                             'timestamp', 'temperature', 'humidity', 'soil_moisture')[:batch_size]
+            )
+            if not rows:
+                break
+
+            _upsert(_aggregate_rows(rows))
+            state.last_sensor_id = rows[-1][0]
+            state.save(update_fields=['last_sensor_id', 'updated_at'])
+
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if total:
+        logger.info(f"Rollup sensor: {total} baris diproses")
+    return total
+
+
+# ---------------- query ----------------
+def _watermark():
+    state = SensorRollupState.objects.filter(name=STATE_NAME).values_list('last_sensor_id', flat=True).first()
+    return state or 0
+
+
+def _scope(queryset, scope=None):
+    """
+    Terapkan filter scope, mis. {'device_id__in': [...], 'lahan_id': 3,
+    'petani_id': 7}. Nama field sama di SensorData dan SensorRollup.
+    """
+    if scope:
+        queryset = queryset.filter(**scope)
+    return queryset
+
+
+def _sql_aggregates(source_is_rollup):
+    """Ekspresi agregat SQL; alias diberi prefix agar tidak bentrok dengan nama field model"""
+    if source_is_rollup:
+        aggregates = {'agg_count': Sum('count')}
+        for f in FIELDS:
+            aggregates[f'agg_{f}_sum'] = Sum(f'{f}_sum')
+            aggregates[f'agg_{f}_min'] = Min(f'{f}_min')
+            aggregates[f'agg_{f}_max'] = Max(f'{f}_max')
+    else:
+        aggregates = {'agg_count': Count('id')}
+        for f in FIELDS:
+            aggregates[f'agg_{f}_sum'] = Sum(f, output_field=FloatField())
+            aggregates[f'agg_{f}_min'] = Min(f, output_field=FloatField())
+            aggregates[f'agg_{f}_max'] = Max(f, output_field=FloatField())
+    return aggregates
+
+
+def _strip_prefix(row):
+    agg = {k[len('agg_'):]: v for k, v in row.items() if k.startswith('agg_')}
+    for f in FIELDS:
+        agg[f'{f}_sum'] = float(agg[f'{f}_sum'] or 0)
+        for key in (f'{f}_min', f'{f}_max'):
+            if agg[key] is not None:
+                agg[key] = float(agg[key])
+    return agg
+
+
+def rollup_stats(time_from, time_to, resolution='day', scope=None):
+    """
+    Statistik gabungan (avg/min/max/count) dalam rentang waktu: satu query
+    agregat atas rollup + satu query agregat atas data mentah yang belum dikompaksi.
+    """
+    total = _new_agg()
+
+    rollup = _scope(SensorRollup.objects.filter(
+        resolution=resolution,
+        bucket_start__gte=bucket_start(time_from, resolution),
+        bucket_start__lte=time_to,
+    ), scope).aggregate(**_sql_aggregates(True))
+    if rollup['agg_count']:
+        _merge_agg(total, _strip_prefix(rollup))
+
+    tail = _scope(SensorData.objects.filter(
+        id__gt=_watermark(),
+        timestamp__gte=time_from,
+        timestamp__lte=time_to,
+    ), scope).aggregate(**_sql_aggregates(False))
+    if tail['agg_count']:
+        _merge_agg(total, _strip_prefix(tail))
+
+    return finalize(total)
+
+
+# ---------------- chart (agregasi di database) ----------------
+# WIB = UTC+7 tanpa DST
+WIB = dt_timezone(timedelta(hours=7))
+
+
+def wib_wallclock(field):
+    """
+    Ekspresi SQL `field + 7 jam`: jam dinding WIB yang disimpan sebagai UTC.
+    Trunc*/Extract* dengan tzinfo=WIB di MySQL memakai CONVERT_TZ, yang
+    menghasilkan NULL jika tabel time zone tidak dimuat (default XAMPP);
+    penjumlahan interval tidak bergantung pada tabel itu. Potong hasilnya
+    dengan tzinfo=UTC lalu tafsirkan sebagai WIB (`.replace(tzinfo=WIB)`).
+    """
+    return ExpressionWrapper(F(field) + Value(WIB.utcoffset(None)), output_field=DateTimeField())
+
+# Ukuran bucket chart yang "rapi", dalam detik
+CHART_STEPS = [
+    60, 120, 300, 600, 900, 1800,
+    3600, 7200, 10800, 21600, 43200,
+    86400, 2 * 86400, 7 * 86400,
+]
+
+
+def chart_step(seconds, max_points=300):
+    """Ukuran bucket terkecil sehingga rentang `seconds` menghasilkan <= max_points titik"""
+    for step in CHART_STEPS:
+        if seconds / step <= max_points:
+            return step
+    return CHART_STEPS[-1]
+
+
+def _bucket_expressions(field, step):
+    """
+    Ekspresi SQL (base, slot) yang memotong timestamp ke bucket `step` detik
+    dalam waktu WIB: base = awal jam/hari, slot = indeks sub-bucket di dalamnya.
+    """
+    local = wib_wallclock(field)
+    utc = dt_timezone.utc
+    if step < 3600:
+        base = TruncHour(local, tzinfo=utc)
+        slot = Floor(ExtractMinute(local, tzinfo=utc) / Value(step // 60), output_field=IntegerField())
+    elif step < 86400:
+        base = TruncDay(local, tzinfo=utc)
+        slot = Floor(ExtractHour(local, tzinfo=utc) / Value(step // 3600), output_field=IntegerField())
+    else:
+        base = TruncDay(local, tzinfo=utc)
+        slot = Value(0, output_field=IntegerField())
+    return base, slot
+
+
+def _grouped(queryset, field, step, source_is_rollup):
+    base, slot = _bucket_expressions(field, step)
+    return (
+        queryset
+        .annotate(chart_base=base, chart_slot=slot)
+        .values('chart_base', 'chart_slot')
+        .annotate(**_sql_aggregates(source_is_rollup))
+        .order_by()
+    )
+
+
+def chart_series(time_from, time_to, max_points=300, scope=None):
+    """
+    Deret chart dengan bucket adaptif (<= max_points titik), dikelompokkan di
+    database. Sumber: rollup per menit (bucket < 1 jam) atau per jam, ditambah
+    data mentah yang belum dikompaksi. Return (step_detik, [(bucket_wib, agg), ...]).
+    """
+    step = chart_step((time_to - time_from).total_seconds(), max_points)
+    resolution = 'minute' if step < 3600 else 'hour'
+
+    rollup_rows = _grouped(
+        _scope(SensorRollup.objects.filter(
+            resolution=resolution,
+            bucket_start__gte=bucket_start(time_from, resolution),
+            bucket_start__lte=time_to,
+        ), scope),
+        'bucket_start', step, True,
+    )
+    tail_rows = _grouped(
+        _scope(SensorData.objects.filter(
+            id__gt=_watermark(),
+            timestamp__gte=time_from,
+            timestamp__lte=time_to,
+        ), scope),
+        'timestamp', step, False,
+    )
+
+    buckets = {}
+    for rows in (rollup_rows, tail_rows):
+        for r in rows:
+            if r['chart_base'] is None:
+                # Seharusnya tidak terjadi (kolom NOT NULL); jangan hilang diam-diam
+                logger.error(f"Bucket chart NULL untuk {r['agg_count']} baris sensor dilewati")
+                continue
+            base = r['chart_base'].replace(tzinfo=WIB)
+            if step >= 86400:
+                # Bucket multi-hari: hari WIB dikelompokkan lagi di Python (<= max_points baris)
+                day_index = (base.date() - date(1970, 1, 1)).days
+                offset = -(day_index % (step // 86400))
+                key = base + timedelta(days=offset)
+            else:
+                key = base + timedelta(seconds=int(r['chart_slot']) * step)
+            _merge_agg(buckets.setdefault(key, _new_agg()), _strip_prefix(r))
+
+    return step, sorted(buckets.items())
@@ -1,3 +1,705 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Petani
+from admin_dashboard.statistik_service import dashboard_statistik, refresh_statistik
+
+from . import geo_tiles, sensor_binary, sensor_cache
+from .metrics import fingerprint
+from .micro_batcher import MicroBatcher
+from .models import CitraDaun, DeteksiTile, EksporRiwayat, HasilDeteksi, JenisHama, Lahan, PerangkatSensor, RiwayatDeteksi, SensorData
+from .sensor_retention import archive_raw, read_history
+from .riwayat_export import generate_export, requeue_stale_exports
+from .riwayat_service import decode_cursor, encode_cursor
+from .sensor_buffer import SensorWriteBuffer, _FlushInterrupted
+from .sensor_ingest import bulk_insert_readings, drop_duplicates, validate_readings
+from .sensor_rollup import WIB, chart_series, compact_rollups
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class ChartSeriesTest(TestCase):
+    """Bucket chart dihitung dalam WIB tanpa CONVERT_TZ"""
+
+    def _reading(self, ts, temperature):
+        SensorData.objects.create(device_id='ESP_T', temperature=temperature, humidity=50, soil_moisture=40, timestamp=ts)
+
+    def test_bucket_menit_mengikuti_jam_wib(self):
+        self._reading(_utc(2026, 1, 1, 16, 59, 30), 20)
+        self._reading(_utc(2026, 1, 1, 17, 0, 10), 30)
+        self._reading(_utc(2026, 1, 1, 17, 4, 50), 40)
+
+        step, series = chart_series(_utc(2026, 1, 1, 16, 0), _utc(2026, 1, 1, 18, 0))
+
+        self.assertEqual(step, 60)
+        self.assertEqual([key for key, _ in series], [
+            datetime(2026, 1, 1, 23, 59, tzinfo=WIB),
+            datetime(2026, 1, 2, 0, 0, tzinfo=WIB),
+            datetime(2026, 1, 2, 0, 4, tzinfo=WIB),
+        ])
+        self.assertEqual([agg['count'] for _, agg in series], [1, 1, 1])
+
+    def test_bucket_harian_dipotong_di_tengah_malam_wib(self):
+        # 16:30 UTC = 23:30 WIB (1 Jan), 17:30 UTC = 00:30 WIB (2 Jan)
+        self._reading(_utc(2026, 1, 1, 16, 30), 20)
+        self._reading(_utc(2026, 1, 1, 17, 30), 30)
+
+        step, series = chart_series(_utc(2025, 12, 1), _utc(2026, 1, 3), max_points=40)
+
+        self.assertEqual(step, 86400)
+        self.assertEqual([key for key, _ in series], [
+            datetime(2026, 1, 1, tzinfo=WIB),
+            datetime(2026, 1, 2, tzinfo=WIB),
+        ])
+        self.assertEqual(sum(agg['temperature_sum'] for _, agg in series), 50)
+
+
+def _buat_petani(username='petani_uji'):
+    get_user_model().objects.create_user(username, password='rahasia123')
+    return Petani.objects.get(user__username=username)
+
+
+def _buat_deteksi(petani, jenis_hama, waktu, tingkat='ringan', lahan=None):
+    citra = CitraDaun.objects.create(petani=petani, lahan=lahan, nama_file='daun.jpg', path_file='citra_daun/daun.jpg')
+    hasil = HasilDeteksi.objects.create(citra=citra, jenis_hama=jenis_hama, confidence_score=90, tingkat_serangan=tingkat)
+    HasilDeteksi.objects.filter(pk=citra.pk).update(waktu_deteksi=waktu)
+    hasil.waktu_deteksi = waktu
+    return hasil
+
+
+class StatistikHamaTest(TestCase):
+    """Statistik per hari WIB, materialisasi + tail setelah watermark"""
+
+    def setUp(self):
+        self.petani = _buat_petani()
+        self.wereng = JenisHama.objects.create(nama='Wereng')
+
+    @mock.patch('admin_dashboard.statistik_service._watermark_warned', False)
+    def test_peringatan_tanpa_watermark_sekali(self):
+        with self.assertLogs('admin_dashboard.statistik_service', 'WARNING') as logs:
+            dashboard_statistik(now=_utc(2026, 3, 10, 18, 0))
+            dashboard_statistik(now=_utc(2026, 3, 10, 18, 0))
+        self.assertEqual(len(logs.records), 1)
+
+    def test_tanpa_watermark_dihitung_dari_tail(self):
+        now = _utc(2026, 3, 10, 18, 0)  # 01:00 WIB, 11 Maret
+        _buat_deteksi(self.petani, self.wereng, _utc(2026, 3, 10, 17, 30), 'berat')  # 11 Maret WIB
+        _buat_deteksi(self.petani, self.wereng, _utc(2026, 3, 10, 16, 30))  # 10 Maret WIB
+
+        result = dashboard_statistik(now=now)
+
+        # Tanpa watermark tail dimulai dari awal hari ini (WIB)
+        self.assertEqual(result['deteksi_hari_ini'], 1)
+        self.assertEqual(result['top_pests'], [{'nama': 'Wereng', 'jumlah': 1}])
+        self.assertEqual(result['chart']['series']['high'][-1], 1)
+        self.assertEqual(result['chart']['series']['low'][-1], 0)
+
+    def test_refresh_tidak_menghitung_ganda(self):
+        now = _utc(2026, 3, 10, 18, 0)
+        _buat_deteksi(self.petani, self.wereng, _utc(2026, 3, 10, 17, 30))
+        _buat_deteksi(self.petani, self.wereng, _utc(2026, 3, 10, 17, 58))  # masih di dalam lag
+
+        self.assertEqual(refresh_statistik(now=now), 1)
+        self.assertEqual(refresh_statistik(now=now), 0)
+
+        result = dashboard_statistik(now=now)
+        self.assertEqual(result['deteksi_hari_ini'], 2)
+        self.assertEqual(result['top_pests'][0]['jumlah'], 2)
+
+
+class GeohashTest(SimpleTestCase):
+    def test_encode_titik_referensi(self):
+        self.assertEqual(geo_tiles.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertTrue(geo_tiles.encode(-6.2, 106.816666, 8).startswith(geo_tiles.encode(-6.2, 106.816666, 5)))
+
+    def test_decode_bbox_memuat_titik(self):
+        lat, lon = -7.797068, 110.370529
+        min_lat, min_lon, max_lat, max_lon = geo_tiles.decode_bbox(geo_tiles.encode(lat, lon, 6))
+        self.assertTrue(min_lat <= lat <= max_lat and min_lon <= lon <= max_lon)
+
+    def test_is_geohash(self):
+        self.assertTrue(geo_tiles.is_geohash('qqguy'))
+        self.assertFalse(geo_tiles.is_geohash(''))
+        self.assertFalse(geo_tiles.is_geohash('qqgua'))  # 'a' bukan base32 geohash
+
+
+class ParseKoordinatTest(SimpleTestCase):
+    def test_koma_desimal_dan_pembulatan(self):
+        lat, lon = geo_tiles.parse_koordinat(' -6,2000001 ', '106.8166666')
+        self.assertEqual((str(lat), str(lon)), ('-6.200000', '106.816667'))
+
+    def test_kosong(self):
+        self.assertEqual(geo_tiles.parse_koordinat('', None), (None, None))
+
+    def test_tidak_valid(self):
+        for lat, lon in [('abc', '1'), ('-6', ''), ('91', '0'), ('0', '-180.5'),
+                         ('nan', '0'), ('0', 'sNaN'), ('Infinity', '0'), ('0', '-inf')]:
+            with self.subTest(lat=lat, lon=lon), self.assertRaises(ValueError):
+                geo_tiles.parse_koordinat(lat, lon)
+
+
+class EditLahanTest(TestCase):
+    def setUp(self):
+        self.petani = _buat_petani()
+        self.lahan = Lahan.objects.create(petani=self.petani, nama_lahan='Blok A', lokasi='Sleman', luas_daerah='1 ha',
+                                          latitude='-7.797068', longitude='110.370529')
+        get_user_model().objects.create_superuser('admin_uji', password='rahasia123')
+        self.client.login(username='admin_uji', password='rahasia123')
+        self.url = reverse('admin_dashboard:edit_lahan', args=[self.lahan.pk])
+
+    def test_form_berisi_koordinat(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'name="latitude" value="-7.797068"')
+        self.assertContains(response, 'name="longitude" value="110.370529"')
+
+    def test_simpan_koordinat_baru(self):
+        response = self.client.post(self.url, {
+            'petani': self.petani.pk, 'nama_lahan': 'Blok A', 'lokasi': 'Sleman', 'luas_daerah': '1 ha',
+            'jenis_tanaman': 'Padi', 'status_aktif': 'on', 'latitude': '-6,914744', 'longitude': '107.609810',
+        })
+        self.assertRedirects(response, reverse('admin_dashboard:data_lahan'), fetch_redirect_response=False)
+
+        self.lahan.refresh_from_db()
+        self.assertEqual((str(self.lahan.latitude), str(self.lahan.longitude)), ('-6.914744', '107.609810'))
+        self.assertTrue(self.lahan.geohash)
+        self.assertEqual(self.lahan.geohash, geo_tiles.encode(self.lahan.latitude, self.lahan.longitude))
+
+
+class DeteksiTileTest(TestCase):
+    def test_rebuild_per_hari_wib(self):
+        petani = _buat_petani()
+        lahan = Lahan.objects.create(petani=petani, nama_lahan='Blok A', lokasi='Sleman', luas_daerah='1 ha',
+                                     latitude='-7.797068', longitude='110.370529')
+        wereng = JenisHama.objects.create(nama='Wereng')
+        _buat_deteksi(petani, wereng, _utc(2026, 3, 10, 16, 30), lahan=lahan)  # 23:30 WIB, 10 Maret
+        _buat_deteksi(petani, wereng, _utc(2026, 3, 10, 17, 30), lahan=lahan)  # 00:30 WIB, 11 Maret
+
+        self.assertEqual(geo_tiles.rebuild_tiles(), 2)
+        self.assertEqual(
+            sorted(DeteksiTile.objects.values_list('tanggal', 'tile', 'jumlah')),
+            [(date(2026, 3, 10), lahan.geohash, 1), (date(2026, 3, 11), lahan.geohash, 1)],
+        )
+
+
+class SensorBinaryTest(SimpleTestCase):
+    def _frame(self, records, device_id=b'ESP_BIN'):
+        header = sensor_binary.HEADER.pack(sensor_binary.MAGIC, sensor_binary.VERSION, len(records), device_id)
+        return header + b''.join(sensor_binary.RECORD.pack(*r) for r in records)
+
+    def test_decode_frame(self):
+        readings = sensor_binary.decode_frame(self._frame([(7, 1767225600, -1234, 6550, 42), (0, 0, 2500, 0, 0)]))
+
+        self.assertEqual(readings[0], {
+            'device_id': 'ESP_BIN', 'seq': 7, 'timestamp': 1767225600,
+            'temperature': -12.34, 'humidity': 65.5, 'soil_moisture': 42,
+        })
+        # seq 0 dan timestamp 0 berarti "tidak ada"
+        self.assertIsNone(readings[1]['seq'])
+        self.assertIsNone(readings[1]['timestamp'])
+
+    def test_frame_rusak(self):
+        frame = self._frame([(1, 0, 0, 0, 0)])
+        for data in [frame[:10], b'XX' + frame[2:], frame[:2] + bytes([2]) + frame[3:], frame + b'\0']:
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                sensor_binary.decode_frame(data)
+
+    def test_encode_ack(self):
+        magic, status_code, accepted, rejected, ack_seq = sensor_binary.ACK.unpack(sensor_binary.encode_ack(3, 1, 9))
+        self.assertEqual((magic, status_code, accepted, rejected, ack_seq), (b'AK', sensor_binary.ACK_PARTIAL, 3, 1, 9))
+        self.assertEqual(sensor_binary.ACK.unpack(sensor_binary.encode_ack(0, 2))[1], sensor_binary.ACK_ERROR)
+
+
+class ValidateReadingsTest(SimpleTestCase):
+    now = _utc(2026, 5, 1, 12, 0)
+
+    def test_valid_dan_ditolak(self):
+        valid, rejected = validate_readings([
+            {'device_id': 'ESP_A', 'temperature': '25.456', 'humidity': 70, 'soil_moisture': 40.9, 'seq': 5},
+            {'temperature': 'nan', 'humidity': 70, 'soil_moisture': 40},
+            {'temperature': 25, 'humidity': 101, 'soil_moisture': 40},
+            {'temperature': 25, 'humidity': 70},
+            'bukan dict',
+            {'temperature': 25, 'humidity': 70, 'soil_moisture': 40, 'timestamp': 'kemarin'},
+            {'temperature': 25, 'humidity': 70, 'soil_moisture': 40, 'timestamp': '2026-05-01T13:00:00Z'},
+            {'temperature': 25, 'humidity': 70, 'soil_moisture': 40, 'timestamp': 0},
+            {'temperature': 25, 'humidity': 70, 'soil_moisture': 40, 'seq': 1.5},
+            {'temperature': 25, 'humidity': 70, 'soil_moisture': 40, 'seq': -1},
+        ], now=self.now)
+
+        self.assertEqual(rejected, [
+            [1, 'missing temperature'],
+            [2, 'humidity out of range'],
+            [3, 'missing soil_moisture'],
+            [4, 'missing temperature'],
+            [5, 'invalid timestamp'],
+            [6, 'timestamp in the future'],
+            [7, 'timestamp too old'],
+            [8, 'invalid seq'],
+            [9, 'invalid seq'],
+        ])
+        self.assertEqual(len(valid), 1)
+        self.assertEqual(valid[0]['device_id'], 'ESP_A')
+        self.assertEqual(valid[0]['temperature'], 25.46)
+        self.assertEqual(valid[0]['soil_moisture'], 40)
+        self.assertEqual(valid[0]['timestamp'], self.now)
+        self.assertFalse(valid[0]['device_time'])
+
+    def test_device_id_default_dan_dipotong(self):
+        valid, _ = validate_readings([
+            {'temperature': 25, 'humidity': 70, 'soil_moisture': 40},
+            {'device_id': 'x' * 80, 'temperature': 25, 'humidity': 70, 'soil_moisture': 40, 'timestamp': 1777636800},
+        ], now=self.now)
+        self.assertEqual(valid[0]['device_id'], 'ESP8266_001')
+        self.assertEqual(valid[1]['device_id'], 'x' * 50)
+        self.assertEqual(valid[1]['timestamp'], self.now)
+        self.assertTrue(valid[1]['device_time'])
+
+
+class DropDuplicatesTest(TestCase):
+    now = _utc(2026, 5, 1, 12, 0)
+
+    def setUp(self):
+        cache.clear()
+
+    def _readings(self, *items):
+        valid, rejected = validate_readings([
+            {'device_id': device_id, 'seq': seq, 'timestamp': timestamp, 'temperature': 25, 'humidity': 70, 'soil_moisture': 40}
+            for device_id, seq, timestamp in items
+        ], now=self.now)
+        self.assertEqual(rejected, [])
+        return valid
+
+    def test_kiriman_ulang_dibuang(self):
+        bulk_insert_readings(self._readings(('ESP_A', 1, 1777636000), ('ESP_A', 2, 1777636060)))
+
+        fresh, duplicates = drop_duplicates(self._readings(
+            ('ESP_A', 2, 1777636060), ('ESP_A', 3, 1777636120), ('ESP_A', 3, 1777636120), ('ESP_A', None, None),
+        ))
+
+        self.assertEqual([r['seq'] for r in fresh], [3, None])
+        self.assertEqual([r['seq'] for r in duplicates], [2, 3])
+
+    def test_counter_reset_disimpan_tanpa_seq(self):
+        bulk_insert_readings(self._readings(('ESP_A', 1, 1777636000)))
+
+        fresh, duplicates = drop_duplicates(self._readings(('ESP_A', 1, 1777630000)))
+
+        self.assertEqual(duplicates, [])
+        self.assertIsNone(fresh[0]['seq'])
+
+    def test_insert_bersamaan_tidak_dihitung_tersimpan(self):
+        bulk_insert_readings(self._readings(('ESP_A', 1, 1777636000)))
+
+        # Lolos drop_duplicates di worker lain, lalu bentrok di unique (device_id, seq)
+        stored = bulk_insert_readings(self._readings(('ESP_A', 1, 1777636000), ('ESP_A', 2, 1777636060)))
+
+        self.assertEqual([r['seq'] for r in stored], [2])
+        self.assertEqual(SensorData.objects.filter(device_id='ESP_A').count(), 2)
+
+
+@override_settings(RIWAYAT_EXPORT_THREAD=False, MEDIA_ROOT=tempfile.mkdtemp())
+class EksporRiwayatTest(TestCase):
+    def setUp(self):
+        self.petani = _buat_petani()
+        self.admin = get_user_model().objects.create_superuser('admin_uji', password='rahasia123')
+
+    def test_petani_id_tidak_valid_atau_tidak_ada(self):
+        self.client.force_login(self.admin)
+        url = reverse('dashboard:export_csv')
+        self.assertEqual(self.client.get(url, {'petani_id': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'petani_id': '999999'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'petani_id': str(self.petani.pk)}).status_code, 200)
+
+    def test_tanggal_tidak_valid(self):
+        self.client.force_login(self.petani.user)
+        url = reverse('dashboard:export_pdf')
+        for params in [{'dari': 'kemarin'}, {'sampai': '2026-02-30'}, {'dari': '2026-03-02', 'sampai': '2026-03-01'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+        response = self.client.get(url, {'dari': '2026-03-01', 'sampai': '2026-03-31'})
+        self.assertEqual(response.status_code, 200)
+        pdf = b''.join(response.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF-1.4') and pdf.endswith(b'%%EOF\n'))
+
+    def test_download_hanya_untuk_pemilik_job(self):
+        self.client.force_login(self.petani.user)
+        job_id = self.client.get(reverse('dashboard:export_csv'), {'background': '1'}).json()['job_id']
+        generate_export(job_id)
+
+        status_json = self.client.get(reverse('dashboard:export_status', args=[job_id])).json()
+        self.assertEqual(status_json['status'], 'done')
+        self.assertEqual(status_json['download_url'], reverse('dashboard:export_download', args=[job_id]))
+        self.assertNotIn(f'riwayat_{job_id}.', EksporRiwayat.objects.get(id=job_id).file.name)
+
+        response = self.client.get(status_json['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith('\ufeffTanggal'.encode('utf-8')))
+        response.close()
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(status_json['download_url']).status_code, 404)
+
+    def test_job_processing_macet_diklaim_ulang(self):
+        job = EksporRiwayat.objects.create(user=self.admin, format='csv', status='processing')
+        EksporRiwayat.objects.filter(id=job.id).update(processing_started=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale_exports(), 1)
+        self.assertEqual(EksporRiwayat.objects.get(id=job.id).status, 'pending')
+        self.assertEqual(generate_export(job.id).status, 'done')
+
+
+class SensorRetentionTest(TestCase):
+    now = _utc(2026, 5, 1, 12, 0)
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        override = override_settings(SENSOR_ARCHIVE_DIR=self.archive_dir, SENSOR_RAW_RETENTION_DAYS=30)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        for i, ts in enumerate([_utc(2026, 2, 10), _utc(2026, 2, 20), _utc(2026, 3, 5), _utc(2026, 3, 25), _utc(2026, 4, 30)]):
+            SensorData.objects.create(device_id='ESP_R', temperature=20 + i, humidity=50, soil_moisture=40, timestamp=ts)
+        compact_rollups()
+        compact_rollups()
+
+    def test_arsip_per_batch_lalu_digabung_per_bulan(self):
+        self.assertEqual(archive_raw(_utc(2026, 3, 31), batch_size=1), 4)
+
+        files = sorted(os.listdir(os.path.join(self.archive_dir, 'ESP_R')))
+        # Februari sudah lewat cutoff seluruhnya -> satu file; Maret masih per part
+        self.assertEqual(files[0], '2026-02.npz')
+        self.assertEqual(len(files), 3)
+        self.assertTrue(all(name.startswith('2026-03.p') for name in files[1:]))
+        self.assertEqual(SensorData.objects.count(), 1)
+
+        readings = read_history(_utc(2026, 1, 1), self.now, now=self.now)
+        self.assertEqual([r['temperature'] for r in readings], [20, 21, 22, 23, 24])
+        self.assertEqual([r['archived'] for r in readings], [True] * 4 + [False])
+
+    def test_part_dari_run_sebelumnya_ikut_digabung(self):
+        archive_raw(_utc(2026, 3, 31), batch_size=1)
+        # Run berikutnya tidak mengarsipkan baris Maret baru, tapi Maret kini seluruhnya lewat cutoff
+        self.assertEqual(archive_raw(_utc(2026, 4, 2)), 0)
+
+        self.assertEqual(sorted(os.listdir(os.path.join(self.archive_dir, 'ESP_R'))), ['2026-02.npz', '2026-03.npz'])
+        readings = read_history(_utc(2026, 1, 1), self.now, now=self.now)
+        self.assertEqual([r['temperature'] for r in readings], [20, 21, 22, 23, 24])
+
+    def test_limit_berhenti_di_bulan_pertama(self):
+        archive_raw(_utc(2026, 3, 31))
+
+        readings = read_history(_utc(2026, 1, 1), self.now, now=self.now, limit=2)
+        self.assertEqual([r['timestamp'] for r in readings], [_utc(2026, 2, 10), _utc(2026, 2, 20)])
+
+        readings = read_history(_utc(2026, 3, 1), self.now, now=self.now, limit=3)
+        self.assertEqual([r['temperature'] for r in readings], [22, 23, 24])
+
+
+class SensorCacheVersionTest(TestCase):
+    """Versi data (ETag) tidak boleh basi saat cache hanya per proses"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _reading(self, ts):
+        return SensorData.objects.create(device_id='ESP_C', temperature=25, humidity=60, soil_moisture=30, timestamp=ts)
+
+    def test_locmem_memakai_versi_dari_database(self):
+        self._reading(_utc(2026, 5, 1, 10, 0))
+        token, _ = sensor_cache.data_version({})
+
+        # Ingest di worker lain: cache proses ini tidak tahu
+        self._reading(_utc(2026, 5, 1, 10, 1))
+        self.assertNotEqual(sensor_cache.data_version({})[0], token)
+        self.assertIsNone(sensor_cache.get_latest({}))
+
+    @override_settings(SENSOR_CACHE_SHARED=True)
+    def test_cache_bersama_memakai_versi_write_through(self):
+        reading = self._reading(_utc(2026, 5, 1, 10, 0))
+        sensor_cache.record_readings([reading])
+
+        token, _ = sensor_cache.data_version({})
+        self.assertTrue(token.startswith('w'))
+        self.assertEqual(sensor_cache.get_latest({})['id'], reading.id)
+
+
+class SensorLatestEndpointTest(TestCase):
+    """/api/sensor/latest/: satu query saat miss, nol query saat hit (juga dengan LocMem)"""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('dashboard:get_latest_sensor_data')
+
+    def _reading(self, ts):
+        return SensorData.objects.create(device_id='ESP_L', temperature=25, humidity=60, soil_moisture=30, timestamp=ts)
+
+    def test_salinan_lokal_dan_etag_tanpa_query_versi(self):
+        first = self._reading(_utc(2026, 5, 1, 10, 0))
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['data']['id'], first.id)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        # Ingest di proses ini membuang salinan lokal
+        second = self._reading(_utc(2026, 5, 1, 10, 1))
+        sensor_cache.record_readings([second])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['id'], second.id)
+
+    @override_settings(SENSOR_LATEST_LOCAL_TIMEOUT=0.01)
+    def test_salinan_lokal_kedaluwarsa(self):
+        self._reading(_utc(2026, 5, 1, 10, 0))
+        self.client.get(self.url)
+
+        # Ingest di worker lain terlihat setelah TTL lokal habis
+        other = self._reading(_utc(2026, 5, 1, 10, 1))
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 1):
+            self.assertEqual(self.client.get(self.url).json()['data']['id'], other.id)
+
+
+class SensorHistoryAccessTest(TestCase):
+    def setUp(self):
+        self.petani = _buat_petani()
+        self.lain = _buat_petani('petani_lain')
+        SensorData.objects.create(device_id='ESP_A', temperature=25, humidity=60, soil_moisture=30, petani=self.petani)
+        SensorData.objects.create(device_id='ESP_B', temperature=26, humidity=60, soil_moisture=30, petani=self.lain)
+        self.url = reverse('dashboard:get_sensor_history')
+
+    def test_butuh_login(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_petani_hanya_data_sendiri(self):
+        self.client.force_login(self.petani.user)
+        response = self.client.get(self.url)
+        self.assertEqual([r['device_id'] for r in response.json()['data']], ['ESP_A'])
+
+        response = self.client.get(self.url, {'petani_id': self.lain.pk})
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_semua_petani(self):
+        get_user_model().objects.create_superuser('admin_uji', password='rahasia123')
+        self.client.login(username='admin_uji', password='rahasia123')
+        response = self.client.get(self.url, {'petani_id': self.lain.pk})
+        self.assertEqual([r['device_id'] for r in response.json()['data']], ['ESP_B'])
+
+
+class PestRiskParamTest(TestCase):
+    def test_lahan_id_bukan_angka(self):
+        self.client.force_login(_buat_petani().user)
+        response = self.client.get(reverse('dashboard:get_pest_risk'), {'lahan_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SensorStreamParamTest(TestCase):
+    def test_hours_tidak_valid_ditolak(self):
+        for hours in ['abc', 'nan', 'inf', '0', '-1', '1e9']:
+            with self.subTest(hours=hours):
+                response = self.client.get(reverse('dashboard:get_sensor_chart_raw'), {'hours': hours})
+                self.assertEqual(response.status_code, 400)
+                with override_settings(SENSOR_STREAM_WSGI=True):
+                    response = self.client.get(reverse('dashboard:sensor_stream'), {'hours': hours})
+                self.assertEqual(response.status_code, 400)
+
+    def test_scope_bukan_angka_ditolak(self):
+        self.client.force_login(_buat_petani().user)
+        for name in ['get_latest_sensor_data', 'get_statistics', 'get_sensor_history', 'get_sensor_chart_raw']:
+            for param in ['lahan_id', 'petani_id']:
+                with self.subTest(name=name, param=param):
+                    response = self.client.get(reverse(f'dashboard:{name}'), {param: 'abc'})
+                    self.assertEqual(response.status_code, 400)
+
+    def test_stream_wsgi_nonaktif_default(self):
+        self.assertEqual(self.client.get(reverse('dashboard:sensor_stream'), {'hours': '1'}).status_code, 204)
+
+
+
+class StatusDeteksiWaitTest(TestCase):
+    def test_wait_harus_angka_terhingga(self):
+        self.client.force_login(_buat_petani().user)
+        for wait in ['nan', 'inf', '-inf', 'abc']:
+            with self.subTest(wait=wait):
+                response = self.client.get(reverse('dashboard:ai_detect_status', args=[1]), {'wait': wait})
+                self.assertEqual(response.status_code, 400)
+
+
+
+class PerangkatSensorTest(TestCase):
+    """Pembacaan dari device yang dipetakan otomatis terikat ke lahan/petani"""
+
+    def setUp(self):
+        cache.clear()
+        self.petani = _buat_petani()
+        self.lahan = Lahan.objects.create(petani=self.petani, nama_lahan='Blok A', lokasi='Sleman', luas_daerah='1 ha')
+        PerangkatSensor.objects.create(device_id='ESP_LAHAN', lahan=self.lahan)
+
+    def test_batch_mengisi_lahan_dan_petani(self):
+        response = self.client.post(reverse('dashboard:receive_sensor_data_batch'), [
+            {'device_id': 'ESP_LAHAN', 'temperature': 25, 'humidity': 70, 'soil_moisture': 40},
+            {'device_id': 'ESP_LAIN', 'temperature': 25, 'humidity': 70, 'soil_moisture': 40},
+        ], content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(SensorData.objects.values_list('device_id', 'petani_id', 'lahan_id')),
+            [('ESP_LAHAN', self.petani.pk, self.lahan.pk), ('ESP_LAIN', None, None)],
+        )
+
+    def test_pemetaan_baru_menghapus_cache(self):
+        self.assertEqual(sensor_cache.get_device_owners(['ESP_BARU']), {'ESP_BARU': (None, None)})
+
+        PerangkatSensor.objects.create(device_id='ESP_BARU', lahan=self.lahan)
+        self.assertEqual(sensor_cache.get_device_owners(['ESP_BARU']), {'ESP_BARU': (self.petani.pk, self.lahan.pk)})
+
+
+class SensorWriteBufferTest(TestCase):
+    """Baris yang ditolak database tidak boleh menahan seluruh buffer"""
+
+    def setUp(self):
+        cache.clear()
+        self.dead_letter = os.path.join(tempfile.mkdtemp(), 'dead_letter.jsonl')
+        self.buffer = SensorWriteBuffer(flush_size=4, dead_letter_path=self.dead_letter)
+        self.buffer._started = True  # tanpa thread background
+
+    def _isi(self, n, rusak=()):
+        for i in range(n):
+            self.buffer.add({
+                'device_id': 'ESP_BUF', 'temperature': 25, 'humidity': 70, 'soil_moisture': 40,
+                'timestamp': _utc(2026, 5, 1, 10, i), 'seq': i + 1, 'rusak': i in rusak,
+            })
+
+    def test_baris_rusak_ke_dead_letter(self):
+        def insert(readings, batch_size=500):
+            if any(r['rusak'] for r in readings):
+                raise ValueError('Data too long')
+            return bulk_insert_readings(readings, batch_size)
+
+        self._isi(7, rusak={2, 5})
+        with mock.patch('dashboard.sensor_buffer.bulk_insert_readings', side_effect=insert):
+            self.assertEqual(self.buffer.flush(), 5)
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(sorted(SensorData.objects.values_list('seq', flat=True)), [1, 2, 4, 5, 7])
+        with open(self.dead_letter, encoding='utf-8') as f:
+            dead = [json.loads(line) for line in f]
+        self.assertEqual(sorted((r['seq'], r['error']) for r in dead), [(3, 'Data too long'), (6, 'Data too long')])
+
+    def test_koneksi_putus_dikembalikan_ke_antrian(self):
+        self._isi(3)
+        with mock.patch('dashboard.sensor_buffer.bulk_insert_readings', side_effect=ValueError('gone away')), \
+                mock.patch('dashboard.sensor_buffer._db_usable', return_value=False), \
+                self.assertRaises(_FlushInterrupted):
+            self.buffer.flush()
+
+        self.assertEqual(len(self.buffer), 3)
+        self.assertFalse(os.path.exists(self.dead_letter))
+        self.assertEqual(self.buffer.flush(), 3)
+
+
+class RiwayatCursorTest(SimpleTestCase):
+    def test_encode_decode(self):
+        created_at = _utc(2026, 4, 1, 8, 30, 15, 123456)
+        cursor = encode_cursor(SimpleNamespace(created_at=created_at, id=42))
+
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), (created_at, 42))
+
+    def test_cursor_rusak_ditolak(self):
+        bukan_tanggal = base64.urlsafe_b64encode(b'kemarin|5').decode().rstrip('=')
+        for cursor in ['', '!!!', 'YWJj', bukan_tanggal]:
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_literal_dan_daftar_in_diringkas(self):
+        self.assertEqual(
+            fingerprint("SELECT *  FROM sensor_data\n WHERE device_id = 'ESP_01' AND id IN (1, 2, 3) LIMIT 21"),
+            'SELECT * FROM sensor_data WHERE device_id = ? AND id IN (...) LIMIT ?',
+        )
+        self.assertEqual(
+            fingerprint("UPDATE lahan SET nama_lahan = 'Blok ''A''', luas = 1.5 WHERE id IN (%s, %s)"),
+            'UPDATE lahan SET nama_lahan = ?, luas = ? WHERE id IN (...)',
+        )
+
+    def test_nama_tabel_berangka_tidak_diubah(self):
+        self.assertEqual(fingerprint('SELECT t1.id FROM table2 t1'), 'SELECT t1.id FROM table2 t1')
+        self.assertEqual(len(fingerprint('SELECT ' + 'kolom, ' * 200)), 500)
+
+
+class DeteksiBulkTest(TestCase):
+    def setUp(self):
+        self.petani = _buat_petani()
+        self.lahan = Lahan.objects.create(petani=self.petani, nama_lahan='Blok A', lokasi='Sleman', luas_daerah='1 ha')
+        self.client.force_login(self.petani.user)
+
+    def _hasil(self, class_name):
+        return {'success': True, 'prediction': {
+            'class_name': class_name, 'display_name': class_name, 'confidence': 91.5, 'severity': 'Sedang', 'disease_info': {},
+        }}
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_riwayat_id_terisi_tanpa_returning_bulk_insert(self):
+        images = [SimpleUploadedFile(f'daun{i}.jpg', b'jpeg', content_type='image/jpeg') for i in range(2)]
+        hasil = [self._hasil('Leaf Mold'), {'success': False, 'error': 'Gambar rusak'}]
+
+        # MySQL: bulk_create tidak mengembalikan ID
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch('dashboard.views.pest_ai.predict_batch', return_value=hasil):
+            response = self.client.post(reverse('dashboard:ai_detect_bulk'), {'lahan_id': self.lahan.pk, 'images': images})
+
+        self.assertEqual(response.status_code, 200)
+        sukses, gagal = response.json()['results']
+        self.assertIsNotNone(sukses['riwayat_id'])
+        self.assertEqual(RiwayatDeteksi.objects.get(pk=sukses['riwayat_id']).hasil_deteksi_id, sukses['citra_id'])
+        self.assertFalse(gagal['success'])
+
+
+class MicroBatcherTest(SimpleTestCase):
+    def test_hasil_per_pemanggil(self):
+        batcher = MicroBatcher(lambda batch: batch.sum(axis=(1, 2)), window_ms=1)
+        self.assertEqual(batcher.predict(np.ones((2, 3))), 6)
+
+    def test_jumlah_baris_tidak_sesuai_menggagalkan_semua(self):
+        batcher = MicroBatcher(lambda batch: batch[:-1], window_ms=50, timeout=5)
+        futures = [batcher.submit(np.zeros((2, 2))) for _ in range(3)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+
+class MetricsViewTest(TestCase):
+    def test_ip_lokal_saja_tidak_cukup(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='rahasia')
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer salah').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer rahasia').status_code, 200)
+
+    def test_user_staff(self):
+        get_user_model().objects.create_superuser('admin_uji', password='rahasia123')
+        self.client.login(username='admin_uji', password='rahasia123')
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
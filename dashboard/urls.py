@@ -11,14 +11,27 @@ urlpatterns = [
     path('rekomendasi/', views.rekomendasi_view, name='rekomendasi'),
     path("rekomendasi/<int:detection_id>/", views.recommendation_detail, name="recommendation_detail"),
     path('riwayat/', views.riwayat_view, name='riwayat'),
+    path('api/riwayat/', views.riwayat_api, name='riwayat_api'),
+    path('riwayat/export/pdf/', views.export_riwayat, {'fmt': 'pdf'}, name='export_pdf'),
+    path('riwayat/export/csv/', views.export_riwayat, {'fmt': 'csv'}, name='export_csv'),
+    path('riwayat/export/<int:job_id>/status/', views.export_status, name='export_status'),
+    path('riwayat/export/<int:job_id>/download/', views.export_download, name='export_download'),
     path('pengaturan/', views.pengaturan_view, name='pengaturan'),
     path('profile/', views.profile_view, name='profile'),
     
     # API endpoints
     path('api/test/', views.test_api, name='test_api'),
     path('api/sensor/data/', views.receive_sensor_data, name='receive_sensor_data'),
+    path('api/sensor/data/batch/', views.receive_sensor_data_batch, name='receive_sensor_data_batch'),
     path('api/sensor/latest/', views.get_latest_sensor_data, name='get_latest_sensor_data'),
+    path('api/sensor/snapshot/', views.get_sensor_snapshot, name='get_sensor_snapshot'),
     path('api/sensor/statistics/', views.get_statistics, name='get_statistics'),  # ← TAMBAH INI
     path('api/sensor/chart/raw/', views.get_sensor_chart_raw, name='get_sensor_chart_raw'),
+    path('api/sensor/history/', views.get_sensor_history, name='get_sensor_history'),
+    path('api/sensor/stream/', views.sensor_stream, name='sensor_stream'),
+    path('api/risk/', views.get_pest_risk, name='get_pest_risk'),
+    path('api/peta/sebaran/', views.get_outbreak_tiles, name='get_outbreak_tiles'),
     path('api/ai/detect/', views.proses_deteksi_ai, name='ai_detect'),
+    path('api/ai/detect/bulk/', views.proses_deteksi_ai_bulk, name='ai_detect_bulk'),
+    path('api/ai/detect/<int:citra_id>/status/', views.status_deteksi_ai, name='ai_detect_status'),
 ]
\ No newline at end of file
@@ -2,20 +2,57 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Avg, Max, Min
+from django.urls import reverse
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import OuterRef, Subquery
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.core.handlers.asgi import ASGIRequest
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+import zipfile
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-import os
-import tempfile
-from .models import SensorData, CitraDaun, HasilDeteksi, JenisHama, RiwayatDeteksi, Lahan
+from accounts.models import Petani
+from .models import SensorData, CitraDaun, HasilDeteksi, Lahan, RisikoLahan, EksporRiwayat
 from .serializers import SensorDataSerializer
+from .sensor_ingest import (
+    DEFAULT_DEVICE_ID, attach_owners, bulk_insert_readings, drop_duplicates, parse_device_timestamp, parse_seq, record_seq_hwm,
+    validate_readings
+)
+from .sensor_buffer import BufferFull, sensor_buffer
+from . import sensor_cache
+from .sensor_rollup import WIB, FIELDS, _add_reading, _new_agg, chart_series, chart_step, finalize, rollup_stats
+from .sensor_events import sensor_events
+from . import sensor_binary
+from .sensor_retention import read_history
 from .ai_service import pest_ai
+from .prediction_cache import prediction_cache
+from .riwayat_service import riwayat_counters, riwayat_page, riwayat_payload
+from .riwayat_export import CONTENT_TYPES, export_queryset, generate_export, requeue_stale_exports, stream_export
+from . import geo_tiles
+from .detection_service import (
+    hasil_to_ai_result, prediction_payload, ringkasan_infeksi, simpan_batch_deteksi, simpan_hasil_deteksi
+)
+
+logger = logging.getLogger(__name__)
+
 
 @login_required(login_url='/accounts/login/')
 def dashboard_view(request):
@@ -72,25 +109,175 @@ def riwayat_view(request):
 
     petani = request.user.petani_profile
 
-    riwayat_qs = (
-        RiwayatDeteksi.objects
-        .filter(petani=petani)
-        .select_related('hasil_deteksi__jenis_hama', 'hasil_deteksi__citra', 'lahan')
-        .order_by('-created_at')
-    )
-
-    total_deteksi = riwayat_qs.count()
-    total_sakit = riwayat_qs.exclude(hasil_deteksi__tingkat_serangan__isnull=True).count()
-    perlu_penanganan = riwayat_qs.exclude(status_penanganan='selesai').count()
+    # Halaman pertama saja; halaman berikutnya lewat api/riwayat/?cursor=
+    riwayat_list, next_cursor = riwayat_page(petani, limit=getattr(settings, 'RIWAYAT_PAGE_SIZE', 25))
 
     context = {
-        'riwayat_list': riwayat_qs,
-        'total_deteksi': total_deteksi,
-        'total_sakit': total_sakit,
-        'perlu_penanganan': perlu_penanganan,
+        'riwayat_list': riwayat_list,
+        'next_cursor': next_cursor,
+        **riwayat_counters(petani),
     }
     return render(request, 'dashboard/riwayat.html', context)
 
+
+@api_view(['GET'])
+@login_required
+def riwayat_api(request):
+    """Halaman riwayat berikutnya (JSON) untuk infinite scroll: ?cursor=&limit="""
+    if not hasattr(request.user, 'petani_profile'):
+        return Response({
+            'success': False,
+            'error': 'User tidak memiliki profil petani'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    page_size = getattr(settings, 'RIWAYAT_PAGE_SIZE', 25)
+    try:
+        limit = min(max(int(request.query_params.get('limit', page_size)), 1), 100)
+        items, next_cursor = riwayat_page(
+            request.user.petani_profile, cursor=request.query_params.get('cursor'), limit=limit
+        )
+    except ValueError:
+        return Response({
+            'success': False,
+            'error': 'Parameter cursor/limit tidak valid'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'count': len(items),
+        'next_cursor': next_cursor,
+        'data': [riwayat_payload(r) for r in items]
+    })
+
+def _is_admin(user):
+    return user.is_staff or getattr(user, 'role', None) == 'admin'
+
+
+def _export_scope(request):
+    """
+    Petani hanya mengekspor riwayatnya sendiri; admin semua (opsional ?petani_id=).
+    ValueError jika petani_id tidak valid, Petani.DoesNotExist jika tidak ada.
+    """
+    if hasattr(request.user, 'petani_profile'):
+        return request.user.petani_profile
+    if _is_admin(request.user):
+        petani_id = request.GET.get('petani_id')
+        if petani_id:
+            if not petani_id.isdigit():
+                raise ValueError('petani_id harus berupa angka')
+            return Petani.objects.get(pk=int(petani_id))
+        return None
+    raise PermissionError('Tidak memiliki akses export riwayat')
+
+
+def _parse_tanggal(value):
+    """Tanggal filter YYYY-MM-DD; None jika kosong, ValueError jika tidak valid"""
+    if not value:
+        return None
+    tanggal = parse_date(value)
+    if tanggal is None:
+        raise ValueError(value)
+    return tanggal
+
+
+def _start_export_thread(job_id):
+    if getattr(settings, 'RIWAYAT_EXPORT_THREAD', True):
+        threading.Thread(
+            target=generate_export,
+            args=(job_id, getattr(settings, 'RIWAYAT_EXPORT_CHUNK_SIZE', 2000)),
+            name=f'export-riwayat-{job_id}',
+            daemon=True,
+        ).start()
+
+
+@login_required(login_url='/accounts/login/')
+def export_riwayat(request, fmt):
+    """
+    Export riwayat (CSV/PDF) secara streaming. Filter opsional ?dari=&sampai=
+    (YYYY-MM-DD). ?background=1 membuat file di background dan mengembalikan
+    URL status untuk diunduh setelah selesai.
+    """
+    try:
+        petani = _export_scope(request)
+    except PermissionError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=403)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Petani.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Petani tidak ditemukan'}, status=404)
+
+    try:
+        tanggal_dari = _parse_tanggal(request.GET.get('dari'))
+        tanggal_sampai = _parse_tanggal(request.GET.get('sampai'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Format tanggal harus YYYY-MM-DD'}, status=400)
+    if tanggal_dari and tanggal_sampai and tanggal_dari > tanggal_sampai:
+        return JsonResponse({'success': False, 'error': 'Tanggal dari harus sebelum tanggal sampai'}, status=400)
+
+    if request.GET.get('background') == '1':
+        job = EksporRiwayat.objects.create(
+            user=request.user,
+            petani=petani,
+            format=fmt,
+            tanggal_dari=tanggal_dari,
+            tanggal_sampai=tanggal_sampai,
+        )
+        _start_export_thread(job.id)
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('dashboard:export_status', args=[job.id])
+        }, status=202)
+
+    queryset = export_queryset(petani, tanggal_dari, tanggal_sampai)
+    chunk_size = getattr(settings, 'RIWAYAT_EXPORT_CHUNK_SIZE', 2000)
+    response = StreamingHttpResponse(stream_export(fmt, queryset, chunk_size), content_type=CONTENT_TYPES[fmt])
+    filename = f"riwayat_deteksi_{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required(login_url='/accounts/login/')
+def export_status(request, job_id):
+    """Status job export background; `download_url` terisi saat selesai"""
+    try:
+        job = EksporRiwayat.objects.get(id=job_id, user=request.user)
+    except EksporRiwayat.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Job export tidak ditemukan'}, status=404)
+
+    if job.status == 'processing' and requeue_stale_exports():
+        # Thread pembuat file mati (mis. proses di-restart): jalankan ulang
+        job.refresh_from_db()
+        if job.status == 'pending':
+            _start_export_thread(job.id)
+
+    return JsonResponse({
+        'success': True,
+        'job_id': job.id,
+        'format': job.format,
+        'status': job.status,
+        'error': job.error or None,
+        'download_url': reverse('dashboard:export_download', args=[job.id]) if job.status == 'done' and job.file else None,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    })
+
+
+@login_required(login_url='/accounts/login/')
+def export_download(request, job_id):
+    """Unduh file export background; hanya untuk user yang membuat job"""
+    try:
+        job = EksporRiwayat.objects.get(id=job_id, user=request.user, status='done')
+    except EksporRiwayat.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Job export tidak ditemukan'}, status=404)
+    if not job.file:
+        return JsonResponse({'success': False, 'error': 'File export tidak tersedia'}, status=404)
+
+    filename = f"riwayat_deteksi_{timezone.localtime(job.created_at):%Y%m%d}_{job.id}.{job.format}"
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename, content_type=CONTENT_TYPES[job.format])
+
+
 @login_required(login_url='/accounts/login/')
 def pengaturan_view(request):
     """
@@ -160,8 +347,17 @@ def pengaturan_view(request):
             lokasi = request.POST.get('lokasi', '').strip()
             luas_area = request.POST.get('luas_area', '').strip()
             deskripsi = request.POST.get('deskripsi', '').strip()
+            kode_wilayah = request.POST.get('kode_wilayah', '').strip()
             foto_unit = request.FILES.get('monitoring_photo')
 
+            try:
+                latitude, longitude = geo_tiles.parse_koordinat(
+                    request.POST.get('latitude'), request.POST.get('longitude')
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
+                return redirect('dashboard:pengaturan')
+
             if not nama_unit or not lokasi or not luas_area:
                 messages.error(request, 'Nama unit, lokasi, dan luas area wajib diisi.')
             else:
@@ -170,6 +366,9 @@ def pengaturan_view(request):
                         petani=petani,
                         nama_lahan=nama_unit,
                         lokasi=lokasi,
+                        latitude=latitude,
+                        longitude=longitude,
+                        kode_wilayah=kode_wilayah,
                         luas_daerah=luas_area,
                         deskripsi=deskripsi,
                         jenis_tanaman='Padi',  # default
@@ -179,6 +378,9 @@ def pengaturan_view(request):
                 else:
                     lahan_utama.nama_lahan = nama_unit
                     lahan_utama.lokasi = lokasi
+                    lahan_utama.latitude = latitude
+                    lahan_utama.longitude = longitude
+                    lahan_utama.kode_wilayah = kode_wilayah
                     lahan_utama.luas_daerah = luas_area
                     lahan_utama.deskripsi = deskripsi
                     if foto_unit:
@@ -205,11 +407,72 @@ def profile_view(request):
 # API ENDPOINTS UNTUK ESP8266
 # ========================================
 
+def _notify_ingest(readings):
+    """Update latest-reading cache dan publish event ke stream SSE"""
+    sensor_cache.record_readings(readings)
+    for reading in readings:
+        payload = sensor_cache.reading_payload(reading)
+        sensor_events.publish('reading', payload['device_id'], payload)
+
+
+def _store_readings(valid):
+    """Simpan pembacaan tervalidasi, buang kiriman ulang (device_id, seq). Return jumlah duplikat."""
+    fresh, duplicates = drop_duplicates(valid)
+    stored = []
+    if fresh:
+        attach_owners(fresh)
+        stored = bulk_insert_readings(fresh)
+        record_seq_hwm(stored)
+        _notify_ingest(stored)
+    # Termasuk kiriman ulang yang baru ketahuan saat insert (race antar worker)
+    return len(duplicates) + len(fresh) - len(stored)
+
+
+def _is_binary_frame(request):
+    return (request.content_type or '').split(';')[0].strip() == sensor_binary.MEDIA_TYPE
+
+
+def _ingest_binary(request):
+    """Ingest frame biner (lihat sensor_binary.py); response berupa ack biner 11 byte"""
+    def ack(accepted, rejected, ack_seq=0, error=False, status_code=status.HTTP_201_CREATED):
+        return HttpResponse(
+            sensor_binary.encode_ack(accepted, rejected, ack_seq, error=error),
+            content_type=sensor_binary.ACK_MEDIA_TYPE,
+            status=status_code,
+        )
+
+    try:
+        readings = request.data
+    except ParseError:
+        return ack(0, 0, error=True, status_code=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        valid, rejected = validate_readings(readings)
+        if valid:
+            _store_readings(valid)
+    except Exception:
+        return ack(0, len(readings), error=True, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Duplikat dihitung diterima supaya device berhenti mengirim ulang
+    ack_seq = max((r['seq'] or 0 for r in valid), default=0)
+    return ack(
+        len(valid), len(rejected), ack_seq,
+        status_code=status.HTTP_201_CREATED if valid else status.HTTP_400_BAD_REQUEST
+    )
+
+
+SENSOR_PARSERS = [JSONParser, FormParser, MultiPartParser, sensor_binary.SensorBinaryParser]
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@parser_classes(SENSOR_PARSERS)
 def receive_sensor_data(request):
+    if _is_binary_frame(request):
+        return _ingest_binary(request)
+
     try:
-        device_id = request.data.get('device_id', 'ESP8266_001')
+        device_id = str(request.data.get('device_id') or DEFAULT_DEVICE_ID).strip()[:50] or DEFAULT_DEVICE_ID
         temperature = request.data.get('temperature')
         humidity = request.data.get('humidity')
         soil_moisture = request.data.get('soil_moisture')
@@ -224,6 +487,22 @@ def receive_sensor_data(request):
         hum = float(humidity)
         soil = int(soil_moisture)
 
+        try:
+            seq = parse_seq(request.data.get('seq'))
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'error': 'Invalid seq'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        duplicate_response = Response({
+            'success': True,
+            'duplicate': True,
+            'message': 'Duplicate reading ignored'
+        }, status=status.HTTP_200_OK)
+        if seq is not None and drop_duplicates([{'device_id': device_id, 'seq': seq}])[1]:
+            return duplicate_response
+
         if not (-40 <= temp <= 80):
             return Response({
                 'success': False,
@@ -242,12 +521,48 @@ def receive_sensor_data(request):
                 'error': f'Soil moisture out of range: {soil}%'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        sensor_data = SensorData.objects.create(
-            device_id=device_id,
-            temperature=temp,
-            humidity=hum,
-            soil_moisture=soil
-        )
+        reading = attach_owners([{
+            'device_id': device_id,
+            'temperature': temp,
+            'humidity': hum,
+            'soil_moisture': soil,
+            'timestamp': timezone.now(),
+            'seq': seq
+        }])[0]
+
+        if getattr(settings, 'SENSOR_WRITE_BEHIND', False):
+            # Ack langsung; data disimpan batch oleh sensor_buffer
+            try:
+                sensor_buffer.add(reading)
+                record_seq_hwm([reading])
+                _notify_ingest([reading])
+                return Response({
+                    'success': True,
+                    'message': 'Data received successfully',
+                    'buffered': True,
+                    'data': {**reading, 'timestamp': reading['timestamp'].isoformat()}
+                }, status=status.HTTP_201_CREATED)
+            except BufferFull:
+                # Buffer penuh (DB lambat/mati): jatuh ke insert sinkron
+                pass
+
+        try:
+            sensor_data = SensorData.objects.create(
+                device_id=device_id,
+                temperature=temp,
+                humidity=hum,
+                soil_moisture=soil,
+                seq=seq,
+                petani_id=reading['petani_id'],
+                lahan_id=reading['lahan_id']
+            )
+        except IntegrityError:
+            if seq is None:
+                raise
+            # Kiriman ulang bersamaan yang lolos cek high-water mark
+            return duplicate_response
+        record_seq_hwm([{'device_id': device_id, 'seq': seq}])
+        _notify_ingest([sensor_data])
 
         serializer = SensorDataSerializer(sensor_data)
 
@@ -264,23 +579,147 @@ def receive_sensor_data(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes(SENSOR_PARSERS)
+def receive_sensor_data_batch(request):
+    """
+    Ingest batch untuk gateway: body berupa list pembacaan atau
+    {"readings": [...]}, tiap item berisi device_id, temperature, humidity,
+    soil_moisture dan timestamp device (ISO 8601 / epoch detik).
+    Response ringkas: jumlah yang disimpan + index yang ditolak.
+    Frame biner (sensor_binary.MEDIA_TYPE) juga diterima.
+    """
+    if _is_binary_frame(request):
+        return _ingest_binary(request)
+
+    try:
+        readings = request.data
+        if isinstance(readings, dict):
+            readings = readings.get('readings')
+
+        if not isinstance(readings, list) or not readings:
+            return Response({
+                'ok': False,
+                'error': 'Body harus berupa list pembacaan atau {"readings": [...]}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        max_readings = getattr(settings, 'SENSOR_BATCH_MAX_READINGS', 5000)
+        if len(readings) > max_readings:
+            return Response({
+                'ok': False,
+                'error': f'Maksimal {max_readings} pembacaan per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        valid, rejected = validate_readings(readings)
+        duplicates = _store_readings(valid) if valid else 0
+
+        return Response({
+            'ok': bool(valid),
+            'accepted': len(valid) - duplicates,
+            'duplicates': duplicates,
+            'rejected': rejected
+        }, status=status.HTTP_201_CREATED if valid else status.HTTP_400_BAD_REQUEST)
+
+    except Exception as e:
+        return Response({
+            'ok': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SensorScopeError(ValueError):
+    pass
+
+
+def _sensor_scope(request):
+    """
+    Filter scope sensor dari query params: device_id (boleh dipisah koma),
+    lahan_id, petani_id. Return dict filter ORM (kosong = semua device).
+    SensorScopeError jika lahan_id / petani_id bukan angka.
+    """
+    scope = {}
+    device_id = request.query_params.get('device_id')
+    if device_id:
+        scope['device_id__in'] = [d.strip() for d in device_id.split(',') if d.strip()]
+    for param in ('lahan_id', 'petani_id'):
+        value = request.query_params.get(param)
+        if value:
+            if not value.isdigit():
+                raise SensorScopeError(f'{param} harus berupa angka')
+            scope[param] = int(value)
+    return scope
+
+
+def _sensor_payload(reading):
+    return {
+        'id': reading.id,
+        'device_id': reading.device_id,
+        'temperature': float(reading.temperature),
+        'humidity': float(reading.humidity),
+        'soil_moisture': reading.soil_moisture,
+        'timestamp': reading.timestamp.isoformat()
+    }
+
+
+def _sensor_validators(request, scope, *extra):
+    """
+    ETag/Last-Modified dari versi data sensor per scope (cache atau satu
+    query MAX). `extra` membedakan parameter yang mempengaruhi isi response.
+    Return (response 304 atau None, dict header untuk response 200).
+    """
+    token, modified = sensor_cache.data_version(scope)
+    return _conditional_response(request, token, modified, *extra)
+
+
+def _conditional_response(request, token, modified, *extra):
+    """Seperti _sensor_validators, dengan token versi yang sudah diketahui"""
+    raw = '|'.join([token, request.get_full_path(), *map(str, extra)])
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if modified:
+        headers['Last-Modified'] = http_date(modified)
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        not_modified = etag in tags or f'W/{etag}' in tags or '*' in tags
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        not_modified = bool(modified and since and int(modified) <= since)
+
+    if not_modified:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers), headers
+    return None, headers
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_latest_sensor_data(request):
     try:
-        latest = SensorData.objects.latest('timestamp')
+        scope = _sensor_scope(request)
+
+        # ETag dari pembacaan itu sendiri: hit = tanpa query, miss = satu query
+        payload = sensor_cache.get_latest(scope)
+        if payload is None:
+            latest = (
+                SensorData.objects
+                .filter(**scope)
+                .order_by('-timestamp')
+                .first()
+            )
+            if latest is None:
+                raise SensorData.DoesNotExist
+            payload = sensor_cache.prime(scope, latest)
+
+        not_modified, headers = _conditional_response(request, *sensor_cache.payload_version(payload))
+        if not_modified:
+            return not_modified
 
         return Response({
             'success': True,
-            'data': {
-                'id': latest.id,
-                'device_id': latest.device_id,
-                'temperature': float(latest.temperature),
-                'humidity': float(latest.humidity),
-                'soil_moisture': latest.soil_moisture,
-                'timestamp': latest.timestamp.isoformat()
-            }
-        }, status=200)
+            'data': sensor_cache.public_payload(payload)
+        }, status=200, headers=headers)
 
     except SensorData.DoesNotExist:
         return Response({
@@ -288,6 +727,11 @@ def get_latest_sensor_data(request):
             'message': 'No data available'
         }, status=200)
 
+    except SensorScopeError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
@@ -295,111 +739,240 @@ def get_latest_sensor_data(request):
         }, status=200)
 
 
+@api_view(['GET'])
+@login_required
+def get_sensor_snapshot(request):
+    """
+    Pembacaan terakhir untuk setiap device milik petani yang login, dalam
+    satu query (subquery per device memakai index petani/device/timestamp).
+    """
+    if not hasattr(request.user, 'petani_profile'):
+        return Response({
+            'success': False,
+            'error': 'User tidak memiliki profil petani'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    petani = request.user.petani_profile
+    latest_per_device = (
+        SensorData.objects
+        .filter(petani=petani)
+        .values('device_id')
+        .distinct()
+        .annotate(latest_id=Subquery(
+            SensorData.objects
+            .filter(petani=petani, device_id=OuterRef('device_id'))
+            .order_by('-timestamp', '-id')
+            .values('id')[:1]
+        ))
+        .values('latest_id')
+    )
+    readings = (
+        SensorData.objects
+        .filter(id__in=latest_per_device)
+        .select_related('lahan')
+        .order_by('device_id')
+    )
+
+    return Response({
+        'success': True,
+        'count': len(readings),
+        'data': [
+            {
+                **_sensor_payload(r),
+                'lahan_id': r.lahan_id,
+                'lahan': r.lahan.nama_lahan if r.lahan else None
+            }
+            for r in readings
+        ]
+    })
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_statistics(request):
-    """Ambil statistik harian"""
+    """Ambil statistik harian (dari rollup harian + data yang belum dikompaksi)"""
     try:
-        today = timezone.now().date()
-        today_data = SensorData.objects.filter(timestamp__date=today)
+        time_now = timezone.now()
+        today_start = timezone.localtime(time_now).replace(hour=0, minute=0, second=0, microsecond=0)
+        scope = _sensor_scope(request)
+        not_modified, headers = _sensor_validators(request, scope, today_start.date())
+        if not_modified:
+            return not_modified
+
+        stats = rollup_stats(today_start, time_now, resolution='day', scope=scope)
 
-        if not today_data.exists():
+        if not stats['count']:
             return Response({
                 'success': False,
                 'message': 'No data for today'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        stats = today_data.aggregate(
-            avg_temp=Avg('temperature'),
-            max_temp=Max('temperature'),
-            min_temp=Min('temperature'),
-            avg_humidity=Avg('humidity'),
-            max_humidity=Max('humidity'),
-            min_humidity=Min('humidity')
-        )
-        
         return Response({
             'success': True,
             'data': {
                 'temperature': {
-                    'avg': round(float(stats['avg_temp']), 1),
-                    'max': round(float(stats['max_temp']), 1),
-                    'min': round(float(stats['min_temp']), 1)
+                    'avg': round(stats['temperature']['avg'], 1),
+                    'max': round(stats['temperature']['max'], 1),
+                    'min': round(stats['temperature']['min'], 1)
                 },
                 'humidity': {
-                    'avg': round(float(stats['avg_humidity']), 1),
-                    'max': round(float(stats['max_humidity']), 1),
-                    'min': round(float(stats['min_humidity']), 1)
+                    'avg': round(stats['humidity']['avg'], 1),
+                    'max': round(stats['humidity']['max'], 1),
+                    'min': round(stats['humidity']['min'], 1)
                 },
-                'total_readings': today_data.count()
+                'total_readings': stats['count']
             }
-        })
+        }, headers=headers)
+    except SensorScopeError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+@api_view(['GET'])
+@login_required
+def get_sensor_history(request):
+    """
+    Pembacaan mentah dalam rentang `from`..`to` (ISO 8601 / epoch, default
+    24 jam terakhir). Rentang di luar jendela retensi dibaca dari arsip.
+    Petani hanya membaca data miliknya sendiri; admin semua.
+    """
+    try:
+        scope = _sensor_scope(request)
+        if not _is_admin(request.user):
+            petani = getattr(request.user, 'petani_profile', None)
+            if petani is None or scope.get('petani_id', petani.pk) != petani.pk:
+                return Response({
+                    'success': False,
+                    'error': 'Tidak memiliki akses ke data sensor ini'
+                }, status=status.HTTP_403_FORBIDDEN)
+            scope['petani_id'] = petani.pk
+
+        time_now = timezone.now()
+        time_to = parse_device_timestamp(request.query_params.get('to'), time_now)
+        time_from = parse_device_timestamp(request.query_params.get('from'), time_to - timedelta(hours=24))
+        if time_from is None or time_to is None or time_from > time_to:
+            return Response({
+                'success': False,
+                'error': 'Parameter from/to tidak valid'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        max_readings = getattr(settings, 'SENSOR_HISTORY_MAX_READINGS', 20000)
+        # Satu pembacaan ekstra untuk menandai hasil yang terpotong
+        readings = read_history(time_from, time_to, scope=scope, now=time_now, limit=max_readings + 1)
+
+        return Response({
+            'success': True,
+            'count': min(len(readings), max_readings),
+            'truncated': len(readings) > max_readings,
+            'data': [
+                {**r, 'timestamp': r['timestamp'].isoformat()}
+                for r in readings[:max_readings]
+            ]
+        })
+
+    except SensorScopeError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+CHART_MAX_POINTS = 300
+CHART_MAX_HOURS = 24 * 366
+
+
+def _parse_hours(value, default=1.0):
+    """Parameter `hours` chart/stream; ValueError jika bukan angka 0 < hours <= CHART_MAX_HOURS"""
+    hours = default if value in (None, '') else float(value)
+    if not (math.isfinite(hours) and 0 < hours <= CHART_MAX_HOURS):
+        raise ValueError(f'hours harus angka antara 0 dan {CHART_MAX_HOURS}')
+    return hours
+
+
+def _chart_time_format(step, hours):
+    if step >= 86400:
+        return '%d/%m'
+    if hours > 24:
+        return '%d/%m %H:%M'
+    return '%H:%M'
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_sensor_chart_raw(request):
+    """
+    Data chart sensor. Timestamp dipotong ke bucket (WIB) dan dirata-rata di
+    database; ukuran bucket menyesuaikan `hours` sehingga maksimal ~300 titik.
+    """
     try:
-        import pytz
-        from collections import defaultdict
-        from django.utils import timezone as django_timezone
+        hours = _parse_hours(request.query_params.get('hours'))
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-        hours = float(request.query_params.get('hours', 1))
-        time_now = django_timezone.now()
+    try:
+        time_now = timezone.now()
         time_from = time_now - timedelta(hours=hours)
+        scope = _sensor_scope(request)
+
+        # Isi chart juga bergeser saat bucket baru dimulai walau tanpa data baru;
+        # bucket sejajar jam/hari WIB seperti di chart_series
+        wib_seconds = time_now.timestamp() + WIB.utcoffset(None).total_seconds()
+        bucket_key = int(wib_seconds // chart_step(hours * 3600, CHART_MAX_POINTS))
+        not_modified, headers = _sensor_validators(request, scope, bucket_key)
+        if not_modified:
+            return not_modified
 
-        queryset = SensorData.objects.filter(
-            timestamp__gte=time_from,
-            timestamp__lte=time_now
-        ).order_by('timestamp')
+        step, series = chart_series(
+            time_from, time_now, max_points=CHART_MAX_POINTS, scope=scope
+        )
 
-        if not queryset.exists():
+        if not series:
             return Response({
                 'success': True,
                 'message': 'No data available',
                 'data': []
-            })
-
-        wib = pytz.timezone('Asia/Jakarta')
-
-        grouped_data = defaultdict(lambda: {
-            'temps': [],
-            'hums': [],
-            'soils': []
-        })
+            }, headers=headers)
 
-        for item in queryset:
-            timestamp_wib = item.timestamp.astimezone(wib)
-            time_key = timestamp_wib.strftime('%H:%M')
-
-            grouped_data[time_key]['temps'].append(float(item.temperature))
-            grouped_data[time_key]['hums'].append(float(item.humidity))
-            grouped_data[time_key]['soils'].append(int(item.soil_moisture))
+        time_format = _chart_time_format(step, hours)
 
         chart_data = []
-        for time_key in sorted(grouped_data.keys()):
-            temps = grouped_data[time_key]['temps']
-            hums = grouped_data[time_key]['hums']
-            soils = grouped_data[time_key]['soils']
-
+        for bucket, agg in series:
+            stats = finalize(agg)
             chart_data.append({
-                'time': time_key,
-                'temperature': round(sum(temps) / len(temps), 1),
-                'humidity': round(sum(hums) / len(hums), 1),
-                'soil_moisture': round(sum(soils) / len(soils), 1)
+                'time': bucket.strftime(time_format),
+                'count': stats['count'],
+                'temperature': round(stats['temperature']['avg'], 1),
+                'humidity': round(stats['humidity']['avg'], 1),
+                'soil_moisture': round(stats['soil_moisture']['avg'], 1)
             })
 
         return Response({
             'success': True,
             'count': len(chart_data),
             'time_range': f'Last {hours} hours',
+            'bucket_seconds': step,
             'data': chart_data
-        })
+        }, headers=headers)
 
+    except SensorScopeError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
@@ -407,6 +980,247 @@ def get_sensor_chart_raw(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@login_required
+def get_pest_risk(request):
+    """
+    Skor risiko penyakit per lahan milik petani yang login (dihitung oleh
+    `python manage.py compute_pest_risk`). Filter opsional lahan_id.
+    """
+    if not hasattr(request.user, 'petani_profile'):
+        return Response({
+            'success': False,
+            'error': 'User tidak memiliki profil petani'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    risks = RisikoLahan.objects.filter(lahan__petani=request.user.petani_profile).select_related('lahan')
+    lahan_id = request.query_params.get('lahan_id')
+    if lahan_id:
+        if not lahan_id.isdigit():
+            return Response({
+                'success': False,
+                'error': 'lahan_id harus berupa angka'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        risks = risks.filter(lahan_id=int(lahan_id))
+
+    return Response({
+        'success': True,
+        'count': len(risks),
+        'data': [
+            {
+                'lahan_id': r.lahan_id,
+                'lahan': r.lahan.nama_lahan,
+                'last_hour': r.last_hour.isoformat(),
+                'indices': r.indices,
+                'scores': dict(sorted(r.scores.items(), key=lambda item: -item[1]['score'])),
+            }
+            for r in risks
+        ]
+    })
+
+
+@api_view(['GET'])
+@login_required
+def get_outbreak_tiles(request):
+    """
+    Peta sebaran serangan (admin): jumlah deteksi per tile geohash per jenis
+    hama, dari tabel DeteksiTile. Parameter: days (default 30) atau
+    dari/sampai (YYYY-MM-DD), precision (1..GEOHASH_PRECISION), prefix
+    (geohash, untuk membatasi area), jenis_hama_id.
+    """
+    if not _is_admin(request.user):
+        return Response({
+            'success': False,
+            'error': 'Hanya admin yang dapat melihat peta sebaran'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    params = request.query_params
+    max_days = getattr(settings, 'GEO_TILE_MAX_DAYS', 366)
+    try:
+        today = timezone.now().astimezone(WIB).date()
+        tanggal_sampai = parse_date(params['sampai']) if params.get('sampai') else today
+        if params.get('dari'):
+            tanggal_dari = parse_date(params['dari'])
+        else:
+            days = int(params.get('days', 30))
+            if not 1 <= days <= max_days:
+                return Response({
+                    'success': False,
+                    'error': f'days harus 1..{max_days}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            tanggal_dari = tanggal_sampai - timedelta(days=days - 1)
+        precision = int(params.get('precision', geo_tiles.tile_precision()))
+        jenis_hama_id = int(params['jenis_hama_id']) if params.get('jenis_hama_id') else None
+    except (TypeError, ValueError, OverflowError):
+        return Response({
+            'success': False,
+            'error': 'Parameter tidak valid'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    prefix = params.get('prefix', '').lower()
+    if tanggal_dari is None or tanggal_sampai is None or tanggal_dari > tanggal_sampai:
+        return Response({'success': False, 'error': 'Rentang tanggal tidak valid'}, status=status.HTTP_400_BAD_REQUEST)
+    if (tanggal_sampai - tanggal_dari).days >= max_days:
+        return Response({'success': False, 'error': f'Rentang maksimal {max_days} hari'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= precision <= geo_tiles.tile_precision():
+        return Response({'success': False, 'error': f'precision harus 1..{geo_tiles.tile_precision()}'}, status=status.HTTP_400_BAD_REQUEST)
+    if prefix and not geo_tiles.is_geohash(prefix):
+        return Response({'success': False, 'error': 'prefix bukan geohash'}, status=status.HTTP_400_BAD_REQUEST)
+
+    tiles = geo_tiles.tile_counts(tanggal_dari, tanggal_sampai, precision, prefix, jenis_hama_id)
+    return Response({
+        'success': True,
+        'dari': tanggal_dari.isoformat(),
+        'sampai': tanggal_sampai.isoformat(),
+        'precision': precision,
+        'count': len(tiles),
+        'data': tiles,
+    })
+
+
+# ========================================
+# STREAM SSE (PENGGANTI POLLING DASHBOARD)
+# ========================================
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class _ChartBucketTracker:
+    """
+    Agregat bucket chart yang sedang berjalan (ukuran bucket sama dengan
+    get_sensor_chart_raw untuk `hours` yang sama). Diisi awal dari database,
+    lalu diperbarui dari event pembacaan.
+    """
+
+    def __init__(self, hours, scope):
+        self.hours = hours
+        self.step = chart_step(hours * 3600, CHART_MAX_POINTS)
+        self.time_format = _chart_time_format(self.step, hours)
+        self.key = self._key(timezone.now().timestamp())
+        self.agg = _new_agg()
+
+        seed = rollup_stats(
+            datetime.fromtimestamp(self._start(self.key), tz=WIB), timezone.now(),
+            resolution='minute', scope=scope
+        )
+        if seed['count']:
+            self.agg['count'] = seed['count']
+            for f in FIELDS:
+                self.agg[f'{f}_sum'] = seed[f]['avg'] * seed['count']
+                self.agg[f'{f}_min'] = seed[f]['min']
+                self.agg[f'{f}_max'] = seed[f]['max']
+
+    def _key(self, epoch):
+        # Bucket rata terhadap WIB, sama seperti chart_series
+        return int((epoch + 7 * 3600) // self.step)
+
+    def _start(self, key):
+        return key * self.step - 7 * 3600
+
+    def add(self, payload):
+        """Return data event 'bucket', atau None untuk pembacaan di bucket lama"""
+        key = self._key(payload['_ts'])
+        if key < self.key:
+            return None
+        if key > self.key:
+            self.key = key
+            self.agg = _new_agg()
+        _add_reading(self.agg, [payload[f] for f in FIELDS])
+
+        stats = finalize(self.agg)
+        bucket = datetime.fromtimestamp(self._start(self.key), tz=WIB)
+        return {
+            'time': bucket.strftime(self.time_format),
+            'bucket_start': bucket.isoformat(),
+            'bucket_seconds': self.step,
+            'count': stats['count'],
+            **{f: round(stats[f]['avg'], 1) for f in FIELDS},
+        }
+
+
+def _stream_chunks(tracker, event):
+    event_type, payload = event
+    chunks = [_sse(event_type, sensor_cache.public_payload(payload))]
+    if tracker is not None:
+        bucket = tracker.add(payload)
+        if bucket is not None:
+            chunks.append(_sse('bucket', bucket))
+    return chunks
+
+
+def _sync_stream(device_ids, tracker, keepalive, max_seconds):
+    deadline = time.monotonic() + max_seconds
+    sub = sensor_events.subscribe(device_ids)
+    try:
+        yield 'retry: 5000\n\n'
+        while time.monotonic() < deadline:
+            event = sub.get(timeout=keepalive)
+            if event is None:
+                yield ': ping\n\n'
+                continue
+            yield from _stream_chunks(tracker, event)
+    finally:
+        sub.close()
+
+
+async def _async_stream(device_ids, tracker, keepalive, max_seconds):
+    # Subscribe di dalam event loop ASGI agar event dikirim via call_soon_threadsafe
+    deadline = time.monotonic() + max_seconds
+    sub = sensor_events.subscribe(device_ids, loop=asyncio.get_running_loop())
+    try:
+        yield 'retry: 5000\n\n'
+        while time.monotonic() < deadline:
+            event = await sub.aget(timeout=keepalive)
+            if event is None:
+                yield ': ping\n\n'
+                continue
+            for chunk in _stream_chunks(tracker, event):
+                yield chunk
+    finally:
+        sub.close()
+
+
+def sensor_stream(request):
+    """
+    Server-Sent Events: event `reading` untuk setiap pembacaan baru dan
+    event `bucket` untuk titik chart terakhir (jika `hours` diberikan).
+    Filter opsional `device_id` (boleh dipisah koma). Koneksi ditutup setelah
+    SENSOR_STREAM_MAX_SECONDS; EventSource di browser akan reconnect otomatis.
+
+    Di WSGI setiap koneksi menahan satu thread worker selama stream terbuka,
+    jadi stream hanya dilayani jika SENSOR_STREAM_WSGI = True; selain itu
+    response 204 membuat EventSource berhenti dan dashboard memakai polling.
+    """
+    is_asgi = isinstance(request, ASGIRequest)
+    if not is_asgi and not getattr(settings, 'SENSOR_STREAM_WSGI', False):
+        return HttpResponse(status=204)
+
+    device_ids = [d.strip() for d in request.GET.get('device_id', '').split(',') if d.strip()]
+    scope = {'device_id__in': device_ids} if device_ids else {}
+    keepalive = getattr(settings, 'SENSOR_STREAM_KEEPALIVE', 15)
+    max_seconds = getattr(settings, 'SENSOR_STREAM_MAX_SECONDS', 300)
+
+    tracker = None
+    if request.GET.get('hours'):
+        try:
+            hours = _parse_hours(request.GET['hours'])
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        tracker = _ChartBucketTracker(hours, scope)
+
+    # Di ASGI koneksi idle tidak memakan thread worker
+    if is_asgi:
+        stream = _async_stream(device_ids or None, tracker, keepalive, max_seconds)
+    else:
+        stream = _sync_stream(device_ids or None, tracker, keepalive, max_seconds)
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @api_view(['GET'])
 def test_api(request):
     return Response({
@@ -426,9 +1240,7 @@ def proses_deteksi_ai(request):
     Proses deteksi AI dengan validasi ketat
     """
     try:
-        print("\n" + "="*60)
-        print("🚀 AI DETECTION WITH VALIDATION STARTED")
-        print("="*60)
+        logger.debug("AI detection with validation started")
         
         # 1. Validasi User & File
         if not hasattr(request.user, 'petani_profile'):
@@ -438,7 +1250,7 @@ def proses_deteksi_ai(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         petani = request.user.petani_profile
-        print(f"👤 User: {petani.nama_lengkap}")
+        logger.debug(f"User: {petani.nama_lengkap}")
         
         if 'image' not in request.FILES:
             return Response({
@@ -448,7 +1260,7 @@ def proses_deteksi_ai(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         image_file = request.FILES['image']
-        print(f"📷 File: {image_file.name} ({image_file.size} bytes)")
+        logger.debug(f"File: {image_file.name} ({image_file.size} bytes)")
         
         # Validasi tipe file
         allowed_types = ['image/jpeg', 'image/jpg', 'image/png']
@@ -467,177 +1279,100 @@ def proses_deteksi_ai(request):
                 'error_type': 'FILE_TOO_LARGE'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 2. Simpan ke CitraDaun dulu (status: processing)
+        lahan_id = request.POST.get('lahan_id', None)
+        lahan = None
+        if lahan_id:
+            try:
+                lahan = Lahan.objects.get(id=lahan_id, petani=petani)
+            except Lahan.DoesNotExist:
+                pass
+        
+        # Mode async: simpan sebagai 'pending', job runner yang menjalankan AI
+        # (python manage.py run_detection_worker), client polling status endpoint
+        is_async = request.POST.get('mode', '') == 'async' or getattr(settings, 'AI_ASYNC_DETECTION', False)
+        
+        # 2. Simpan ke CitraDaun dulu (status: processing / pending)
         citra = CitraDaun.objects.create(
             petani=petani,
+            lahan=lahan,
             nama_file=image_file.name,
             path_file=image_file,
             jenis_tanaman=request.POST.get('jenis_tanaman', 'Cabai/Tomat'),
-            status_deteksi='processing'
+            status_deteksi='pending' if is_async else 'processing'
         )
-        print(f"✅ CitraDaun created: ID={citra.id}")
+        logger.debug(f"CitraDaun created: ID={citra.id}")
         
-        # 3. Proses AI Prediction dengan Validasi
-        temp_path = None
-        try:
-            # Save to temp file for AI processing
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-                for chunk in image_file.chunks():
-                    tmp_file.write(chunk)
-                temp_path = tmp_file.name
-            
-            print(f"🤖 Running AI prediction with validation...")
-            hasil_ai = pest_ai.predict(temp_path)
-            print(f"📊 AI Result: {hasil_ai}")
-            
-            # Handle validation/prediction errors
-            if not hasil_ai.get('success', False):
-                error_type = hasil_ai.get('error_type', 'UNKNOWN_ERROR')
-                error_message = hasil_ai.get('error', 'Terjadi kesalahan')
-                
-                citra.status_deteksi = 'failed'
-                citra.save()
-                
-                print(f"❌ Detection failed: {error_type} - {error_message}")
-                
-                return Response({
-                    'success': False,
-                    'error': error_message,
-                    'error_type': error_type,
-                    'details': hasil_ai.get('details', {}),
-                    'suggestion':_get_error_suggestion(error_type)
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            prediction = hasil_ai['prediction']
-            class_name = prediction['class_name']
-            display_name = prediction.get('display_name', class_name)
-            confidence = prediction['confidence']
-            severity = prediction['severity']
-            disease_info = prediction.get('disease_info', {})
-            
-            # 4. Tentukan apakah sehat atau sakit
-            is_healthy = 'healthy' in class_name.lower()
-            
-            # 5. Cari atau Buat JenisHama
-            jenis_hama, created = JenisHama.objects.get_or_create(
-                nama=display_name,
-                defaults={
-                    'nama_latin': disease_info.get('latin_name', '-'),
-                    'deskripsi': disease_info.get('description', ''),
-                    'gejala': disease_info.get('symptoms', ''),
-                    'cara_pencegahan': disease_info.get('prevention', ''),
-                    'cara_penanganan': disease_info.get('treatment', '')
+        if is_async:
+            return Response({
+                'success': True,
+                'message': 'Citra diterima, deteksi sedang diantrikan',
+                'status': citra.status_deteksi,
+                'data': {
+                    'citra_id': citra.id,
+                    'status_url': reverse('dashboard:ai_detect_status', args=[citra.id])
                 }
-            )
-            
-            if created:
-                print(f"🆕 JenisHama baru dibuat: {display_name}")
-            else:
-                print(f"♻️ Menggunakan JenisHama existing: {display_name}")
-            
-            # 6. Simpan HasilDeteksi
-            tingkat_mapping = {
-                'Rendah': 'ringan',
-                'Sedang': 'sedang',
-                'Tinggi': 'berat'
-            }
-            tingkat_serangan = tingkat_mapping.get(severity, 'sedang')
-            
-            # Generate rekomendasi
-            if is_healthy:
-                rekomendasi = disease_info.get('treatment', 
-                    "✅ Tanaman dalam kondisi sehat. Lanjutkan perawatan rutin dan monitoring berkala.")
-            else:
-                base_recommendation = disease_info.get('treatment', '')
-                
-                if severity == 'Tinggi':
-                    urgency = "⚠️ SEGERA TANGANI! "
-                elif severity == 'Sedang':
-                    urgency = "⚠️ Perlu Perhatian. "
-                else:
-                    urgency = "ℹ️ Monitoring Diperlukan. "
-                
-                rekomendasi = urgency + base_recommendation
-            
-            hasil_deteksi = HasilDeteksi.objects.create(
-                citra=citra,
-                jenis_hama=jenis_hama,
-                confidence_score=confidence,
-                tingkat_serangan=tingkat_serangan if not is_healthy else 'ringan',
-                jumlah_daun_terinfeksi=1 if not is_healthy else 0,
-                rekomendasi=rekomendasi,
-                waktu_deteksi=timezone.now()
-            )
-            print(f"✅ HasilDeteksi created: Confidence={confidence}%, Severity={severity}")
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        # 3. Proses AI Prediction dengan Validasi
+        # File sudah tersimpan di MEDIA_ROOT lewat CitraDaun; untuk AI cukup
+        # decode langsung dari memori tanpa temp file
+        image_bytes = b''.join(image_file.chunks())
+
+        def _run_prediction():
+            logger.debug("Running AI prediction with validation...")
+            return pest_ai.predict(image_bytes)
+
+        # Upload ulang / retry dari mobile client dengan file yang sama
+        # langsung dijawab dari cache tanpa menjalankan CNN
+        hasil_ai, cache_hit = prediction_cache.get_or_predict(
+            image_bytes, pest_ai.model_version, _run_prediction
+        )
+        logger.debug(f"AI Result{' (cache)' if cache_hit else ''}: {hasil_ai}")
+        
+        # Handle validation/prediction errors
+        if not hasil_ai.get('success', False):
+            error_type = hasil_ai.get('error_type', 'UNKNOWN_ERROR')
+            error_message = hasil_ai.get('error', 'Terjadi kesalahan')
             
-            # 7. Update status CitraDaun
-            citra.status_deteksi = 'completed'
-            citra.waktu_deteksi = timezone.now()
+            citra.status_deteksi = 'failed'
             citra.save()
             
-            # 8. Buat RiwayatDeteksi
-            lahan_id = request.POST.get('lahan_id', None)
-            lahan = None
-            if lahan_id:
-                try:
-                    lahan = Lahan.objects.get(id=lahan_id, petani=petani)
-                except Lahan.DoesNotExist:
-                    pass
-            
-            riwayat = RiwayatDeteksi.objects.create(
-                petani=petani,
-                hasil_deteksi=hasil_deteksi,
-                lahan=lahan,
-                catatan_petani='',
-                status_penanganan='belum' if not is_healthy else 'selesai'
-            )
-            print(f"✅ RiwayatDeteksi created: ID={riwayat.id}")
-            
-            print("="*60)
-            print("✅ AI DETECTION COMPLETED & SAVED TO DATABASE")
-            print("="*60 + "\n")
+            logger.debug(f"Detection failed: {error_type} - {error_message}")
             
-            # 9. Return response lengkap dengan info penyakit
             return Response({
-                'success': True,
-                'message': 'Deteksi berhasil',
-                'database_saved': True,
-                'data': {
-                    'citra_id': citra.id,
-                    'hasil_deteksi_id': hasil_deteksi.citra_id,
-                    'riwayat_id': riwayat.id
-                },
-                'prediction': {
-                    'class_name': class_name,
-                    'display_name': display_name,
-                    'pest_name': display_name,
-                    'confidence': confidence,
-                    'severity': severity,
-                    'disease_info': {
-                        'description': disease_info.get('description', ''),
-                        'symptoms': disease_info.get('symptoms', ''),
-                        'prevention': disease_info.get('prevention', ''),
-                        'treatment': disease_info.get('treatment', ''),
-                        'latin_name': disease_info.get('latin_name', '')
-                    }
-                },
-                'condition': 'SEHAT' if is_healthy else 'TERDETEKSI PENYAKIT',
-                'is_healthy': is_healthy,
-                'validation': hasil_ai.get('validation', {}),
-                'mode': hasil_ai.get('mode', 'production'),
-                'note': hasil_ai.get('note', '')
-            })
-            
-        finally:
-            # Cleanup temp file
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
-                print("🗑️ Temp file cleaned up")
+                'success': False,
+                'error': error_message,
+                'error_type': error_type,
+                'details': hasil_ai.get('details', {}),
+                'suggestion':_get_error_suggestion(error_type)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # 4-8. Simpan JenisHama, HasilDeteksi, status CitraDaun & RiwayatDeteksi
+        hasil_deteksi, riwayat = simpan_hasil_deteksi(citra, hasil_ai, lahan=lahan)
+        logger.debug(f"HasilDeteksi created: Confidence={hasil_deteksi.confidence_score}%")
+        logger.debug(f"RiwayatDeteksi created: ID={riwayat.id}")
+        
+        logger.debug("AI detection completed & saved to database")
+        
+        # 9. Return response lengkap dengan info penyakit
+        return Response({
+            'success': True,
+            'message': 'Deteksi berhasil',
+            'database_saved': True,
+            'data': {
+                'citra_id': citra.id,
+                'hasil_deteksi_id': hasil_deteksi.citra_id,
+                'riwayat_id': riwayat.id
+            },
+            **prediction_payload(hasil_ai),
+            'validation': hasil_ai.get('validation', {}),
+            'mode': hasil_ai.get('mode', 'production'),
+            'cached': cache_hit,
+            'note': hasil_ai.get('note', '')
+        })
         
     except Exception as e:
-        print(f"❌ ERROR in proses_deteksi_ai: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error in proses_deteksi_ai: {e}")
         
         # Update status jika ada error
         if 'citra' in locals():
@@ -651,6 +1386,239 @@ def proses_deteksi_ai(request):
             'details': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/jpg', 'image/png']
+ALLOWED_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+
+
+class BulkLimitError(Exception):
+    def __init__(self, message, error_type):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+def _kumpulkan_file_bulk(request, max_images):
+    """
+    Ambil daftar file gambar dari request bulk: multipart `images` (banyak file)
+    dan/atau `archive` berupa zip. Return (files, errors).
+
+    Batas jumlah entri, jumlah gambar dan total ukuran zip dicek dari
+    central directory sebelum ada member yang didekompresi
+    (BulkLimitError jika terlampaui).
+    """
+    files, errors = [], []
+    too_many = BulkLimitError(f'Maksimal {max_images} gambar per request', 'TOO_MANY_FILES')
+
+    for f in request.FILES.getlist('images'):
+        if f.content_type.lower() not in ALLOWED_IMAGE_TYPES:
+            errors.append({'file': f.name, 'error_type': 'INVALID_FORMAT'})
+        elif f.size > MAX_IMAGE_SIZE:
+            errors.append({'file': f.name, 'error_type': 'FILE_TOO_LARGE'})
+        else:
+            files.append(f)
+    if len(files) > max_images:
+        raise too_many
+
+    archive = request.FILES.get('archive')
+    if archive is not None:
+        max_entries = getattr(settings, 'AI_BULK_MAX_ARCHIVE_ENTRIES', 1000)
+        max_total = getattr(settings, 'AI_BULK_MAX_ARCHIVE_BYTES', 200 * 1024 * 1024)
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                infos = zf.infolist()
+                if len(infos) > max_entries:
+                    raise BulkLimitError(f'Arsip berisi lebih dari {max_entries} entri', 'TOO_MANY_FILES')
+
+                selected, total_size = [], 0
+                for info in infos:
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or not name or name.startswith('.'):
+                        continue
+                    if not name.lower().endswith(ALLOWED_IMAGE_EXTENSIONS):
+                        errors.append({'file': name, 'error_type': 'INVALID_FORMAT'})
+                    elif info.file_size > MAX_IMAGE_SIZE:
+                        errors.append({'file': name, 'error_type': 'FILE_TOO_LARGE'})
+                    else:
+                        total_size += info.file_size
+                        selected.append((info, name))
+                        if len(files) + len(selected) > max_images:
+                            raise too_many
+                        if total_size > max_total:
+                            raise BulkLimitError('Total ukuran isi arsip terlalu besar', 'FILE_TOO_LARGE')
+
+                # zipfile tidak pernah mengembalikan lebih dari file_size yang
+                # dideklarasikan, jadi total di atas membatasi memori
+                for info, name in selected:
+                    files.append(ContentFile(zf.read(info), name=name))
+        except zipfile.BadZipFile:
+            errors.append({'file': archive.name, 'error_type': 'INVALID_FORMAT'})
+
+    return files, errors
+
+
+@api_view(['POST'])
+@login_required
+def proses_deteksi_ai_bulk(request):
+    """
+    Deteksi banyak citra sekaligus untuk satu lahan (survei lapangan).
+    Semua citra diproses dengan inferensi batch, lalu CitraDaun, HasilDeteksi
+    dan RiwayatDeteksi disimpan dalam satu transaksi.
+    """
+    try:
+        if not hasattr(request.user, 'petani_profile'):
+            return Response({
+                'success': False,
+                'error': 'User tidak memiliki profil petani'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        petani = request.user.petani_profile
+
+        lahan_id = request.POST.get('lahan_id')
+        lahan = Lahan.objects.filter(id=lahan_id, petani=petani).first() if lahan_id else None
+        if lahan is None:
+            return Response({
+                'success': False,
+                'error': 'lahan_id wajib diisi dan harus milik petani',
+                'error_type': 'INVALID_LAHAN'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        max_images = getattr(settings, 'AI_BULK_MAX_IMAGES', 100)
+        try:
+            files, rejected = _kumpulkan_file_bulk(request, max_images)
+        except BulkLimitError as e:
+            return Response({
+                'success': False,
+                'error': str(e),
+                'error_type': e.error_type
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not files:
+            return Response({
+                'success': False,
+                'error': 'Tidak ada file gambar valid yang diupload',
+                'error_type': 'NO_FILE',
+                'rejected': rejected
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.debug(f"BULK AI DETECTION: {len(files)} citra untuk lahan {lahan.id}")
+        hasil_list = pest_ai.predict_batch([f.read() for f in files])
+
+        rows = simpan_batch_deteksi(
+            petani, lahan, files, hasil_list,
+            jenis_tanaman=request.POST.get('jenis_tanaman', 'Cabai/Tomat')
+        )
+
+        results = []
+        for (citra, hasil_deteksi, riwayat), hasil_ai in zip(rows, hasil_list):
+            if hasil_deteksi is None:
+                results.append({
+                    'success': False,
+                    'file': citra.nama_file,
+                    'citra_id': citra.id,
+                    'error': hasil_ai.get('error', 'Terjadi kesalahan'),
+                })
+                continue
+            results.append({
+                'success': True,
+                'file': citra.nama_file,
+                'citra_id': citra.id,
+                'riwayat_id': riwayat.id,
+                **prediction_payload(hasil_ai),
+            })
+
+        return Response({
+            'success': True,
+            'message': f'{len(files)} citra diproses',
+            'lahan_id': lahan.id,
+            'summary': ringkasan_infeksi(hasil_list),
+            'results': results,
+            'rejected': rejected
+        })
+
+    except Exception as e:
+        logger.exception(f"Error in proses_deteksi_ai_bulk: {e}")
+        return Response({
+            'success': False,
+            'error': 'Terjadi kesalahan sistem. Silakan coba lagi.',
+            'error_type': 'SYSTEM_ERROR',
+            'details': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@login_required
+def status_deteksi_ai(request, citra_id):
+    """
+    Status job deteksi (mode async). Mendukung long-poll: ?wait=<detik>
+    (maks. 30) menahan response sampai status completed/failed atau waktu habis.
+    """
+    if not hasattr(request.user, 'petani_profile'):
+        return Response({
+            'success': False,
+            'error': 'User tidak memiliki profil petani'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    petani = request.user.petani_profile
+    try:
+        wait = float(request.query_params.get('wait', 0))
+    except ValueError:
+        wait = None
+    if wait is None or not math.isfinite(wait):
+        return Response({
+            'success': False,
+            'error': 'Parameter wait harus angka (detik)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    wait = min(max(wait, 0), 30)
+    deadline = time.monotonic() + wait
+
+    while True:
+        citra = CitraDaun.objects.filter(id=citra_id, petani=petani).only('id', 'status_deteksi').first()
+        if citra is None:
+            return Response({
+                'success': False,
+                'error': 'Citra tidak ditemukan'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if citra.status_deteksi in ('completed', 'failed') or time.monotonic() >= deadline:
+            break
+        time.sleep(0.5)
+
+    if citra.status_deteksi == 'failed':
+        return Response({
+            'success': False,
+            'status': 'failed',
+            'error': 'Deteksi gagal diproses',
+            'error_type': 'SYSTEM_ERROR',
+            'suggestion': _get_error_suggestion('SYSTEM_ERROR'),
+            'data': {'citra_id': citra.id}
+        })
+
+    if citra.status_deteksi != 'completed':
+        return Response({
+            'success': True,
+            'status': citra.status_deteksi,
+            'data': {'citra_id': citra.id}
+        }, status=status.HTTP_202_ACCEPTED)
+
+    hasil_deteksi = (
+        HasilDeteksi.objects
+        .select_related('jenis_hama')
+        .get(citra_id=citra.id)
+    )
+    riwayat = hasil_deteksi.riwayat.order_by('id').first()
+
+    return Response({
+        'success': True,
+        'status': 'completed',
+        'message': 'Deteksi berhasil',
+        'database_saved': True,
+        'data': {
+            'citra_id': citra.id,
+            'hasil_deteksi_id': hasil_deteksi.citra_id,
+            'riwayat_id': riwayat.id if riwayat else None
+        },
+        **prediction_payload(hasil_to_ai_result(hasil_deteksi)),
+        'mode': 'async'
+    })
+
 def _get_error_suggestion(error_type):
     """Berikan saran berdasarkan tipe error"""
     suggestions = {